@@ -1,14 +1,14 @@
 from flask import Blueprint, request, jsonify, current_app, g
 from flask_login import login_required, current_user, login_user, logout_user
 from functools import wraps
-import os
 import re
 import secrets
 from datetime import datetime
 from extensions import db
-from models import User, Video, APIKey, UsageLog
-from utils import log_usage, get_user_usage_stats, validate_file_upload, get_storage_path
-from reddit_shorts.main import run_local_video_generation
+from models import User, Video, APIKey, UsageLog, VideoBatch
+from utils import log_usage, get_user_usage_stats, validate_file_upload, get_storage_path, resolve_asset_path
+from jobs import reserve_videos, enqueue_video, enqueue_batch, batch_status
+from reddit_shorts.voices import voice_registry
 
 api_bp = Blueprint('api', __name__)
 
@@ -88,7 +88,7 @@ def list_videos():
             'completed_at': video.completed_at.isoformat() if video.completed_at else None,
             'duration': video.duration,
             'file_size': video.file_size,
-            'download_url': f"/api/v1/videos/{video.id}/download" if video.status == 'completed' else None
+            'download_url': f"/api/videos/{video.id}/download" if video.status == 'completed' else None
         } for video in videos.items],
         'pagination': {
             'page': videos.page,
@@ -123,7 +123,7 @@ def get_video(video_id):
         'duration': video.duration,
         'file_size': video.file_size,
         'error_message': video.error_message,
-        'download_url': f"/api/v1/videos/{video.id}/download" if video.status == 'completed' else None
+        'download_url': f"/api/videos/{video.id}/download" if video.status == 'completed' else None
     })
 
 @api_bp.route('/videos', methods=['POST'])
@@ -132,10 +132,6 @@ def create_video():
     """Create a new video"""
     user = g.api_user
     
-    # Check if user can create video
-    if not user.can_create_video():
-        return jsonify({'error': 'Monthly video limit reached'}), 403
-    
     data = request.get_json()
     
     # Validate input
@@ -152,6 +148,19 @@ def create_video():
     if len(story) > current_app.config['MAX_TEXT_LENGTH']:
         return jsonify({'error': f'Story too long. Maximum {current_app.config["MAX_TEXT_LENGTH"]} characters.'}), 400
     
+    # Only assets from the user's catalog (and plan) reach the pipeline, never raw paths
+    background_path = resolve_asset_path(background_video, 'video', user)
+    if background_video and not background_path:
+        return jsonify({'error': 'Unknown background video'}), 400
+    music_path = resolve_asset_path(background_music, 'music', user)
+    if background_music and not music_path:
+        return jsonify({'error': 'Unknown background music'}), 400
+    
+    # Queued and running videos count toward the monthly limit, not just finished ones
+    if not reserve_videos(user):
+        db.session.rollback()
+        return jsonify({'error': 'Monthly video limit reached'}), 403
+    
     # Create video record
     video = Video()
     video.user_id = user.id
@@ -160,82 +169,126 @@ def create_video():
     video.voice_id = voice
     video.background_video = background_video
     video.background_music = background_music
+    video.resolution = user.get_plan_limits().get('render_profile', '720p')
     video.status = 'pending'
     db.session.add(video)
-    db.session.commit()
     
-    try:
-        # Generate video using existing logic
-        story_content = f"""Title: {title}
-Story:
-{story}
-"""
-        
-        # Save story to temporary file
-        temp_story_file = f'temp_story_{video.id}.txt'
-        with open(temp_story_file, 'w', encoding='utf-8') as f:
-            f.write(story_content)
-        
-        # Set up generation parameters
-        params = {
-            'filter': filter_profanity,
-            'voice': voice,
-            'background_video': background_video,
-            'background_music': background_music
+    params = {
+        'filter': filter_profanity,
+        'voice': voice,
+        'background_video': background_path,
+        'background_music': music_path,
+        'title': title,
+        'story': story,
+        'render_profile': video.resolution
+    }
+    job = enqueue_video(video, params, source='api')
+    
+    return jsonify({
+        'message': 'Video queued for generation',
+        'job_id': job.id,
+        'video': {
+            'id': video.id,
+            'title': video.title,
+            'status': video.status,
+            'created_at': video.created_at.isoformat(),
+            'status_url': f"/api/videos/{video.id}"
         }
-        
-        # Generate video
-        video_path = run_local_video_generation(**params)
-        
-        if video_path and os.path.exists(video_path):
-            # Update video record
-            video.status = 'completed'
-            video.output_path = video_path
-            video.completed_at = datetime.utcnow()
-            video.file_size = os.path.getsize(video_path)
-            
-            # Update user usage
-            user.videos_created_this_month += 1
-            
-            db.session.commit()
-            
-            # Log usage
-            log_usage(user.id, 'api_video_created', {
-                'video_id': video.id,
-                'title': title,
-                'file_size': video.file_size
-            })
-            
-            # Clean up temp file
-            if os.path.exists(temp_story_file):
-                os.remove(temp_story_file)
-            
-            return jsonify({
-                'message': 'Video created successfully',
-                'video': {
-                    'id': video.id,
-                    'title': video.title,
-                    'status': video.status,
-                    'created_at': video.created_at.isoformat(),
-                    'completed_at': video.completed_at.isoformat(),
-                    'file_size': video.file_size,
-                    'download_url': f"/api/v1/videos/{video.id}/download"
-                }
-            }), 201
-        else:
-            video.status = 'failed'
-            video.error_message = 'Video generation failed'
-            db.session.commit()
-            
-            return jsonify({'error': 'Video generation failed'}), 500
-            
-    except Exception as e:
-        video.status = 'failed'
-        video.error_message = str(e)
-        db.session.commit()
-        
-        current_app.logger.error(f"API video generation error: {e}")
-        return jsonify({'error': 'Video generation failed'}), 500
+    }), 202
+
+@api_bp.route('/videos/batch', methods=['POST'])
+@require_api_key
+def create_video_batch():
+    """Create many videos at once; all rows are inserted and queued in one transaction"""
+    user = g.api_user
+    
+    data = request.get_json() or {}
+    items = data.get('videos')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'A non-empty videos list is required'}), 400
+    if len(items) > current_app.config['MAX_BATCH_SIZE']:
+        return jsonify({'error': f'Too many videos. Maximum {current_app.config["MAX_BATCH_SIZE"]} per batch.'}), 400
+    
+    # Validate everything before inserting anything
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Each video must be an object'})
+            continue
+        if not str(item.get('title', '')).strip() or not str(item.get('story', '')).strip():
+            errors.append({'index': index, 'error': 'Title and story are required'})
+        elif len(str(item['story']).strip()) > current_app.config['MAX_TEXT_LENGTH']:
+            errors.append({'index': index, 'error': f'Story too long. Maximum {current_app.config["MAX_TEXT_LENGTH"]} characters.'})
+        for field, asset_type in (('background_video', 'video'), ('background_music', 'music')):
+            if item.get(field) and not resolve_asset_path(item[field], asset_type, user):
+                errors.append({'index': index, 'error': f'Unknown {field.replace("_", " ")}'})
+    if errors:
+        return jsonify({'error': 'Invalid videos in batch', 'errors': errors}), 400
+    
+    # One voice catalog lookup for the whole batch instead of one per video; it never waits on the provider
+    voices = voice_registry.get_voices_sync()
+    fallback_voice = voices[0]['voice_id'] if voices else None
+    
+    # The whole batch must fit in what is left of the monthly allowance, queued videos included
+    if not reserve_videos(user, len(items)):
+        db.session.rollback()
+        remaining = user.get_plan_limits().get('videos_per_month', 0) - user.videos_created_this_month
+        return jsonify({'error': f'Monthly video limit reached. {max(remaining, 0)} videos left this month.'}), 403
+    
+    resolution = user.get_plan_limits().get('render_profile', '720p')
+    pairs = []
+    for item in items:
+        video = Video()
+        video.user_id = user.id
+        video.title = str(item['title']).strip()
+        video.story_content = str(item['story']).strip()
+        video.voice_id = item.get('voice', 'en_us_002')
+        video.background_video = item.get('background_video')
+        video.background_music = item.get('background_music')
+        video.resolution = resolution
+        db.session.add(video)
+        pairs.append((video, {
+            'filter': item.get('filter', False),
+            'voice': video.voice_id,
+            'background_video': resolve_asset_path(video.background_video, 'video', user),
+            'background_music': resolve_asset_path(video.background_music, 'music', user),
+            'title': video.title,
+            'story': video.story_content,
+            'fresh_transcript': bool(item.get('fresh_transcript', False)),
+            'render_profile': resolution,
+            'fallback_voice': fallback_voice
+        }))
+    batch, jobs = enqueue_batch(user, pairs)
+    
+    log_usage(user.id, 'api_batch_created', {
+        'batch_id': batch.id,
+        'videos': batch.size,
+        'shared_transcripts': sum(1 for job in jobs if job.leader_id)
+    })
+    
+    return jsonify({
+        'message': 'Batch queued for generation',
+        'batch_id': batch.id,
+        'status_url': f"/api/videos/batch/{batch.id}",
+        'videos': [{
+            'id': job.video.id,
+            'job_id': job.id,
+            'title': job.video.title,
+            'status': job.video.status
+        } for job in jobs]
+    }), 202
+
+@api_bp.route('/videos/batch/<batch_id>', methods=['GET'])
+@require_api_key
+def get_video_batch(batch_id):
+    """Aggregate status of a batch"""
+    user = g.api_user
+    
+    batch = VideoBatch.query.filter_by(id=batch_id, user_id=user.id).first()
+    if not batch:
+        return jsonify({'error': 'Batch not found'}), 404
+    
+    return jsonify(batch_status(batch))
 
 @api_bp.route('/usage', methods=['GET'])
 @require_api_key
@@ -0,0 +1,59 @@
+import os
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+from reddit_shorts.render_plan import RENDER_PROFILES
+
+def child_cpu_seconds():
+    """User plus system CPU time of all finished child processes"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def encode_synthetic(profile, duration, output_path):
+    """Encode synthetic video and audio with a profile's settings, returning (wall, cpu) seconds"""
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size={profile.width}x{profile.height}:rate={profile.fps}:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=44100:duration={duration}',
+        '-map', '0:v', '-map', '1:a'
+    ] + profile.video_args() + profile.audio_args() + [output_path]
+
+    cpu_before = child_cpu_seconds()
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True)
+    return time.perf_counter() - start, child_cpu_seconds() - cpu_before
+
+def run_benchmark(args):
+    """Measure encode throughput and CPU cost of each render profile"""
+    names = args.profiles or list(RENDER_PROFILES)
+    print(f"Synthetic input: {args.duration:g}s per run, best of {args.repeat}")
+    print(f"{'profile':>8} {'size':>10} {'preset':>9} {'wall (s)':>9} {'encode fps':>11} {'cpu-s/out-min':>14} {'MB/out-min':>11}")
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        for name in names:
+            profile = RENDER_PROFILES[name]
+            output_path = os.path.join(output_dir, f'{name}.mp4')
+            runs = [encode_synthetic(profile, args.duration, output_path) for _ in range(args.repeat)]
+            wall, cpu = min(runs)
+            minutes = args.duration / 60
+            size_mb = os.path.getsize(output_path) / (1024 * 1024)
+            print(f"{name:>8} {profile.width}x{profile.height:<5} {profile.preset:>9} {wall:>9.2f} "
+                  f"{args.duration * profile.fps / wall:>11.1f} {cpu / minutes:>14.1f} {size_mb / minutes:>11.1f}")
+    finally:
+        for entry in os.listdir(output_dir):
+            os.unlink(os.path.join(output_dir, entry))
+        os.rmdir(output_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark encode throughput and CPU cost per render profile')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of synthetic input per run')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per profile; the fastest is reported')
+    parser.add_argument('profiles', nargs='*', help=f"Profiles to run (default: all of {', '.join(RENDER_PROFILES)})")
+    args = parser.parse_args()
+    unknown = [name for name in args.profiles if name not in RENDER_PROFILES]
+    if unknown:
+        parser.error(f"unknown profile(s): {', '.join(unknown)}")
+    run_benchmark(args)
@@ -0,0 +1,64 @@
+import os
+import io
+import time
+import asyncio
+import argparse
+import random
+import tempfile
+import shutil
+import contextlib
+from reddit_shorts import main as pipeline
+
+def make_transcript(line_count):
+    """Build a synthetic two-agent transcript"""
+    agents = ['JOE_ROGAN', 'BEN_SHAPIRO']
+    return [
+        {'agentId': agents[i % 2], 'text': f'Synthetic line {i}'}
+        for i in range(line_count)
+    ]
+
+def make_fake_generate_audio(latency, jitter):
+    """Stand-in for the Speechify call that only sleeps for a simulated round trip"""
+    async def fake_generate_audio(voice_id, person, line, index, output_dir):
+        await asyncio.sleep(max(0.0, random.gauss(latency, jitter)))
+        audio_path = os.path.join(output_dir, f'{person}-{index}.mp3')
+        with open(audio_path, 'wb') as f:
+            f.write(b'')
+        return audio_path
+    return fake_generate_audio
+
+async def time_synthesis(line_count, concurrency):
+    """Time one synthesize_transcript run"""
+    output_dir = tempfile.mkdtemp()
+    try:
+        # Silence the per-line progress output so the table stays readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            await pipeline.synthesize_transcript(make_transcript(line_count), 'en_us_002', output_dir, concurrency)
+            return time.perf_counter() - start
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+async def run_benchmark(args):
+    """Compare serial and concurrent TTS latency over a range of line counts"""
+    random.seed(args.seed)
+    pipeline.generate_audio = make_fake_generate_audio(args.latency, args.jitter)
+
+    print(f"Simulated TTS latency: {args.latency:.2f}s +/- {args.jitter:.2f}s, "
+          f"per-job concurrency: {args.concurrency}, per-process: {pipeline.TTS_CONCURRENCY_PER_PROCESS}")
+    print(f"{'lines':>6} {'serial (s)':>12} {'concurrent (s)':>16} {'speedup':>9}")
+
+    for line_count in range(1, args.max_lines + 1):
+        serial = min([await time_synthesis(line_count, 1) for _ in range(args.repeat)])
+        concurrent = min([await time_synthesis(line_count, args.concurrency) for _ in range(args.repeat)])
+        print(f"{line_count:>6} {serial:>12.3f} {concurrent:>16.3f} {serial / concurrent:>8.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark transcript TTS latency as a function of line count')
+    parser.add_argument('--latency', type=float, default=0.8, help='Mean simulated TTS round trip in seconds')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Standard deviation of the simulated round trip')
+    parser.add_argument('--concurrency', type=int, default=pipeline.TTS_CONCURRENCY_PER_JOB, help='Per-job concurrency limit')
+    parser.add_argument('--max-lines', type=int, default=14, help='Largest transcript to benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the simulated latency jitter')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per data point (best is reported)')
+    asyncio.run(run_benchmark(parser.parse_args()))
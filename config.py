@@ -18,9 +18,38 @@ class Config:
     
     # File upload configuration
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
+    BLOB_FOLDER = os.getenv('BLOB_FOLDER', os.path.join(UPLOAD_FOLDER, 'blobs'))  # content-addressed upload store
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
+    ALLOWED_EXTENSIONS = {'mp4', 'mov', 'webm', 'mkv', 'avi', 'mp3', 'wav', 'm4a', 'ogg', 'flac', 'png', 'jpg', 'jpeg', 'gif'}
+    
+    # Chunked uploads: each chunk is one request, so it must stay under MAX_CONTENT_LENGTH
+    MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 100 * 1024 * 1024))  # 100MB
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))  # 8MB
+    UPLOAD_SESSION_HOURS = int(os.getenv('UPLOAD_SESSION_HOURS', 24))
     MAX_TEXT_LENGTH = int(os.getenv('MAX_TEXT_LENGTH', 5000))  # 5000 characters
     
+    # Generation job queue (worker.py claims jobs from the database)
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 2))  # seconds between polls when idle
+    JOB_HEARTBEAT_SECONDS = int(os.getenv('JOB_HEARTBEAT_SECONDS', 15))
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 120))  # running jobs without a heartbeat this long are requeued
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 500))  # videos per POST /api/videos/batch
+    # Uploads are probed, previewed and transcoded to mezzanines by the workers; claims older than this are retried
+    ASSET_TASK_STALE_SECONDS = int(os.getenv('ASSET_TASK_STALE_SECONDS', 4 * 3600))
+    ASSET_TASK_MAX_WORKERS = int(os.getenv('ASSET_TASK_MAX_WORKERS', 1))  # workers on upload tasks at once; the rest render
+    
+    # Job progress streams (Server-Sent Events)
+    JOB_EVENTS_POLL_INTERVAL = float(os.getenv('JOB_EVENTS_POLL_INTERVAL', 1))  # one jobs-table poll per web process
+    JOB_EVENTS_KEEPALIVE = int(os.getenv('JOB_EVENTS_KEEPALIVE', 15))
+    JOB_EVENTS_MAX_SECONDS = int(os.getenv('JOB_EVENTS_MAX_SECONDS', 600))  # clients reconnect after this
+    # Open streams per web process; each holds a gunicorn thread, so keep this well under --threads
+    JOB_EVENTS_MAX_STREAMS = int(os.getenv('JOB_EVENTS_MAX_STREAMS', 16))
+    JOB_EVENTS_RETRY_AFTER = int(os.getenv('JOB_EVENTS_RETRY_AFTER', 10))  # seconds, sent with 503 when full
+    
+    # Downloads: hand the transfer to nginx's internal location instead of a gunicorn worker
+    USE_X_ACCEL_REDIRECT = os.getenv('USE_X_ACCEL_REDIRECT', 'False').lower() == 'true'
+    X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '/protected-uploads/')
+    
     # Redis configuration
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     
@@ -36,6 +65,9 @@ class Config:
             'videos_per_month': 3,
             'max_text_length': 1000,
             'api_calls_per_month': 0,
+            'render_profile': '720p',
+            'queue_priority': 0,  # higher plans are scheduled first
+            'max_concurrent_jobs': 1,
             'features': ['Basic voices', 'Standard backgrounds', '720p quality']
         },
         'pro': {
@@ -44,6 +76,9 @@ class Config:
             'videos_per_month': 50,
             'max_text_length': 3000,
             'api_calls_per_month': 1000,
+            'render_profile': '1080p',
+            'queue_priority': 1,
+            'max_concurrent_jobs': 2,
             'features': ['All voices', 'Premium backgrounds', '1080p quality', 'API access']
         },
         'business': {
@@ -52,6 +87,9 @@ class Config:
             'videos_per_month': 500,
             'max_text_length': 5000,
             'api_calls_per_month': 10000,
+            'render_profile': '4k',
+            'queue_priority': 2,
+            'max_concurrent_jobs': 5,
             'features': ['All voices', 'All backgrounds', '4K quality', 'Priority support', 'Custom branding']
         }
     } 
\ No newline at end of file
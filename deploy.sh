@@ -9,8 +9,9 @@ echo "🚀 Starting production deployment..."
 sudo mkdir -p /var/log/brainrot-generator
 sudo chown ubuntu:ubuntu /var/log/brainrot-generator
 
-# Copy systemd service file
+# Copy systemd service files
 sudo cp brainrot-generator.service /etc/systemd/system/
+sudo cp brainrot-worker@.service /etc/systemd/system/
 sudo systemctl daemon-reload
 
 # Copy Nginx configuration
@@ -30,9 +31,19 @@ mkdir -p uploads
 sudo chown -R ubuntu:ubuntu /home/ubuntu/brainrot-generator-main
 chmod +x deploy.sh
 
+# Add tables and columns new in this release; create_all() alone never alters existing tables
+FLASK_APP=run.py venv/bin/flask upgrade-db
+
 # Enable and start services
 sudo systemctl enable brainrot-generator
 sudo systemctl start brainrot-generator
+
+# Render workers (one video at a time each)
+WORKER_COUNT=${WORKER_COUNT:-2}
+for i in $(seq 1 $WORKER_COUNT); do
+    sudo systemctl enable brainrot-worker@$i
+    sudo systemctl restart brainrot-worker@$i
+done
 sudo systemctl restart nginx
 
 # Check service status
@@ -46,4 +57,5 @@ echo "📝 Don't forget to:"
 echo "   1. Update production.env with your actual configuration"
 echo "   2. Set up SSL certificates with Let's Encrypt"
 echo "   3. Configure your domain DNS"
-echo "   4. Set up monitoring and logging" 
\ No newline at end of file
+echo "   4. Set up monitoring and logging"
+echo "   5. Re-run 'FLASK_APP=run.py flask upgrade-db' after every update, before restarting the services" 
\ No newline at end of file
@@ -82,7 +82,8 @@ sudo -u postgres psql -c "GRANT ALL PRIVILEGES ON DATABASE brainrot_db TO brainr
 # Initialize database
 echo -e "${YELLOW}🗄️  Initializing database...${NC}"
 source venv/bin/activate
-flask init-db
+# Creates the tables, and adds columns to existing ones when re-run after an update
+FLASK_APP=run.py flask upgrade-db
 
 # Create upload directory
 mkdir -p uploads
@@ -0,0 +1,132 @@
+import json
+import time
+import queue
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from extensions import db
+from models import GenerationJob
+from jobs import job_event
+
+# Finished jobs are still reported for this long, so a completion isn't missed between polls
+FINISHED_LOOKBACK_SECONDS = 60
+LISTENER_BACKLOG = 100
+
+class JobListener:
+    """One event stream: a user's jobs, or a single one of their videos"""
+    
+    def __init__(self, user_id, video_id=None):
+        self.user_id = user_id
+        self.video_id = video_id
+        self.queue = queue.Queue(maxsize=LISTENER_BACKLOG)
+        self._last = {}
+    
+    def push(self, event):
+        """Queue an event unless it's for another video or repeats what was last sent"""
+        if self.video_id is not None and event['video_id'] != self.video_id:
+            return
+        if self._last.get(event['job_id']) == event:
+            return
+        self._last[event['job_id']] = event
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # A stalled client only needs the newest state
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(event)
+            except (queue.Empty, queue.Full):
+                pass
+
+class JobEventHub:
+    """Fans job progress out to every event stream in this process.
+    
+    A single poller thread reads the jobs of all subscribed users once per interval
+    and hands each listener what changed, so database load doesn't grow with the
+    number of open streams. The thread exits when the last listener leaves.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = {}  # user_id -> set of JobListener
+        self._thread = None
+    
+    def subscribe(self, app, user_id, video_id=None):
+        """Register a stream, or return None when this process already serves its maximum.
+        
+        Each open stream holds a web worker thread, so the cap keeps streams from
+        starving every other request.
+        """
+        listener = JobListener(user_id, video_id)
+        with self._lock:
+            if sum(len(found) for found in self._listeners.values()) >= app.config['JOB_EVENTS_MAX_STREAMS']:
+                return None
+            self._listeners.setdefault(user_id, set()).add(listener)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._poll, args=(app,), name='job-events', daemon=True)
+                self._thread.start()
+        return listener
+    
+    def unsubscribe(self, listener):
+        with self._lock:
+            listeners = self._listeners.get(listener.user_id)
+            if listeners is not None:
+                listeners.discard(listener)
+                if not listeners:
+                    del self._listeners[listener.user_id]
+    
+    def _poll(self, app):
+        interval = app.config['JOB_EVENTS_POLL_INTERVAL']
+        with app.app_context():
+            while True:
+                with self._lock:
+                    if not self._listeners:
+                        self._thread = None
+                        return
+                    listeners = {user_id: list(found) for user_id, found in self._listeners.items()}
+                try:
+                    self._publish(listeners)
+                except Exception as e:
+                    print(f'Warning: Job event poll failed: {e}')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+                time.sleep(interval)
+    
+    def _publish(self, listeners):
+        since = datetime.utcnow() - timedelta(seconds=FINISHED_LOOKBACK_SECONDS)
+        jobs = GenerationJob.query.options(joinedload(GenerationJob.video))\
+            .filter(GenerationJob.user_id.in_(list(listeners)))\
+            .filter(or_(GenerationJob.status.in_(('queued', 'running')), GenerationJob.updated_at >= since))\
+            .all()
+        for job in jobs:
+            event = job_event(job)
+            for listener in listeners.get(job.user_id, ()):
+                listener.push(event)
+
+job_events = JobEventHub()
+
+def is_final(event):
+    return event['status'] in ('completed', 'failed')
+
+def event_stream(listener, keepalive, max_seconds, until_final=False):
+    """Server-Sent Events for a listener; unsubscribes when the client goes away.
+    
+    Streams are closed after max_seconds so long-lived connections get rebalanced;
+    EventSource reconnects on its own.
+    """
+    try:
+        yield 'retry: 3000\n\n'
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            try:
+                event = listener.queue.get(timeout=keepalive)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+            if until_final and is_final(event):
+                return
+    finally:
+        job_events.unsubscribe(listener)
@@ -0,0 +1,522 @@
+import os
+import uuid
+import socket
+import asyncio
+import threading
+import aiohttp
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, or_
+from sqlalchemy.orm import aliased, joinedload
+from extensions import db
+from models import GenerationJob, VideoBatch, User, BackgroundAsset
+from utils import log_usage, process_uploaded_asset
+from reddit_shorts.main import run_local_video_generation
+from reddit_shorts.render import index_footage
+from reddit_shorts.resilience import CircuitOpenError, ProviderError
+from reddit_shorts.runtime import run_sync
+
+RETRY_BACKOFF_SECONDS = 30
+# Failures worth another attempt later; anything else (bad params, render errors) fails the same way again
+RETRYABLE_ERRORS = (ProviderError, CircuitOpenError, aiohttp.ClientError, asyncio.TimeoutError)
+WAIT_PERCENTILES = (50, 90, 95, 99)
+
+class JobProgress:
+    """Latest pipeline progress of a running job.
+    
+    The pipeline reports on the render loop thread; the worker's writer thread takes
+    the newest state whenever `changed` is set, so bursts of updates cost one write.
+    """
+    
+    def __init__(self):
+        self.changed = threading.Event()
+        self._lock = threading.Lock()
+        self._state = None
+        self._transcript = None
+    
+    def __call__(self, stage, percent, message=None):
+        with self._lock:
+            self._state = (stage, int(percent), message)
+        self.changed.set()
+    
+    def share_transcript(self, transcript):
+        """Hand a voiced transcript to the writer thread for the job's batch followers"""
+        with self._lock:
+            self._transcript = transcript
+        self.changed.set()
+    
+    def take(self):
+        """The state and transcript reported since the last call (either may be None)"""
+        self.changed.clear()
+        with self._lock:
+            state, self._state = self._state, None
+            transcript, self._transcript = self._transcript, None
+        return state, transcript
+
+def default_worker_id():
+    """Identify a worker process in the jobs table"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def plan_settings(plan):
+    """Scheduling settings of a subscription plan (unknown plans schedule as free)"""
+    plans = current_app.config['SUBSCRIPTION_PLANS']
+    return plans.get(plan) or plans['free']
+
+def reserve_videos(user, count=1):
+    """Take videos from the user's monthly allowance when they are queued, not when they finish.
+    
+    The conditional UPDATE makes concurrent submissions race-free; the reservation is
+    committed with the queued jobs and handed back by _fail_job. Returns False when
+    fewer than count videos are left.
+    """
+    limit = user.get_plan_limits().get('videos_per_month', 0)
+    reserved = User.query.filter(User.id == user.id, User.videos_created_this_month + count <= limit)\
+        .update({User.videos_created_this_month: User.videos_created_this_month + count}, synchronize_session='fetch')
+    return reserved == 1
+
+def enqueue_video(video, params, source='web'):
+    """Queue a pending video for the workers; committed together with the video row"""
+    user = User.query.get(video.user_id)
+    job = GenerationJob()
+    job.video = video
+    job.user_id = video.user_id
+    job.params = params
+    job.source = source
+    job.plan = user.subscription_plan
+    job.priority = plan_settings(user.subscription_plan).get('queue_priority', 0)
+    job.status = 'queued'
+    video.status = 'pending'
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def enqueue_batch(user, items):
+    """Queue (video, params) pairs as one batch in a single transaction.
+    
+    Videos with the same story (and no fresh transcript requested) share one LLM call:
+    the first becomes the leader, and the rest wait until its transcript is voiced,
+    then reuse it with every line already in the TTS cache.
+    """
+    batch = VideoBatch(id=uuid.uuid4().hex, user_id=user.id, size=len(items))
+    db.session.add(batch)
+    settings = plan_settings(user.subscription_plan)
+    
+    leaders = {}
+    followers = []
+    jobs = []
+    for video, params in items:
+        video.status = 'pending'
+        job = GenerationJob()
+        job.video = video
+        job.user_id = user.id
+        job.params = params
+        job.source = 'api'
+        job.plan = user.subscription_plan
+        job.priority = settings.get('queue_priority', 0)
+        job.batch_id = batch.id
+        job.status = 'queued'
+        db.session.add(job)
+        
+        story = None if params.get('fresh_transcript') else params.get('story')
+        if story in leaders:
+            followers.append((job, leaders[story]))
+        elif story is not None:
+            leaders[story] = job
+        jobs.append(job)
+    
+    # Leaders need ids before followers can point at them
+    db.session.flush()
+    for job, leader in followers:
+        job.leader_id = leader.id
+    db.session.commit()
+    return batch, jobs
+
+def claim_next_job(worker_id):
+    """Claim the next job: highest plan first, taking turns between users within a plan.
+    
+    Users already running their plan's max_concurrent_jobs are skipped, so one user's
+    backlog can't hold every worker. Within a plan the user served least recently goes
+    next, and gets their oldest job. The claim is a conditional UPDATE on status, so two
+    workers racing for the same row can't both win; the loser moves on.
+    """
+    now = datetime.utcnow()
+    # Each user's oldest runnable job per priority; batch followers wait for their leader's transcript
+    leader = aliased(GenerationJob)
+    heads = db.session.query(GenerationJob.user_id, GenerationJob.priority, GenerationJob.plan, func.min(GenerationJob.id))\
+        .outerjoin(leader, GenerationJob.leader_id == leader.id)\
+        .filter(GenerationJob.status == 'queued', GenerationJob.available_at <= now)\
+        .filter(or_(GenerationJob.leader_id.is_(None), leader.transcript_at.isnot(None),
+                    leader.status.in_(('completed', 'failed'))))\
+        .group_by(GenerationJob.user_id, GenerationJob.priority, GenerationJob.plan)\
+        .all()
+    if not heads:
+        return None
+    
+    user_ids = {user_id for user_id, _, _, _ in heads}
+    running = dict(db.session.query(GenerationJob.user_id, func.count(GenerationJob.id))
+                   .filter(GenerationJob.status == 'running', GenerationJob.user_id.in_(user_ids))
+                   .group_by(GenerationJob.user_id).all())
+    last_served = dict(db.session.query(GenerationJob.user_id, func.max(GenerationJob.started_at))
+                       .filter(GenerationJob.user_id.in_(user_ids))
+                       .group_by(GenerationJob.user_id).all())
+    heads.sort(key=lambda head: (-(head[1] or 0), last_served.get(head[0]) or datetime.min, head[3]))
+    
+    for user_id, _, plan, job_id in heads:
+        limit = plan_settings(plan).get('max_concurrent_jobs', 1)
+        if running.get(user_id, 0) >= limit:
+            continue
+        
+        claimed = GenerationJob.query.filter_by(id=job_id, status='queued').update({
+            'status': 'running',
+            'worker_id': worker_id,
+            'attempts': GenerationJob.attempts + 1,
+            'started_at': now,
+            'heartbeat_at': now
+        }, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            continue
+        
+        # Another worker may have started one of this user's jobs since the count above
+        if GenerationJob.query.filter_by(user_id=user_id, status='running').count() > limit:
+            GenerationJob.query.filter_by(id=job_id, worker_id=worker_id).update({
+                'status': 'queued',
+                'worker_id': None,
+                'attempts': GenerationJob.attempts - 1,
+                'started_at': None,
+                'heartbeat_at': None
+            }, synchronize_session=False)
+            db.session.commit()
+            continue
+        
+        job = GenerationJob.query.get(job_id)
+        if job.queue_wait is None:
+            job.queue_wait = (now - job.created_at).total_seconds()
+            db.session.commit()
+        return job
+    return None
+
+def _asset_tasks_running():
+    return BackgroundAsset.query.filter(or_(BackgroundAsset.processing_status == 'running',
+                                            BackgroundAsset.mezzanine_status == 'running')).count()
+
+def _claim_asset_task(status, started_at):
+    """Claim the oldest asset queued on a task's status column.
+    
+    Upload tasks decode or transcode whole files, so at most ASSET_TASK_MAX_WORKERS workers
+    run them at once; the rest stay on render jobs, which keep their plan priority and fair share.
+    """
+    limit = current_app.config['ASSET_TASK_MAX_WORKERS']
+    if _asset_tasks_running() >= limit:
+        return None
+    asset = BackgroundAsset.query.filter(status == 'queued').order_by(BackgroundAsset.id).first()
+    if asset is None:
+        return None
+    claimed = BackgroundAsset.query.filter(BackgroundAsset.id == asset.id, status == 'queued').update({
+        status: 'running',
+        started_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return None
+    
+    # Another worker may have claimed a task since the count above
+    if _asset_tasks_running() > limit:
+        BackgroundAsset.query.filter(BackgroundAsset.id == asset.id, status == 'running').update({
+            status: 'queued',
+            started_at: None
+        }, synchronize_session=False)
+        db.session.commit()
+        return None
+    return BackgroundAsset.query.get(asset.id)
+
+def claim_asset_processing():
+    """Claim an upload waiting for its metadata and catalog previews, oldest first"""
+    return _claim_asset_task(BackgroundAsset.processing_status, BackgroundAsset.processing_started_at)
+
+def claim_asset_indexing():
+    """Claim an uploaded video waiting for its render mezzanines, oldest first"""
+    return _claim_asset_task(BackgroundAsset.mezzanine_status, BackgroundAsset.mezzanine_started_at)
+
+def run_asset_processing(asset):
+    """Probe a claimed upload and build its previews; a usable video is then queued for mezzanines"""
+    run_sync(process_uploaded_asset(current_app._get_current_object(), asset.id, asset.file_path, asset.asset_type))
+    db.session.expire_all()
+    return BackgroundAsset.query.get(asset.id).processing_status == 'done'
+
+def run_asset_indexing(asset):
+    """Transcode a claimed asset to the mezzanine its owner's plan renders at, and index its keyframes"""
+    # Shared catalog footage gets the default profile; other sizes are built when a render first needs them
+    owner = User.query.get(asset.user_id) if asset.user_id else None
+    profile = plan_settings(owner.subscription_plan).get('render_profile') if owner else None
+    try:
+        run_sync(index_footage(asset.file_path, [profile] if profile else None))
+        status = 'ready'
+    except Exception as e:
+        current_app.logger.error(f"Mezzanine build failed (asset {asset.id}): {e}")
+        status = 'failed'
+    # Uploads of the same content share the files
+    query = BackgroundAsset.query.filter(BackgroundAsset.id == asset.id)
+    if asset.blob_id:
+        query = BackgroundAsset.query.filter(BackgroundAsset.blob_id == asset.blob_id,
+                                             BackgroundAsset.asset_type == 'video')
+    query.update({'mezzanine_status': status}, synchronize_session=False)
+    db.session.commit()
+    return status == 'ready'
+
+def touch_job(job_id, worker_id, state=None, transcript=None):
+    """Refresh the heartbeat, and progress or shared transcript if given, of a job this worker still owns"""
+    now = datetime.utcnow()
+    values = {'heartbeat_at': now, 'updated_at': now}
+    if state is not None:
+        values['stage'], values['progress'], values['progress_message'] = state
+    if transcript is not None:
+        values['transcript'] = transcript
+        values['transcript_at'] = now
+    updated = GenerationJob.query.filter_by(id=job_id, status='running', worker_id=worker_id)\
+        .update(values, synchronize_session=False)
+    db.session.commit()
+    return bool(updated)
+
+def requeue_stale_jobs():
+    """Put back jobs whose worker died mid-render, or fail them once they are out of attempts"""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_STALE_SECONDS'])
+    stale = GenerationJob.query.filter(GenerationJob.status == 'running', GenerationJob.heartbeat_at < cutoff).all()
+    for job in stale:
+        out_of_attempts = job.attempts >= current_app.config['JOB_MAX_ATTEMPTS']
+        # The worker may have come back and settled the job since the query above
+        if not _settle_job(job, 'failed' if out_of_attempts else 'queued', GenerationJob.heartbeat_at < cutoff):
+            continue
+        print(f'Job {job.id} lost its worker ({job.worker_id})')
+        if out_of_attempts:
+            _fail_job(job, 'Worker stopped responding')
+        else:
+            _retry_job(job, 'Worker stopped responding', delay=0)
+    
+    # Upload tasks have no heartbeat; a claim this old belonged to a worker that died
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['ASSET_TASK_STALE_SECONDS'])
+    for status, started_at in ((BackgroundAsset.processing_status, BackgroundAsset.processing_started_at),
+                               (BackgroundAsset.mezzanine_status, BackgroundAsset.mezzanine_started_at)):
+        BackgroundAsset.query.filter(status == 'running', started_at < cutoff)\
+            .update({status: 'queued'}, synchronize_session=False)
+    db.session.commit()
+    return len(stale)
+
+def run_job(job, progress=None, on_rendered=None):
+    """Render a claimed job and record the outcome on the job and its video.
+    
+    on_rendered is called once the pipeline returns, before the outcome is written,
+    so the worker can flush the last progress while the job is still running. The
+    outcome is only written if this worker still holds the job; the stale sweep may
+    have handed it to another one.
+    """
+    worker_id = job.worker_id
+    held = GenerationJob.worker_id == worker_id
+    video = job.video
+    video.status = 'processing'
+    video.error_message = None
+    job.stage = None
+    job.progress = 0
+    job.progress_message = None
+    db.session.commit()
+    
+    # Batch jobs: followers reuse their leader's transcript, leaders publish theirs
+    shared = {}
+    if job.leader_id:
+        leader = GenerationJob.query.get(job.leader_id)
+        if leader and leader.transcript_at:
+            shared['transcript'] = leader.transcript
+    elif job.batch_id and progress is not None:
+        shared['on_transcript'] = progress.share_transcript
+    
+    try:
+        try:
+            result = run_sync(run_local_video_generation(**job.params, progress=progress, **shared))
+        finally:
+            if on_rendered is not None:
+                on_rendered()
+    except Exception as e:
+        current_app.logger.error(f"Video generation error (job {job.id}): {e}")
+        retry = _worth_retrying(e) and job.attempts < current_app.config['JOB_MAX_ATTEMPTS']
+        if not _settle_job(job, 'queued' if retry else 'failed', held):
+            return _lost_job(job)
+        if retry:
+            _retry_job(job, str(e), delay=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+        else:
+            _fail_job(job, str(e))
+        db.session.commit()
+        return False
+    
+    if not result or not os.path.exists(result.output_path):
+        # Render failures are deterministic; retrying would fail the same way
+        if not _settle_job(job, 'failed', held):
+            return _lost_job(job)
+        _fail_job(job, 'Video generation failed')
+        db.session.commit()
+        return False
+    
+    if not _settle_job(job, 'completed', held):
+        return _lost_job(job)
+    now = datetime.utcnow()
+    video.status = 'completed'
+    video.output_path = result.output_path
+    video.completed_at = now
+    video.file_size = result.size
+    video.duration = result.duration
+    job.status = 'completed'
+    job.finished_at = now
+    job.error_message = None
+    job.progress = 100
+    job.progress_message = None
+    
+    # The video was counted toward the monthly allowance when it was queued
+    db.session.commit()
+    
+    log_usage(job.user_id, 'api_video_created' if job.source == 'api' else 'video_created', {
+        'video_id': video.id,
+        'title': video.title,
+        'duration': video.duration,
+        'file_size': video.file_size
+    })
+    return True
+
+def _worth_retrying(error):
+    if isinstance(error, ProviderError):
+        return error.retryable
+    return isinstance(error, RETRYABLE_ERRORS)
+
+def _settle_job(job, status, *criteria):
+    """Move a running job to its outcome status, if criteria still hold, so only one settler wins.
+    
+    The caller writes the rest of the outcome in the same transaction.
+    """
+    settled = GenerationJob.query.filter(GenerationJob.id == job.id, GenerationJob.status == 'running', *criteria)\
+        .update({'status': status}, synchronize_session=False)
+    return settled == 1
+
+def _lost_job(job):
+    db.session.rollback()
+    print(f'Job {job.id} is no longer held by this worker; dropping its outcome')
+    return False
+
+def _retry_job(job, error, delay):
+    job.status = 'queued'
+    job.worker_id = None
+    job.error_message = error
+    job.available_at = datetime.utcnow() + timedelta(seconds=delay)
+    job.stage = None
+    job.progress = 0
+    job.progress_message = f'Retrying in {delay}s' if delay else 'Retrying'
+    job.video.status = 'pending'
+
+def _fail_job(job, error):
+    # Failed videos don't count toward the monthly allowance
+    User.query.filter(User.id == job.user_id, User.videos_created_this_month > 0)\
+        .update({User.videos_created_this_month: User.videos_created_this_month - 1}, synchronize_session='fetch')
+    job.status = 'failed'
+    job.error_message = error
+    job.finished_at = datetime.utcnow()
+    job.video.status = 'failed'
+    job.video.error_message = error
+
+def job_event(job):
+    """Progress of a job as pushed to event stream listeners"""
+    video = job.video
+    return {
+        'job_id': job.id,
+        'video_id': video.id,
+        'status': video.status,
+        'stage': job.stage,
+        'progress': job.progress or 0,
+        'message': job.progress_message,
+        'error_message': video.error_message if video.status == 'failed' else None,
+        'download_url': f"/api/videos/{video.id}/download" if video.status == 'completed' else None
+    }
+
+def job_status(job):
+    """What the status endpoints report about a job"""
+    video = job.video
+    return {
+        'job_id': job.id,
+        'video_id': video.id,
+        'status': video.status,
+        'stage': job.stage,
+        'progress': job.progress or 0,
+        'message': job.progress_message,
+        'plan': job.plan,
+        'attempts': job.attempts,
+        'queue_wait': job.queue_wait,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'error_message': video.error_message,
+        'download_url': f"/api/videos/{video.id}/download" if video.status == 'completed' else None
+    }
+
+def _percentile(values, percent):
+    """Nearest-rank percentile of sorted values"""
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+def queue_wait_stats(hours=24, plans=None):
+    """Queue wait percentiles per plan over jobs started in the last `hours`, plus the current backlog"""
+    plans = list(plans or current_app.config['SUBSCRIPTION_PLANS'])
+    now = datetime.utcnow()
+    since = now - timedelta(hours=hours)
+    waits = {}
+    for plan, wait in db.session.query(GenerationJob.plan, GenerationJob.queue_wait)\
+            .filter(GenerationJob.queue_wait.isnot(None), GenerationJob.started_at >= since,
+                    GenerationJob.plan.in_(plans)):
+        waits.setdefault(plan, []).append(wait)
+    backlog = {
+        plan: (count, oldest)
+        for plan, count, oldest in db.session.query(GenerationJob.plan, func.count(GenerationJob.id), func.min(GenerationJob.created_at))
+            .filter(GenerationJob.status == 'queued', GenerationJob.queue_wait.is_(None), GenerationJob.plan.in_(plans))
+            .group_by(GenerationJob.plan)
+    }
+    
+    stats = {}
+    for plan in plans:
+        values = sorted(waits.get(plan, []))
+        queued, oldest = backlog.get(plan, (0, None))
+        stats[plan] = {
+            'started': len(values),
+            **{f'p{p}': round(_percentile(values, p), 2) if values else None for p in WAIT_PERCENTILES},
+            'max': round(values[-1], 2) if values else None,
+            'queued': queued,
+            'oldest_queued_seconds': round((now - oldest).total_seconds(), 2) if oldest else None
+        }
+    return stats
+
+def batch_status(batch):
+    """Aggregate status of a batch, with each video's progress"""
+    jobs = GenerationJob.query.options(joinedload(GenerationJob.video))\
+        .filter_by(batch_id=batch.id)\
+        .order_by(GenerationJob.id)\
+        .all()
+    counts = {'pending': 0, 'processing': 0, 'completed': 0, 'failed': 0}
+    for job in jobs:
+        counts[job.video.status] = counts.get(job.video.status, 0) + 1
+    
+    finished = counts['completed'] + counts['failed']
+    if counts['completed'] == batch.size:
+        status = 'completed'
+    elif counts['failed'] == batch.size:
+        status = 'failed'
+    elif finished == batch.size:
+        status = 'partial'
+    elif finished or counts['processing']:
+        status = 'processing'
+    else:
+        status = 'pending'
+    
+    return {
+        'batch_id': batch.id,
+        'status': status,
+        'total': batch.size,
+        'counts': counts,
+        'progress': round(sum(100 if job.video.status in ('completed', 'failed') else (job.progress or 0)
+                              for job in jobs) / max(len(jobs), 1)),
+        'created_at': batch.created_at.isoformat(),
+        'videos': [job_event(job) for job in jobs]
+    }
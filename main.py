@@ -1,72 +1,23 @@
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, current_app, send_file, send_from_directory
+from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, current_app, send_file, send_from_directory, Response
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 import os
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import func
 from extensions import db
-from models import User, Video, BackgroundAsset, UsageLog
-from utils import log_usage, get_user_usage_stats, validate_file_upload, get_storage_path, format_file_size, generate_thumbnail
-from reddit_shorts.main import run_local_video_generation
-from reddit_shorts.tiktok_voice.src.voice import Voice
+from models import User, Video, BackgroundAsset, UsageLog, UploadSession, APIKey, GenerationJob
+from utils import log_usage, get_user_usage_stats, validate_file_upload, format_file_size, \
+    MEDIA_FORMATS_BY_TYPE, sniff_media_format, upload_part_lock, write_upload_chunk, truncate_upload_chunk, \
+    finish_upload_hash, discard_upload_hash, blob_staging_path, save_upload_stream, store_blob, release_blob, \
+    send_media_file, visible_assets, resolve_asset_path
+from jobs import reserve_videos, enqueue_video, job_status, job_event, queue_wait_stats
+from events import job_events, event_stream
+from reddit_shorts.voices import voice_registry
 from reddit_shorts.config import footage, music
 
 main_bp = Blueprint('main', __name__)
 
-# Voice name mapping
-VOICE_NAME_MAP = {
-    'en_male_jomboy': 'Game On',
-    'en_us_002': 'Jessie',
-    'es_mx_002': 'Warm',
-    'en_male_funny': 'Wacky',
-    'en_us_ghostface': 'Scream',
-    'en_female_samc': 'Empathetic',
-    'en_male_cody': 'Serious',
-    'en_female_makeup': 'Beauty Guru',
-    'en_female_richgirl': 'Bestie',
-    'en_male_grinch': 'Trickster',
-    'en_us_006': 'Joey',
-    'en_male_narration': 'Story Teller',
-    'en_male_deadpool': 'Mr. GoodGuy',
-    'en_uk_001': 'Narrator',
-    'en_uk_003': 'Male English UK',
-    'en_au_001': 'Metro',
-    'en_male_jarvis': 'Alfred',
-    'en_male_ashmagic': 'ashmagic',
-    'en_male_olantekkers': 'olantekkers',
-    'en_male_ukneighbor': 'Lord Cringe',
-    'en_male_ukbutler': 'Mr. Meticulous',
-    'en_female_shenna': 'Debutante',
-    'en_female_pansino': 'Varsity',
-    'en_male_trevor': 'Marty',
-    'en_female_f08_twinkle': 'Pop Lullaby',
-    'en_male_m03_classical': 'Classic Electric',
-    'en_female_betty': 'Bae',
-    'en_male_cupid': 'Cupid',
-    'en_female_grandma': 'Granny',
-    'en_male_m2_xhxs_m03_christmas': 'Cozy',
-    'en_male_santa_narration': 'Author',
-    'en_male_sing_deep_jingle': 'Caroler',
-    'en_male_santa_effect': 'Santa',
-    'en_female_ht_f08_newyear': 'NYE 2023',
-    'en_male_wizard': 'Magician',
-    'en_female_ht_f08_halloween': 'Opera',
-    'en_female_ht_f08_glorious': 'Euphoric',
-    'en_male_sing_funny_it_goes_up': 'Hypetrain',
-    'en_female_ht_f08_wonderful_world': 'Melodrama',
-    'en_male_m2_xhxs_m03_silly': 'Quirky Time',
-    'en_female_emotional': 'Peaceful',
-    'en_male_m03_sunshine_soon': 'Toon Beat',
-    'en_female_f08_warmy_breeze': 'Open Mic',
-    'en_male_sing_funny_thanksgiving': 'Thanksgiving',
-    'en_female_f08_salut_damour': 'Cottagecore',
-    'en_us_007': 'Professor',
-    'en_us_009': 'Scientist',
-    'en_us_010': 'Confidence',
-    'en_au_002': 'Smooth',
-    'fr_001': 'French - Male 1'
-}
-
 @main_bp.route('/')
 def index():
     """Serve React app"""
@@ -87,13 +38,13 @@ def serve_react(path):
 @main_bp.route('/api/voices')
 @login_required
 def get_voices():
-    return jsonify([
-        {
-            "voice_id": "emily",
-            "name": "Emily",
-            "description": "Default voice"
-        }
-    ])
+    """Get available TTS voices from the cached provider catalog (the bundled one until it loads)"""
+    voices = voice_registry.get_voices_sync()
+    return jsonify([{
+        'voice_id': voice['voice_id'],
+        'name': voice['name'],
+        'description': voice['description']
+    } for voice in voices])
 
 @main_bp.route('/api/backgrounds')
 @login_required
@@ -102,10 +53,8 @@ def get_backgrounds():
     backgrounds = []
     
     # Get from database first
-    db_backgrounds = BackgroundAsset.query.filter_by(
-        asset_type='video',
-        is_active=True
-    ).all()
+    # Unusable assets (unreadable, no video stream, too short) were flagged when indexed
+    db_backgrounds = visible_assets('video', current_user).filter(BackgroundAsset.is_usable.isnot(False)).all()
     
     for bg in db_backgrounds:
         # Check if premium content is available for user
@@ -117,7 +66,14 @@ def get_backgrounds():
             'name': bg.name,
             'path': bg.file_path,
             'thumbnail': bg.thumbnail_path,
-            'is_premium': bg.is_premium
+            'thumbnail_status': bg.thumbnail_status,
+            'sprite': bg.sprite_path,
+            'preview': bg.preview_path,
+            'is_premium': bg.is_premium,
+            'duration': bg.duration,
+            'width': bg.width,
+            'height': bg.height,
+            'fps': bg.fps
         })
     
     # Fallback to config backgrounds
@@ -142,10 +98,7 @@ def get_music():
     tracks = []
     
     # Get from database first
-    db_tracks = BackgroundAsset.query.filter_by(
-        asset_type='music',
-        is_active=True
-    ).all()
+    db_tracks = visible_assets('music', current_user).filter(BackgroundAsset.is_usable.isnot(False)).all()
     
     for track in db_tracks:
         # Check if premium content is available for user
@@ -157,7 +110,9 @@ def get_music():
             'name': track.name,
             'path': track.file_path,
             'type': track.category or 'general',
-            'is_premium': track.is_premium
+            'is_premium': track.is_premium,
+            'duration': track.duration,
+            'loudness': track.loudness
         })
     
     # Fallback to config music
@@ -179,10 +134,6 @@ def get_music():
 @login_required
 def generate_video():
     """Generate video"""
-    # Check if user can create video
-    if not current_user.can_create_video():
-        return jsonify({'error': 'Monthly video limit reached. Please upgrade your plan.'}), 403
-    
     data = request.get_json()
     
     # Validate input
@@ -192,6 +143,7 @@ def generate_video():
     background_video = data.get('background_video')
     background_music = data.get('background_music')
     filter_profanity = data.get('filter', False)
+    fresh_transcript = data.get('fresh_transcript', False)
     
     if not title or not story:
         return jsonify({'error': 'Title and story are required'}), 400
@@ -199,6 +151,19 @@ def generate_video():
     if len(story) > current_app.config.get('MAX_TEXT_LENGTH', 5000):
         return jsonify({'error': f'Story too long. Maximum {current_app.config.get("MAX_TEXT_LENGTH", 5000)} characters.'}), 400
     
+    # Only assets from the user's catalog (and plan) reach the pipeline, as in the API
+    background_path = resolve_asset_path(background_video, 'video', current_user)
+    if background_video and not background_path:
+        return jsonify({'error': 'Unknown background video'}), 400
+    music_path = resolve_asset_path(background_music, 'music', current_user)
+    if background_music and not music_path:
+        return jsonify({'error': 'Unknown background music'}), 400
+    
+    # Queued and running videos count toward the monthly limit, not just finished ones
+    if not reserve_videos(current_user):
+        db.session.rollback()
+        return jsonify({'error': 'Monthly video limit reached. Please upgrade your plan.'}), 403
+    
     # Create video record
     video = Video()
     video.user_id = current_user.id
@@ -207,88 +172,144 @@ def generate_video():
     video.voice_id = voice
     video.background_video = background_video
     video.background_music = background_music
+    video.resolution = current_user.get_plan_limits().get('render_profile', '720p')
     video.status = 'pending'
     db.session.add(video)
-    db.session.commit()
     
-    try:
-        # Generate video using existing logic
-        story_content = f"""Title: {title}
-Story:
-{story}
-"""
-        
-        # Save story to temporary file
-        temp_story_file = f'temp_story_{video.id}.txt'
-        with open(temp_story_file, 'w', encoding='utf-8') as f:
-            f.write(story_content)
-        
-        # Set up generation parameters
-        params = {
-            'filter': filter_profanity,
-            'voice': voice or 'en_us_002',
-            'background_video': background_video,
-            'background_music': background_music,
-            'title': title,
-            'story': story
-        }
-        
-        # Generate video
-        import asyncio
-        video_path = asyncio.run(run_local_video_generation(**params))
-        
-        if video_path and os.path.exists(video_path):
-            # Update video record
-            video.status = 'completed'
-            video.output_path = video_path
-            video.completed_at = datetime.utcnow()
-            video.file_size = os.path.getsize(video_path)
-            
-            # Get video duration
-            try:
-                import ffmpeg
-                probe = ffmpeg.probe(video_path)
-                video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
-                video.duration = float(video_info['duration'])
-            except:
-                video.duration = 0
-            
-            # Update user usage
-            current_user.videos_created_this_month += 1
-            
-            db.session.commit()
-            
-            # Log usage
-            log_usage(current_user.id, 'video_created', {
-                'video_id': video.id,
-                'title': title,
-                'duration': video.duration,
-                'file_size': video.file_size
-            })
-            
-            # Clean up temp file
-            if os.path.exists(temp_story_file):
-                os.remove(temp_story_file)
-            
-            return jsonify({
-                'message': 'Video generated successfully',
-                'video_id': video.id,
-                'download_url': url_for('main.download_video', video_id=video.id)
-            }), 200
-        else:
-            video.status = 'failed'
-            video.error_message = 'Video generation failed'
-            db.session.commit()
-            
-            return jsonify({'error': 'Video generation failed'}), 500
-            
-    except Exception as e:
-        video.status = 'failed'
-        video.error_message = str(e)
-        db.session.commit()
-        
-        current_app.logger.error(f"Video generation error: {e}")
-        return jsonify({'error': 'Video generation failed'}), 500
+    params = {
+        'filter': filter_profanity,
+        'voice': voice or 'en_us_002',
+        'background_video': background_path,
+        'background_music': music_path,
+        'title': title,
+        'story': story,
+        'fresh_transcript': fresh_transcript,
+        'render_profile': video.resolution
+    }
+    job = enqueue_video(video, params)
+    
+    return jsonify({
+        'message': 'Video queued for generation',
+        'video_id': video.id,
+        'job_id': job.id,
+        'status': video.status,
+        'status_url': url_for('main.get_job', job_id=job.id),
+        'download_url': url_for('main.download_video', video_id=video.id)
+    }), 202
+
+@main_bp.route('/api/jobs/<int:job_id>')
+@login_required
+def get_job(job_id):
+    """Status of one of the current user's generation jobs"""
+    job = GenerationJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job))
+
+@main_bp.route('/api/queue/stats')
+@login_required
+def get_queue_stats():
+    """Queue wait-time percentiles and backlog of the current user's plan, and their own jobs in the queue"""
+    hours = min(request.args.get('hours', 24, type=int), 24 * 30)
+    plan = current_user.subscription_plan
+    if plan not in current_app.config['SUBSCRIPTION_PLANS']:
+        plan = 'free'
+    own = dict(db.session.query(GenerationJob.status, func.count(GenerationJob.id))
+               .filter(GenerationJob.user_id == current_user.id, GenerationJob.status.in_(('queued', 'running')))
+               .group_by(GenerationJob.status).all())
+    return jsonify({
+        'hours': hours,
+        'plan': plan,
+        'stats': queue_wait_stats(hours, [plan])[plan],
+        'jobs': {'queued': own.get('queued', 0), 'running': own.get('running', 0)}
+    })
+
+def request_user():
+    """The user behind a request: the session login, or an X-API-Key header"""
+    if current_user.is_authenticated:
+        return current_user
+    
+    api_key = request.headers.get('X-API-Key')
+    if not api_key:
+        return None
+    key_record = APIKey.query.filter_by(key=api_key, is_active=True).first()
+    if not key_record:
+        return None
+    user = User.query.get(key_record.user_id)
+    if not user or not user.is_active:
+        return None
+    return user
+
+@main_bp.route('/api/videos/<int:video_id>/download', methods=['GET', 'HEAD'])
+def download_video(video_id):
+    """Download a finished video (session or API key), served by nginx or sendfile"""
+    user = request_user()
+    if user is None:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    video = Video.query.filter_by(id=video_id, user_id=user.id).first()
+    if not video:
+        return jsonify({'error': 'Video not found'}), 404
+    if video.status != 'completed' or not video.output_path or not os.path.exists(video.output_path):
+        return jsonify({'error': 'Video not ready'}), 409
+    
+    download_name = secure_filename(f"{video.title or 'video'}.mp4") or f'video_{video.id}.mp4'
+    return send_media_file(video.output_path, download_name)
+
+def streams_full_response():
+    """503 for a stream this process has no thread to spare for; EventSource retries on its own"""
+    retry_after = current_app.config['JOB_EVENTS_RETRY_AFTER']
+    response = jsonify({'error': 'Too many open event streams, retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def stream_response(listener, until_final=False):
+    """Wrap a job listener as a Server-Sent Events response"""
+    stream = event_stream(listener, current_app.config['JOB_EVENTS_KEEPALIVE'],
+                          current_app.config['JOB_EVENTS_MAX_SECONDS'], until_final)
+    response = Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # let nginx pass events through as they are written
+    })
+    # Also covers clients that disconnect before the stream starts
+    response.call_on_close(lambda: job_events.unsubscribe(listener))
+    return response
+
+@main_bp.route('/api/videos/<int:video_id>/events')
+def video_events(video_id):
+    """Live progress of one video as Server-Sent Events, ending when it completes or fails"""
+    user = request_user()
+    if user is None:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    job = GenerationJob.query.filter_by(video_id=video_id, user_id=user.id).first()
+    if not job:
+        return jsonify({'error': 'Video not found'}), 404
+    
+    # Subscribe before reading the current state so nothing falls in between
+    listener = job_events.subscribe(current_app._get_current_object(), user.id, video_id)
+    if listener is None:
+        return streams_full_response()
+    event = job_event(job)
+    listener.push(event)
+    return stream_response(listener, until_final=True)
+
+@main_bp.route('/api/videos/events')
+def user_video_events():
+    """Live progress of all of the user's videos as Server-Sent Events"""
+    user = request_user()
+    if user is None:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    listener = job_events.subscribe(current_app._get_current_object(), user.id)
+    if listener is None:
+        return streams_full_response()
+    active = GenerationJob.query.filter(GenerationJob.user_id == user.id,
+                                        GenerationJob.status.in_(('queued', 'running'))).all()
+    for job in active:
+        listener.push(job_event(job))
+    return stream_response(listener)
 
 @main_bp.route('/upload', methods=['POST'])
 @login_required
@@ -309,28 +330,251 @@ def upload_file():
     if not file.filename:
         return jsonify({'error': 'No filename provided'}), 400
     filename = secure_filename(file.filename)
-    file_path = get_storage_path(current_user.id, filename, file_type)
-    file.save(file_path)
+    temp_path = blob_staging_path()
+    content_hash = save_upload_stream(file.stream, temp_path)
+    
+    # Identical content is stored once; a repeat upload reuses it and everything derived from it
+    blob, is_new = store_blob(temp_path, content_hash, os.path.splitext(filename)[1])
+    asset = create_uploaded_asset(filename, blob, file_type, is_new)
     
-    # Create asset record
+    return jsonify({
+        'message': 'File uploaded successfully',
+        'asset_id': asset.id,
+        'file_path': asset.file_path,
+        'deduplicated': not is_new,
+        'thumbnail_status': asset.thumbnail_status
+    }), 200
+
+def create_uploaded_asset(filename, blob, file_type, is_new):
+    """Record a stored blob as the current user's asset, reusing or starting its background processing"""
     asset = BackgroundAsset()
     asset.name = os.path.splitext(filename)[0]
-    asset.file_path = file_path
+    asset.user_id = current_user.id
+    asset.blob_id = blob.id
+    asset.file_path = blob.file_path
     asset.asset_type = file_type
-    asset.file_size = os.path.getsize(file_path)
+    asset.file_size = blob.file_size
     asset.is_premium = False  # User uploads are not premium
+    asset.thumbnail_status = 'pending' if file_type == 'video' else None
+    
+    # Another upload of the same content may already be processed, or still processing
+    sibling = None
+    if not is_new:
+        sibling = BackgroundAsset.query.filter_by(blob_id=blob.id, asset_type=file_type)\
+            .order_by(BackgroundAsset.indexed_at.is_(None)).first()
+        if sibling and sibling.indexed_at:
+            asset.copy_derived_from(sibling)
     
-    # Generate thumbnail for videos
-    if file_type == 'video':
-        thumbnail_path = file_path.rsplit('.', 1)[0] + '_thumb.jpg'
-        if generate_thumbnail(file_path, thumbnail_path):
-            asset.thumbnail_path = thumbnail_path
+    # Metadata, thumbnail/sprite/preview and mezzanines are produced by the job workers
+    if not sibling and file_type in ('video', 'music'):
+        asset.processing_status = 'queued'
     
     db.session.add(asset)
     db.session.commit()
+    return asset
+
+def get_upload_session(upload_id):
+    """Get an open chunked upload of the current user"""
+    upload = UploadSession.query.filter_by(id=upload_id, user_id=current_user.id).first()
+    if upload and upload.status == 'open' and upload.expires_at < datetime.utcnow():
+        abort_upload_session(upload)
+    return upload
+
+def abort_upload_session(upload):
+    """Mark an upload aborted and delete its partial file"""
+    upload.status = 'aborted'
+    if os.path.exists(upload.part_path):
+        os.remove(upload.part_path)
+    discard_upload_hash(upload.id)
+    db.session.commit()
+
+def upload_status(upload):
+    return {
+        'upload_id': upload.id,
+        'status': upload.status,
+        'offset': upload.received_bytes,
+        'total_size': upload.total_size,
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE'],
+        'asset_id': upload.asset_id
+    }
+
+@main_bp.route('/api/uploads', methods=['POST'])
+@login_required
+def init_upload():
+    """Start a chunked, resumable upload"""
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename', ''))
+    file_type = data.get('type', 'video')
+    total_size = data.get('size')
     
-    return jsonify({
-        'message': 'File uploaded successfully',
-        'asset_id': asset.id,
-        'file_path': file_path
-    }), 200 
\ No newline at end of file
+    if not filename:
+        return jsonify({'error': 'No filename provided'}), 400
+    if file_type not in MEDIA_FORMATS_BY_TYPE:
+        return jsonify({'error': 'Invalid upload type'}), 400
+    file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    if file_ext not in current_app.config['ALLOWED_EXTENSIONS']:
+        return jsonify({'error': f"File type not allowed. Allowed types: {', '.join(sorted(current_app.config['ALLOWED_EXTENSIONS']))}"}), 400
+    if not isinstance(total_size, int) or total_size <= 0:
+        return jsonify({'error': 'File size is required'}), 400
+    if total_size > current_app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({'error': f"File too large. Maximum size is {format_file_size(current_app.config['MAX_UPLOAD_SIZE'])}"}), 413
+    
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        filename=filename,
+        file_type=file_type,
+        total_size=total_size,
+        storage_path=blob_staging_path(),
+        expires_at=datetime.utcnow() + timedelta(hours=current_app.config['UPLOAD_SESSION_HOURS'])
+    )
+    open(upload.part_path, 'wb').close()
+    db.session.add(upload)
+    db.session.commit()
+    
+    return jsonify(upload_status(upload)), 201
+
+@main_bp.route('/api/uploads/<upload_id>', methods=['GET'])
+@login_required
+def get_upload(upload_id):
+    """Get the committed offset of an upload, to resume it"""
+    upload = get_upload_session(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(upload_status(upload))
+
+@main_bp.route('/api/uploads/<upload_id>', methods=['PUT'])
+@login_required
+def append_upload(upload_id):
+    """Append one chunk, sent as the raw request body at ?offset=<committed bytes>"""
+    upload = get_upload_session(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    if upload.status != 'open':
+        return jsonify({'error': f'Upload is {upload.status}'}), 409
+    
+    offset = request.args.get('offset', type=int)
+    if offset != upload.received_bytes:
+        return jsonify({'error': 'Offset mismatch', **upload_status(upload)}), 409
+    
+    length = request.content_length
+    if length is None:
+        return jsonify({'error': 'Content-Length required'}), 411
+    if length > current_app.config['UPLOAD_CHUNK_SIZE'] or offset + length > upload.total_size:
+        return jsonify({'error': 'Chunk too large'}), 413
+    
+    # One request writes the part file at a time; a duplicate or retried chunk gets the current offset back
+    with upload_part_lock(upload.part_path, blocking=False) as f:
+        if f is None:
+            return jsonify({'error': 'Another chunk is being written', **upload_status(upload)}), 409
+        db.session.refresh(upload)
+        if upload.status != 'open' or upload.received_bytes != offset:
+            return jsonify({'error': 'Offset mismatch', **upload_status(upload)}), 409
+        
+        # A committed chunk that never reached disk leaves the file short; resume from what is there
+        on_disk = os.fstat(f.fileno()).st_size
+        if on_disk < offset:
+            UploadSession.query.filter_by(id=upload.id, received_bytes=offset).update({'received_bytes': on_disk})
+            db.session.commit()
+            discard_upload_hash(upload.id)
+            return jsonify({'error': 'Offset mismatch', **upload_status(get_upload_session(upload_id))}), 409
+        
+        # The body is read straight from the socket into the part file, never buffered whole
+        try:
+            written, head, chunk_hash = write_upload_chunk(upload.id, f, offset, request.stream, length)
+        except BaseException:
+            truncate_upload_chunk(upload.id, f, offset)
+            raise
+        
+        expected = request.headers.get('X-Chunk-SHA256')
+        if written != length:
+            truncate_upload_chunk(upload.id, f, offset)
+            return jsonify({'error': 'Incomplete chunk', **upload_status(upload)}), 400
+        if expected and expected.lower() != chunk_hash:
+            truncate_upload_chunk(upload.id, f, offset)
+            return jsonify({'error': 'Chunk checksum mismatch', **upload_status(upload)}), 422
+        if offset == 0 and written:
+            media_format = sniff_media_format(head)
+            if media_format not in MEDIA_FORMATS_BY_TYPE[upload.file_type]:
+                abort_upload_session(upload)
+                return jsonify({'error': f'File content is not a supported {upload.file_type} format'}), 415
+            upload.media_format = media_format
+        
+        updated = UploadSession.query.filter_by(id=upload.id, received_bytes=offset).update({
+            'received_bytes': offset + written,
+            'media_format': upload.media_format,
+            'updated_at': datetime.utcnow()
+        })
+        db.session.commit()
+        if not updated:
+            truncate_upload_chunk(upload.id, f, offset)
+            return jsonify({'error': 'Offset mismatch', **upload_status(get_upload_session(upload_id))}), 409
+    
+    return jsonify(upload_status(get_upload_session(upload_id)))
+
+@main_bp.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_upload(upload_id):
+    """Verify a fully received upload, move it into place and create its asset"""
+    upload = get_upload_session(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    if upload.status == 'complete':
+        return jsonify(upload_status(upload))
+    if upload.status != 'open':
+        return jsonify({'error': f'Upload is {upload.status}'}), 409
+    if upload.received_bytes != upload.total_size:
+        return jsonify({'error': 'Upload incomplete', **upload_status(upload)}), 409
+    
+    # Waits for a chunk write still in flight; a committed chunk that never reached disk leaves the file short
+    with upload_part_lock(upload.part_path) as f:
+        on_disk = os.fstat(f.fileno()).st_size
+        if on_disk != upload.total_size:
+            UploadSession.query.filter_by(id=upload.id, received_bytes=upload.total_size)\
+                .update({'received_bytes': min(on_disk, upload.total_size)})
+            db.session.commit()
+            discard_upload_hash(upload.id)
+            return jsonify({'error': 'Upload incomplete', **upload_status(get_upload_session(upload_id))}), 409
+        content_hash = finish_upload_hash(upload.id, upload.part_path, upload.total_size)
+    expected = (request.get_json(silent=True) or {}).get('sha256')
+    if expected and expected.lower() != content_hash:
+        abort_upload_session(upload)
+        return jsonify({'error': 'Checksum mismatch'}), 422
+    
+    blob, is_new = store_blob(upload.part_path, content_hash, os.path.splitext(upload.filename)[1])
+    asset = create_uploaded_asset(upload.filename, blob, upload.file_type, is_new)
+    upload.content_hash = content_hash
+    upload.asset_id = asset.id
+    upload.status = 'complete'
+    db.session.commit()
+    
+    return jsonify({**upload_status(upload), 'sha256': content_hash, 'deduplicated': not is_new,
+                    'thumbnail_status': asset.thumbnail_status}), 200
+
+@main_bp.route('/api/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def cancel_upload(upload_id):
+    """Abort an upload and delete what was received"""
+    upload = get_upload_session(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    if upload.status == 'open':
+        abort_upload_session(upload)
+    return jsonify(upload_status(upload))
+
+@main_bp.route('/api/assets/<int:asset_id>', methods=['DELETE'])
+@login_required
+def delete_asset(asset_id):
+    """Delete one of the current user's uploads, releasing its share of the stored file"""
+    asset = BackgroundAsset.query.filter_by(id=asset_id, user_id=current_user.id).first()
+    if not asset:
+        return jsonify({'error': 'Asset not found'}), 404
+    
+    blob_id = asset.blob_id
+    UploadSession.query.filter_by(asset_id=asset.id).update({'asset_id': None})
+    db.session.delete(asset)
+    db.session.commit()
+    if blob_id:
+        release_blob(blob_id)
+    
+    return jsonify({'message': 'Asset deleted'}), 200
@@ -149,10 +149,22 @@ class UserSession(db.Model):
         if not self.expires_at:
             self.expires_at = datetime.utcnow() + timedelta(days=7)
 
+class StoredBlob(db.Model):
+    __tablename__ = 'stored_blobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)  # sha256
+    file_path = db.Column(db.String(500), nullable=False)
+    file_size = db.Column(db.BigInteger)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class BackgroundAsset(db.Model):
     __tablename__ = 'background_assets'
     
     id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))  # None for the shared catalog
+    blob_id = db.Column(db.Integer, db.ForeignKey('stored_blobs.id'))  # uploads share content-addressed files
     name = db.Column(db.String(100), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
     asset_type = db.Column(db.String(20), nullable=False)  # video, music, image
@@ -161,8 +173,112 @@ class BackgroundAsset(db.Model):
     duration = db.Column(db.Float)  # for videos and music
     file_size = db.Column(db.Integer)  # in bytes
     thumbnail_path = db.Column(db.String(500))
+    thumbnail_status = db.Column(db.String(20))  # pending, ready, failed (videos only)
+    sprite_path = db.Column(db.String(500))
+    preview_path = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    
+    # Media metadata, extracted on upload and by `flask reindex-assets`
+    codec = db.Column(db.String(50))
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    fps = db.Column(db.Float)
+    bit_rate = db.Column(db.Integer)
+    loudness = db.Column(db.Float)  # integrated LUFS, for music
+    keyframe_count = db.Column(db.Integer)  # for videos
+    is_usable = db.Column(db.Boolean)  # None until indexed
+    metadata_error = db.Column(db.String(500))
+    indexed_at = db.Column(db.DateTime)
+    
+    # Upload tasks run by the job workers: metadata and previews, then render mezzanines (videos only)
+    processing_status = db.Column(db.String(20))  # queued, running, done, failed
+    processing_started_at = db.Column(db.DateTime)
+    mezzanine_status = db.Column(db.String(20))  # queued, running, ready, failed
+    mezzanine_started_at = db.Column(db.DateTime)
+    
+    def update_media_info(self, info):
+        """Store metadata returned by reddit_shorts.media_info.extract_media_info"""
+        for field in ('duration', 'codec', 'width', 'height', 'fps', 'bit_rate', 'loudness',
+                      'keyframe_count', 'is_usable', 'metadata_error'):
+            setattr(self, field, info.get(field))
+        self.indexed_at = datetime.utcnow()
+    
+    def copy_derived_from(self, other):
+        """Reuse metadata and previews already produced for the same content"""
+        for field in ('duration', 'codec', 'width', 'height', 'fps', 'bit_rate', 'loudness',
+                      'keyframe_count', 'is_usable', 'metadata_error', 'indexed_at',
+                      'thumbnail_path', 'thumbnail_status', 'sprite_path', 'preview_path', 'processing_status',
+                      'mezzanine_status'):
+            setattr(self, field, getattr(other, field))
+
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(32), primary_key=True)  # random hex token
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    file_type = db.Column(db.String(20), nullable=False)  # video, music, image
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, default=0, nullable=False)
+    storage_path = db.Column(db.String(500), nullable=False)  # staging location in the blob store; chunks go to <path>.part
+    media_format = db.Column(db.String(20))  # sniffed from the first chunk
+    content_hash = db.Column(db.String(64))  # sha256, set on finalize
+    status = db.Column(db.String(20), default='open')  # open, complete, aborted
+    asset_id = db.Column(db.Integer, db.ForeignKey('background_assets.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __init__(self, **kwargs):
+        super(UploadSession, self).__init__(**kwargs)
+        if not self.expires_at:
+            self.expires_at = datetime.utcnow() + timedelta(hours=24)
+    
+    @property
+    def part_path(self):
+        return self.storage_path + '.part'
+
+class VideoBatch(db.Model):
+    __tablename__ = 'video_batches'
+    
+    id = db.Column(db.String(32), primary_key=True)  # random hex token
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    jobs = db.relationship('GenerationJob', backref='batch', lazy=True)
+
+class GenerationJob(db.Model):
+    __tablename__ = 'generation_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.Integer, db.ForeignKey('videos.id'), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    params = db.Column(db.JSON, nullable=False)  # keyword arguments for run_local_video_generation
+    source = db.Column(db.String(20), default='web')  # web or api
+    plan = db.Column(db.String(20), default='free')  # subscription plan at submission
+    priority = db.Column(db.Integer, default=0)  # the plan's queue_priority
+    batch_id = db.Column(db.String(32), db.ForeignKey('video_batches.id'), index=True)
+    leader_id = db.Column(db.Integer, db.ForeignKey('generation_jobs.id'))  # batch job whose transcript this one reuses
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, running, completed, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    worker_id = db.Column(db.String(100))
+    stage = db.Column(db.String(20))  # pipeline stage (reddit_shorts.main.PROGRESS_STAGES) while running
+    progress = db.Column(db.Integer, default=0)  # percent
+    progress_message = db.Column(db.String(200))
+    transcript = db.Column(db.JSON)  # shared with followers once its lines are voiced
+    transcript_at = db.Column(db.DateTime)
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow)  # pushed back when a retry is scheduled
+    started_at = db.Column(db.DateTime)
+    queue_wait = db.Column(db.Float)  # seconds from submission to first start
+    heartbeat_at = db.Column(db.DateTime)  # refreshed by the worker while it renders
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
+    video = db.relationship('Video', backref=db.backref('job', uselist=False))
 
 class UsageLog(db.Model):
     __tablename__ = 'usage_logs'
@@ -0,0 +1,87 @@
+import os
+import asyncio
+from typing import List, Tuple
+import numpy as np
+from reddit_shorts.ffmpeg_runner import run_ffmpeg
+
+# PCM format used for all in-process mixing
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+# Mix settings
+LINE_GAP_SECONDS = float(os.getenv('AUDIO_LINE_GAP_SECONDS', 0.15))
+MUSIC_VOLUME = float(os.getenv('AUDIO_MUSIC_VOLUME', 0.3))
+MUSIC_DUCK_RATIO = float(os.getenv('AUDIO_MUSIC_DUCK_RATIO', 0.4))  # music level under speech, relative to MUSIC_VOLUME
+DUCK_RAMP_SECONDS = float(os.getenv('AUDIO_DUCK_RAMP_SECONDS', 0.3))
+AUDIO_BITRATE = os.getenv('AUDIO_BITRATE', '192k')
+
+async def decode_audio(path: str) -> np.ndarray:
+    """Decode an audio file into a float32 PCM buffer of shape (frames, CHANNELS)"""
+    cmd = [
+        'ffmpeg', '-v', 'error', '-i', path,
+        '-f', 'f32le', '-ac', str(CHANNELS), '-ar', str(SAMPLE_RATE),
+        'pipe:1'
+    ]
+    stdout = await run_ffmpeg(cmd)
+    return np.frombuffer(stdout, dtype='<f4').reshape(-1, CHANNELS)
+
+def concat_lines(clips: List[np.ndarray], gap_seconds: float = LINE_GAP_SECONDS) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+    """Concatenate line clips with silent gaps, returning the buffer and each line's (start, end) frame"""
+    gap = int(gap_seconds * SAMPLE_RATE)
+    total = sum(len(clip) for clip in clips) + gap * max(len(clips) - 1, 0)
+    speech = np.zeros((total, CHANNELS), dtype=np.float32)
+
+    segments = []
+    position = 0
+    for clip in clips:
+        speech[position:position + len(clip)] = clip
+        segments.append((position, position + len(clip)))
+        position += len(clip) + gap
+    return speech, segments
+
+def duck_envelope(length: int, segments: List[Tuple[int, int]], volume: float = MUSIC_VOLUME,
+                  duck_ratio: float = MUSIC_DUCK_RATIO, ramp_seconds: float = DUCK_RAMP_SECONDS) -> np.ndarray:
+    """Per-frame music gain: full volume in gaps, ducked under speech, with linear ramps between"""
+    window = max(1, int(ramp_seconds * SAMPLE_RATE))
+    half = window // 2
+
+    # Widen each line by half a ramp so the smoothed envelope is fully ducked while speech plays
+    mask = np.zeros(length, dtype=np.float64)
+    for start, end in segments:
+        mask[max(0, start - half):min(length, end + half)] = 1.0
+
+    # Centered moving average via cumulative sums: O(n) regardless of the ramp length
+    padded = np.pad(mask, (half, window - half), mode='edge')
+    csum = np.concatenate(([0.0], np.cumsum(padded)))
+    smoothed = (csum[window:window + length] - csum[:length]) / window
+
+    return (volume * (1.0 - (1.0 - duck_ratio) * smoothed)).astype(np.float32)
+
+def mix_music(speech: np.ndarray, music: np.ndarray, segments: List[Tuple[int, int]], volume: float = MUSIC_VOLUME) -> np.ndarray:
+    """Loop or trim the music to the speech length, duck it under the lines and mix"""
+    if not len(music):
+        return speech
+    repeats = -(-len(speech) // len(music))
+    bed = np.tile(music, (repeats, 1))[:len(speech)]
+    mixed = speech + bed * duck_envelope(len(speech), segments, volume)[:, np.newaxis]
+
+    # Scale down rather than clip if the sum overshoots full scale
+    peak = float(np.max(np.abs(mixed))) if len(mixed) else 0.0
+    if peak > 1.0:
+        mixed /= peak
+    return mixed
+
+async def mix_audio_track(audio_files: List[str], background_music: str = None,
+                          music_volume: float = MUSIC_VOLUME) -> np.ndarray:
+    """Decode, concatenate and mix the line clips (and optional music) into one PCM buffer"""
+    sources = list(audio_files)
+    use_music = bool(background_music and os.path.exists(background_music))
+    if use_music:
+        sources.append(background_music)
+    decoded = await asyncio.gather(*(decode_audio(path) for path in sources))
+
+    clips = decoded[:len(audio_files)]
+    speech, segments = concat_lines(clips)
+    if use_music:
+        speech = mix_music(speech, decoded[-1], segments, music_volume)
+    return speech
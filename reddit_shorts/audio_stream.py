@@ -0,0 +1,77 @@
+import os
+import re
+import base64
+import aiohttp
+
+# Bytes read from the provider response per iteration
+AUDIO_STREAM_CHUNK_SIZE = 64 * 1024
+
+_AUDIO_DATA_KEY = re.compile(rb'"audio_data"\s*:\s*"')
+
+class Base64FieldDecoder:
+    """Incrementally decode a base64 string field out of a streamed JSON body.
+
+    Only the bytes of the field value pass through, in chunks, so neither the JSON
+    document nor the decoded audio is ever held in memory as a whole.
+    """
+
+    def __init__(self, key_pattern=_AUDIO_DATA_KEY):
+        self._key_pattern = key_pattern
+        self._buffer = b''  # undecided bytes while searching for the key
+        self._carry = b''  # base64 characters not yet forming a full 4-byte group
+        self.found = False
+        self.done = False
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Consume part of the body, returning the audio bytes it decodes to"""
+        if self.done:
+            return b''
+        if not self.found:
+            self._buffer += chunk
+            match = self._key_pattern.search(self._buffer)
+            if not match:
+                # Keep enough of the tail to match a key split across chunks
+                self._buffer = self._buffer[-64:]
+                return b''
+            self.found = True
+            chunk, self._buffer = self._buffer[match.end():], b''
+
+        end = chunk.find(b'"')
+        if end != -1:
+            chunk = chunk[:end]
+            self.done = True
+        # JSON may escape "/" as "\/"; base64 never contains a backslash
+        data = self._carry + chunk.replace(b'\\', b'')
+        usable = len(data) - len(data) % 4
+        if self.done:
+            usable = len(data)
+        self._carry = data[usable:]
+        return base64.b64decode(data[:usable]) if usable else b''
+
+async def write_audio_response(response: aiohttp.ClientResponse, output_path: str) -> int:
+    """Stream a TTS response to output_path, returning the number of audio bytes written.
+
+    Raw audio bodies (audio/* or octet-stream) are copied as they arrive; JSON bodies
+    have their base64 audio_data field decoded on the fly. The file only appears at
+    output_path once it is complete.
+    """
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    raw = content_type.startswith('audio/') or content_type == 'application/octet-stream'
+    decoder = None if raw else Base64FieldDecoder()
+
+    temp_path = f'{output_path}.part'
+    written = 0
+    try:
+        with open(temp_path, 'wb') as f:
+            async for chunk in response.content.iter_chunked(AUDIO_STREAM_CHUNK_SIZE):
+                data = chunk if raw else decoder.feed(chunk)
+                if data:
+                    f.write(data)
+                    written += len(data)
+        if not written:
+            raise Exception('No audio data received from Speechify')
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+    return written
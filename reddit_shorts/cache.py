@@ -0,0 +1,233 @@
+import os
+import time
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+# TTS audio cache configuration
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'brainrot-tts-cache'))
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # 512MB, 0 disables
+# Re-read the directory this often so eviction sees clips written by other processes
+TTS_CACHE_RESCAN_SECONDS = int(os.getenv('TTS_CACHE_RESCAN_SECONDS', 300))
+
+# LLM transcript cache configuration
+TRANSCRIPT_CACHE_TTL = int(os.getenv('TRANSCRIPT_CACHE_TTL', 24 * 3600))  # seconds
+TRANSCRIPT_CACHE_MAX_ENTRIES = int(os.getenv('TRANSCRIPT_CACHE_MAX_ENTRIES', 1000))  # 0 disables
+
+class AudioCache:
+    """Content-addressed on-disk cache of synthesized audio with LRU eviction.
+
+    Files are keyed by a hash of (voice_id, text, audio_format). Recency is kept in
+    file mtimes so the LRU order survives restarts. Several processes may share the
+    directory: a lookup that misses the in-memory index checks the disk and adopts
+    clips other processes wrote, and the index is rebuilt from disk every
+    rescan_interval so each process evicts against the shared total.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, rescan_interval: float = TTS_CACHE_RESCAN_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # path -> size, least recently used first
+        self._total_bytes = 0
+        self.rescan_interval = rescan_interval
+        self._loaded_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(voice_id: str, text: str, audio_format: str) -> str:
+        """Hash the synthesis inputs into a cache key"""
+        payload = json.dumps([voice_id, text, audio_format], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path_for(self, key: str, audio_format: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.{audio_format}')
+
+    def _load_index(self):
+        """Rebuild the in-memory LRU index from the files on disk"""
+        found = []
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith('.'):
+                    continue  # partial writes
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime, path, stat.st_size))
+        self._entries.clear()
+        self._total_bytes = 0
+        for mtime, path, size in sorted(found):
+            self._entries[path] = size
+            self._total_bytes += size
+        self._loaded_at = time.monotonic()
+
+    def get(self, voice_id: str, text: str, audio_format: str, dest_path: str) -> bool:
+        """Materialize a cached clip at dest_path, returning False on a miss"""
+        path = self._path_for(self.make_key(voice_id, text, audio_format), audio_format)
+        with self._lock:
+            if path not in self._entries:
+                # Possibly written by another process since the index was loaded
+                try:
+                    size = os.path.getsize(path)
+                except FileNotFoundError:
+                    self.misses += 1
+                    return False
+                self._entries[path] = size
+                self._total_bytes += size
+            try:
+                _link_or_copy(path, dest_path)
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted by another process sharing the directory
+                self._total_bytes -= self._entries.pop(path)
+                self.misses += 1
+                return False
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return True
+
+    def put(self, voice_id: str, text: str, audio_format: str, src_path: str):
+        """Store a synthesized clip, evicting least recently used entries over the byte budget"""
+        size = os.path.getsize(src_path)
+        if size > self.max_bytes:
+            return
+        path = self._path_for(self.make_key(voice_id, text, audio_format), audio_format)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a hidden temp file in the same directory, then rename atomically
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as dst, open(src_path, 'rb') as src:
+                shutil.copyfileobj(src, dst)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            if time.monotonic() - self._loaded_at >= self.rescan_interval:
+                self._load_index()
+            self._total_bytes += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            path, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+def _link_or_copy(src: str, dest: str):
+    """Hard-link src to dest, copying when linking is not possible"""
+    if os.path.exists(dest):
+        os.unlink(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        if not os.path.exists(src):
+            raise FileNotFoundError(src)
+        shutil.copyfile(src, dest)
+
+class TranscriptCache:
+    """In-memory LRU cache of LLM transcripts with a TTL, keyed by a prompt fingerprint"""
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, transcript), least recently used first
+
+    @staticmethod
+    def make_key(model: str, temperature: float, system_prompt: str, user_prompt: str, topic: str) -> str:
+        """Hash everything that determines the LLM output into a cache key"""
+        payload = json.dumps([model, temperature, system_prompt, user_prompt, topic], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        """Get a copy of a cached transcript, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(line) for line in entry[1]]
+
+    def put(self, key: str, transcript: List[Dict[str, str]]):
+        """Store a transcript, evicting the least recently used entries over max_entries"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, [dict(line) for line in transcript])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries
+            }
+
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+def get_audio_cache():
+    """Get the process-wide TTS audio cache, or None when disabled"""
+    global _audio_cache
+    if TTS_CACHE_MAX_BYTES <= 0:
+        return None
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            _audio_cache = AudioCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+        return _audio_cache
+
+_transcript_cache = None
+_transcript_cache_lock = threading.Lock()
+
+def get_transcript_cache():
+    """Get the process-wide transcript cache, or None when disabled"""
+    global _transcript_cache
+    if TRANSCRIPT_CACHE_MAX_ENTRIES <= 0:
+        return None
+    with _transcript_cache_lock:
+        if _transcript_cache is None:
+            _transcript_cache = TranscriptCache(TRANSCRIPT_CACHE_TTL, TRANSCRIPT_CACHE_MAX_ENTRIES)
+        return _transcript_cache
@@ -0,0 +1,164 @@
+import os
+import time
+import fcntl
+import asyncio
+import tempfile
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Tuple, Callable, Optional
+
+# Host-wide ffmpeg limits
+FFMPEG_MAX_PROCESSES = int(os.getenv('FFMPEG_MAX_PROCESSES', os.cpu_count() or 2))
+FFMPEG_LOCK_DIR = os.getenv('FFMPEG_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'brainrot-ffmpeg-slots'))
+FFMPEG_TIMEOUT = float(os.getenv('FFMPEG_TIMEOUT', 600))  # seconds
+FFMPEG_SLOT_POLL_INTERVAL = 0.05  # seconds
+
+class FFmpegError(Exception):
+    """ffmpeg exited with an error or timed out"""
+
+    def __init__(self, message: str, returncode: int = None, stderr: str = ''):
+        super().__init__(f"{message}: {stderr.strip()[-2000:]}" if stderr else message)
+        self.returncode = returncode
+        self.stderr = stderr
+
+class FFmpegLimiter:
+    """Host-wide cap on concurrently running ffmpeg processes.
+
+    Each slot is a lock file taken with flock(), so the cap is shared by every
+    web and job worker process on the host, and the kernel frees a slot if its
+    holder dies. Queue depth and wait times are tracked per process.
+    """
+
+    def __init__(self, slots: int, lock_dir: str):
+        self.slots = max(1, slots)
+        self.lock_dir = lock_dir
+        self.waiting = 0
+        self.running = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._recent_waits = deque(maxlen=500)
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def _try_acquire(self):
+        for slot in range(self.slots):
+            fd = os.open(os.path.join(self.lock_dir, f'slot-{slot}.lock'), os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for a free host-wide slot and hold it for the duration of the block"""
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            fd = self._try_acquire()
+            while fd is None:
+                await asyncio.sleep(FFMPEG_SLOT_POLL_INTERVAL)
+                fd = self._try_acquire()
+        finally:
+            self.waiting -= 1
+
+        wait = time.monotonic() - start
+        self.acquired += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self._recent_waits.append(wait)
+        if wait >= 1.0:
+            print(f"Waited {wait:.1f}s for an ffmpeg slot ({self.waiting} still queued)")
+
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth and wait-time statistics for this process"""
+        waits = sorted(self._recent_waits)
+        return {
+            'host_slots': self.slots,
+            'queue_depth': self.waiting,
+            'running': self.running,
+            'acquired': self.acquired,
+            'avg_wait_seconds': self.total_wait / self.acquired if self.acquired else 0.0,
+            'p95_wait_seconds': waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            'max_wait_seconds': self.max_wait
+        }
+
+ffmpeg_limiter = FFmpegLimiter(FFMPEG_MAX_PROCESSES, FFMPEG_LOCK_DIR)
+
+async def run_ffmpeg(cmd: List[str], input: bytes = None, timeout: float = FFMPEG_TIMEOUT,
+                     on_line: Optional[Callable[[bytes], None]] = None) -> bytes:
+    """Run an ffmpeg/ffprobe command without blocking the event loop, returning its stdout.
+
+    The process is killed if it exceeds the timeout or the calling task is cancelled.
+    If on_line is given it is called with each stdout line as it arrives (for -progress).
+    """
+    stdout, stderr = await run_ffmpeg_capture(cmd, input, timeout, on_line)
+    return stdout
+
+async def run_ffmpeg_capture(cmd: List[str], input: bytes = None, timeout: float = FFMPEG_TIMEOUT,
+                             on_line: Optional[Callable[[bytes], None]] = None) -> Tuple[bytes, bytes]:
+    """Like run_ffmpeg, but returns (stdout, stderr) for commands that report results in their log"""
+    async with ffmpeg_limiter.slot():
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            if on_line is None:
+                communicate = proc.communicate(input)
+            else:
+                communicate = _communicate_lines(proc, input, on_line)
+            stdout, stderr = await asyncio.wait_for(communicate, timeout)
+        except asyncio.TimeoutError:
+            await _kill(proc)
+            raise FFmpegError(f"{cmd[0]} timed out after {timeout:g}s")
+        except BaseException:
+            await _kill(proc)
+            raise
+
+    if proc.returncode != 0:
+        raise FFmpegError(f"{cmd[0]} exited with status {proc.returncode}", proc.returncode,
+                          stderr.decode('utf-8', errors='replace'))
+    return stdout, stderr
+
+async def _communicate_lines(proc: asyncio.subprocess.Process, input: Optional[bytes],
+                             on_line: Callable[[bytes], None]) -> Tuple[bytes, bytes]:
+    """proc.communicate(), except stdout is read line by line and handed to on_line"""
+    async def feed():
+        if input is not None:
+            try:
+                proc.stdin.write(input)
+                await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            proc.stdin.close()
+
+    async def read_stdout():
+        lines = []
+        async for line in proc.stdout:
+            lines.append(line)
+            try:
+                on_line(line)
+            except Exception as e:
+                print(f"Warning: ffmpeg output callback failed: {e}")
+        return b''.join(lines)
+
+    _, stdout, stderr = await asyncio.gather(feed(), read_stdout(), proc.stderr.read())
+    await proc.wait()
+    return stdout, stderr
+
+async def _kill(proc: asyncio.subprocess.Process):
+    if proc.returncode is None:
+        proc.kill()
+        await proc.wait()
@@ -0,0 +1,39 @@
+import os
+import asyncio
+import weakref
+import aiohttp
+
+# Connection pool configuration
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', 20))
+HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', 300))  # seconds
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', 60))  # seconds
+HTTP_TOTAL_TIMEOUT = float(os.getenv('HTTP_TOTAL_TIMEOUT', 120))  # seconds
+
+# aiohttp sessions are bound to the loop they were created on, so keep one per loop
+_sessions = weakref.WeakKeyDictionary()
+
+def get_session() -> aiohttp.ClientSession:
+    """Get the pooled client session for the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            use_dns_cache=True,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TOTAL_TIMEOUT)
+        )
+        _sessions[loop] = session
+    return session
+
+async def close_session():
+    """Close the pooled client session of the running event loop, if any"""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
@@ -0,0 +1,97 @@
+import os
+import struct
+import bisect
+import random
+from array import array
+from typing import List, Tuple, Optional
+from reddit_shorts.ffmpeg_runner import run_ffmpeg
+
+# Binary sidecar: magic, entry count, then keyframe pts (float64) and byte offsets (int64)
+_INDEX_MAGIC = b'KFI1'
+_INDEX_HEADER = struct.Struct('<4sQ')
+
+class KeyframeIndex:
+    """Keyframe timestamps and byte offsets of a video stream, for copy-only cutting"""
+
+    def __init__(self, pts: List[float], positions: List[int], duration: float):
+        self.pts = array('d', pts)
+        self.positions = array('q', positions)
+        self.duration = duration
+
+    def __len__(self) -> int:
+        return len(self.pts)
+
+    def keyframe_at_or_before(self, t: float) -> int:
+        """Index of the last keyframe at or before t"""
+        return max(bisect.bisect_right(self.pts, t) - 1, 0)
+
+    def pick_start(self, length: float, rng: random.Random = None) -> float:
+        """Pick a random keyframe timestamp that leaves at least length seconds of footage"""
+        if not self.pts:
+            return 0.0
+        last = bisect.bisect_right(self.pts, self.duration - length) - 1
+        if last <= 0:
+            return self.pts[0]
+        return self.pts[(rng or random).randint(0, last)]
+
+    def segment(self, start: float, length: float) -> Tuple[int, Optional[int]]:
+        """Byte range (start, end) covering [start, start + length], end None meaning end of file"""
+        first = self.keyframe_at_or_before(start)
+        after = bisect.bisect_left(self.pts, start + length)
+        end = self.positions[after] if after < len(self.positions) else None
+        return self.positions[first], end
+
+    def save(self, path: str):
+        """Write the index as a compact binary sidecar, atomically"""
+        temp_path = f'{path}.part'
+        with open(temp_path, 'wb') as f:
+            f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, len(self.pts)))
+            f.write(struct.pack('<d', self.duration))
+            self.pts.tofile(f)
+            self.positions.tofile(f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'KeyframeIndex':
+        """Read a binary sidecar written by save()"""
+        with open(path, 'rb') as f:
+            magic, count = _INDEX_HEADER.unpack(f.read(_INDEX_HEADER.size))
+            if magic != _INDEX_MAGIC:
+                raise ValueError(f"Not a keyframe index: {path}")
+            duration, = struct.unpack('<d', f.read(8))
+            pts = array('d')
+            pts.fromfile(f, count)
+            positions = array('q')
+            positions.fromfile(f, count)
+        index = cls([], [], duration)
+        index.pts, index.positions = pts, positions
+        return index
+
+def index_path(video_path: str) -> str:
+    """Sidecar location of a video's keyframe index"""
+    return os.path.splitext(video_path)[0] + '.kfi'
+
+async def build_keyframe_index(video_path: str, duration: float) -> KeyframeIndex:
+    """Scan the first video stream's packets (no decoding) for keyframes"""
+    stdout = await run_ffmpeg([
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,pos,flags',
+        '-of', 'csv=print_section=0', video_path
+    ])
+    keyframes = []
+    for line in stdout.decode('utf-8').splitlines():
+        fields = line.strip().split(',')
+        if len(fields) < 3 or 'K' not in fields[2] or fields[0] in ('', 'N/A') or fields[1] in ('', 'N/A'):
+            continue
+        keyframes.append((float(fields[0]), int(fields[1])))
+    keyframes.sort()
+    return KeyframeIndex([pts for pts, pos in keyframes], [pos for pts, pos in keyframes], duration)
+
+async def ensure_keyframe_index(video_path: str, duration: float) -> KeyframeIndex:
+    """Load a video's keyframe index, building and saving it on first use"""
+    path = index_path(video_path)
+    if os.path.exists(path):
+        return KeyframeIndex.load(path)
+    index = await build_keyframe_index(video_path, duration)
+    index.save(path)
+    return index
@@ -1,100 +1,245 @@
 import os
+import uuid
 import tempfile
 import json
 import requests
-import base64
 from datetime import datetime
-import subprocess
 import asyncio
-import aiohttp
-from typing import List, Dict, Any
+import weakref
+from typing import List, Dict, Any, AsyncIterator, Union, Optional, Callable
+from reddit_shorts.http_client import get_session
+from reddit_shorts.cache import get_audio_cache, get_transcript_cache
+from reddit_shorts.voices import VOICE_IDS, DEFAULT_VOICE_ID, voice_registry
+from reddit_shorts.transcript_stream import TranscriptStreamParser
+from reddit_shorts.audio_stream import write_audio_response
+from reddit_shorts.resilience import get_provider_client, raise_for_status, TTS_HEDGE
+from reddit_shorts.ffmpeg_runner import FFmpegError
+from reddit_shorts.render import plan_render
+from reddit_shorts.render_plan import RenderResult, execute_plan, get_render_profile
 
 # Configuration
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 SPEECHIFY_API_KEY = os.getenv('SPEECHIFY_API_KEY', '').strip()
-SPEECHIFY_API_URL = 'https://api.sws.speechify.com/v1/audio/speech'
-
-# Voice IDs for different characters
-VOICE_IDS = {
-    'JOE_ROGAN': 'emily',
-    'BARACK_OBAMA': 'emily',
-    'BEN_SHAPIRO': 'emily',
-    'DONALD_TRUMP': 'emily',
-    'JOE_BIDEN': 'emily',
-    'KAMALA_HARRIS': 'emily',
-    'ANDREW_TATE': 'emily',
-    'JORDAN_PETERSON': 'emily',
-}
-
-async def get_available_voices():
-    """Get available voices from Speechify API"""
-    if not SPEECHIFY_API_KEY:
-        raise Exception("SPEECHIFY_API_KEY not configured")
+# Provider endpoints can be pointed at stub_providers.py for load and failure testing
+SPEECHIFY_API_URL = os.getenv('SPEECHIFY_API_URL', 'https://api.sws.speechify.com/v1/audio/speech')
+SPEECHIFY_STREAM_URL = os.getenv('SPEECHIFY_STREAM_URL', 'https://api.sws.speechify.com/v1/audio/stream')
+# Request raw audio bytes from the streaming endpoint instead of base64 JSON
+SPEECHIFY_RAW_AUDIO_STREAM = os.getenv('SPEECHIFY_RAW_AUDIO_STREAM', 'False').lower() == 'true'
+GROQ_API_URL = os.getenv('GROQ_API_URL', 'https://api.groq.com/openai/v1/chat/completions')
+GROQ_MODEL = 'llama3-70b-8192'
+GROQ_TEMPERATURE = 0.5
+
+# Stream the transcript and start TTS on each line as soon as the LLM finishes it
+TRANSCRIPT_STREAMING = os.getenv('TRANSCRIPT_STREAMING', 'False').lower() == 'true'
+
+# TTS concurrency limits: lines in flight for a single video, and for the whole process
+TTS_CONCURRENCY_PER_JOB = int(os.getenv('TTS_CONCURRENCY_PER_JOB', 4))
+TTS_CONCURRENCY_PER_PROCESS = int(os.getenv('TTS_CONCURRENCY_PER_PROCESS', 16))
+
+# Overall progress (percent) at which each pipeline stage starts, in order
+PROGRESS_STAGES = {'voices': 0, 'transcript': 5, 'tts': 15, 'render': 60, 'publish': 95}
+
+# Progress callback: (stage, percent, message)
+ProgressCallback = Callable[[str, float, Optional[str]], None]
+
+def report_progress(progress: Optional[ProgressCallback], stage: str, fraction: float = 0.0, message: str = None):
+    """Report how far into a stage the pipeline is; a failing callback never fails the job"""
+    if progress is None:
+        return
+    stages = list(PROGRESS_STAGES)
+    start = PROGRESS_STAGES[stage]
+    position = stages.index(stage)
+    end = PROGRESS_STAGES[stages[position + 1]] if position + 1 < len(stages) else 100
+    try:
+        progress(stage, start + (end - start) * min(max(fraction, 0.0), 1.0), message)
+    except Exception as e:
+        print(f"Warning: Progress callback failed: {e}")
+
+# One process-wide TTS semaphore per event loop (asyncio primitives are loop-bound)
+_process_tts_semaphores = weakref.WeakKeyDictionary()
+
+def _get_process_tts_semaphore() -> asyncio.Semaphore:
+    """Get the process-wide TTS semaphore for the running event loop"""
+    loop = asyncio.get_running_loop()
+    semaphore = _process_tts_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(TTS_CONCURRENCY_PER_PROCESS)
+        _process_tts_semaphores[loop] = semaphore
+    return semaphore
+
+# Lines being synthesized right now, per event loop, so a duplicate waits for the cache instead of calling TTS again
+_inflight_tts = weakref.WeakKeyDictionary()
+
+def _get_inflight_tts() -> Dict[str, asyncio.Future]:
+    loop = asyncio.get_running_loop()
+    inflight = _inflight_tts.get(loop)
+    if inflight is None:
+        inflight = _inflight_tts[loop] = {}
+    return inflight
+
+def build_transcript_prompts(topic: str, agent_a: str, agent_b: str):
+    """Build the system and user prompts for a transcript request"""
+    system_prompt = f"""Create a dialogue for a short-form conversation on the topic of {topic}. The conversation should be between two agents, {agent_a.replace('_', ' ')} and {agent_b}, who should act as extreme, over-the-top caricatures of themselves with wildly exaggerated personality traits and mannerisms. {agent_a.replace('_', ' ')} and {agent_b.replace('_', ' ')} should both be absurdly vulgar and crude in their language, cursing excessively and making outrageous statements to the point where it becomes almost comically over-the-top. The dialogue should still provide insights into {topic} but do so in the most profane and shocking way possible. Limit the dialogue to a maximum of 7 exchanges, aiming for a concise transcript that would last for 1 minute. The agentId attribute should either be {agent_a} or {agent_b}. The text attribute should be that character's line of dialogue. Make it as edgy and controversial as possible while still being funny. Remember, {agent_a} and {agent_b} are both {agent_a.replace('_', ' ')} and {agent_b.replace('_', ' ')} behaving like they would in real life, but more inflammatory. The JSON format WHICH MUST BE ADHERED TO ALWAYS is as follows: {{ "transcript": [ {{"agentId": "the exact value of {agent_a} or {agent_b} depending on who is talking", "text": "their line of conversation in the dialog"}} ] }}"""
     
-    headers = {
-        'Authorization': f'Bearer {SPEECHIFY_API_KEY}'
+    user_prompt = f"generate a video about {topic}. Both the agents should talk about it in a way they would, but extremify their qualities and make the conversation risque so that it would be interesting to watch and edgy."
+    return system_prompt, user_prompt
+
+def _transcript_cache_key(transcript_cache, topic: str, system_prompt: str, user_prompt: str) -> str:
+    return transcript_cache.make_key(GROQ_MODEL, GROQ_TEMPERATURE, system_prompt, user_prompt, topic)
+
+def _groq_payload(system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+    return {
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "model": GROQ_MODEL,
+        "temperature": GROQ_TEMPERATURE,
+        "max_tokens": 4096,
+        "response_format": {"type": "json_object"}
     }
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.get('https://api.sws.speechify.com/v1/voices', headers=headers) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                raise Exception(f"Failed to get voices: {response.status} - {error_text}")
-            
-            data = await response.json()
-            return data.get('voices', [])
 
-async def generate_transcript(topic: str, agent_a: str, agent_b: str) -> List[Dict[str, str]]:
-    """Generate AI conversation transcript using Groq"""
+def _groq_headers() -> Dict[str, str]:
     if not GROQ_API_KEY:
         raise Exception("GROQ_API_KEY not configured")
     
-    headers = {
+    return {
         'Authorization': f'Bearer {GROQ_API_KEY}',
         'Content-Type': 'application/json'
     }
+
+async def generate_transcript(topic: str, agent_a: str, agent_b: str, use_cache: bool = True) -> List[Dict[str, str]]:
+    """Generate AI conversation transcript using Groq"""
+    system_prompt, user_prompt = build_transcript_prompts(topic, agent_a, agent_b)
     
-    system_prompt = f"""Create a dialogue for a short-form conversation on the topic of {topic}. The conversation should be between two agents, {agent_a.replace('_', ' ')} and {agent_b}, who should act as extreme, over-the-top caricatures of themselves with wildly exaggerated personality traits and mannerisms. {agent_a.replace('_', ' ')} and {agent_b.replace('_', ' ')} should both be absurdly vulgar and crude in their language, cursing excessively and making outrageous statements to the point where it becomes almost comically over-the-top. The dialogue should still provide insights into {topic} but do so in the most profane and shocking way possible. Limit the dialogue to a maximum of 7 exchanges, aiming for a concise transcript that would last for 1 minute. The agentId attribute should either be {agent_a} or {agent_b}. The text attribute should be that character's line of dialogue. Make it as edgy and controversial as possible while still being funny. Remember, {agent_a} and {agent_b} are both {agent_a.replace('_', ' ')} and {agent_b.replace('_', ' ')} behaving like they would in real life, but more inflammatory. The JSON format WHICH MUST BE ADHERED TO ALWAYS is as follows: {{ "transcript": [ {{"agentId": "the exact value of {agent_a} or {agent_b} depending on who is talking", "text": "their line of conversation in the dialog"}} ] }}"""
+    # Identical prompts are answered from the transcript cache unless fresh output is requested
+    transcript_cache = get_transcript_cache() if use_cache else None
+    cache_key = None
+    if transcript_cache:
+        cache_key = _transcript_cache_key(transcript_cache, topic, system_prompt, user_prompt)
+        cached = transcript_cache.get(cache_key)
+        if cached is not None:
+            print("Using cached transcript")
+            return cached
     
-    user_prompt = f"generate a video about {topic}. Both the agents should talk about it in a way they would, but extremify their qualities and make the conversation risque so that it would be interesting to watch and edgy."
+    headers = _groq_headers()
+    payload = _groq_payload(system_prompt, user_prompt)
     
-    payload = {
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        "model": "llama3-70b-8192",
-        "temperature": 0.5,
-        "max_tokens": 4096,
-        "response_format": {"type": "json_object"}
-    }
+    async def request():
+        session = get_session()
+        async with session.post(GROQ_API_URL, headers=headers, json=payload) as response:
+            await raise_for_status('Groq', response)
+            return await response.json()
     
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            'https://api.groq.com/openai/v1/chat/completions',
-            headers=headers,
-            json=payload
-        ) as response:
-            if response.status != 200:
-                raise Exception(f"Groq API error: {response.status}")
-            
-            data = await response.json()
-            content = data['choices'][0]['message']['content']
-            parsed = json.loads(content)
-            return parsed.get('transcript', [])
+    # Throttling, transient errors and outages are handled by the provider client
+    data = await get_provider_client('Groq').call(request)
+    content = data['choices'][0]['message']['content']
+    parsed = json.loads(content)
+    transcript = parsed.get('transcript', [])
+    
+    if transcript_cache and transcript:
+        transcript_cache.put(cache_key, transcript)
+    
+    return transcript
+
+async def stream_transcript(topic: str, agent_a: str, agent_b: str, use_cache: bool = True) -> AsyncIterator[Dict[str, str]]:
+    """Generate the transcript as a token stream, yielding each line as soon as it is complete"""
+    system_prompt, user_prompt = build_transcript_prompts(topic, agent_a, agent_b)
+    
+    transcript_cache = get_transcript_cache() if use_cache else None
+    cache_key = None
+    if transcript_cache:
+        cache_key = _transcript_cache_key(transcript_cache, topic, system_prompt, user_prompt)
+        cached = transcript_cache.get(cache_key)
+        if cached is not None:
+            print("Using cached transcript")
+            for entry in cached:
+                yield entry
+            return
+    
+    headers = _groq_headers()
+    payload = _groq_payload(system_prompt, user_prompt)
+    payload['stream'] = True
+    # JSON mode cannot be combined with streaming; the prompt already pins the format
+    # and the parser falls back to a full parse if no entries could be streamed
+    payload.pop('response_format')
+    
+    parser = TranscriptStreamParser()
+    transcript = []
+    async def open_stream():
+        session = get_session()
+        response = await session.post(GROQ_API_URL, headers=headers, json=payload)
+        try:
+            await raise_for_status('Groq', response)
+        except BaseException:
+            response.release()
+            raise
+        return response
+    
+    async with get_provider_client('Groq').stream(open_stream) as response:
+        # Server-sent events: one "data: {chunk}" line per delta, terminated by [DONE]
+        async for raw_line in response.content:
+            line = raw_line.decode('utf-8').strip()
+            if not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            delta = json.loads(data)['choices'][0]['delta'].get('content')
+            if not delta:
+                continue
+            for entry in parser.feed(delta):
+                transcript.append(entry)
+                yield entry
+    
+    for entry in parser.finish():
+        transcript.append(entry)
+        yield entry
+    
+    if transcript_cache and transcript:
+        transcript_cache.put(cache_key, transcript)
 
 async def generate_audio(voice_id: str, person: str, line: str, index: int, output_dir: str) -> str:
     """Generate audio using Speechify TTS"""
+    # Use a default voice if the specific voice_id is not set
+    if not voice_id or voice_id == 'your_joe_rogan_voice_id':
+        voice_id = 'en_us_002'  # Default voice
+    
+    audio_format = 'mp3'
+    audio_path = os.path.join(output_dir, f'{person}-{index}.{audio_format}')
+    
+    # Identical lines are served from the on-disk cache without calling Speechify
+    audio_cache = get_audio_cache()
+    if not audio_cache:
+        return await _request_audio(voice_id, line, audio_format, audio_path)
+    
+    inflight = _get_inflight_tts()
+    key = audio_cache.make_key(voice_id, line, audio_format)
+    while True:
+        if audio_cache.get(voice_id, line, audio_format, audio_path):
+            return audio_path
+        pending = inflight.get(key)
+        if pending is None:
+            break
+        # The same line is already being synthesized; if that request fails, the next waiter takes over
+        await asyncio.shield(pending)
+    
+    inflight[key] = asyncio.get_running_loop().create_future()
+    try:
+        await _request_audio(voice_id, line, audio_format, audio_path)
+        audio_cache.put(voice_id, line, audio_format, audio_path)
+    finally:
+        inflight.pop(key).set_result(None)
+    return audio_path
+
+async def _request_audio(voice_id: str, line: str, audio_format: str, audio_path: str) -> str:
+    """Synthesize one line with Speechify and write it to audio_path"""
     if not SPEECHIFY_API_KEY:
         raise Exception("SPEECHIFY_API_KEY not configured")
     
     # Debug: Check API key (first 10 characters)
     print(f"Using Speechify API key: {SPEECHIFY_API_KEY[:10]}...")
     
-    # Use a default voice if the specific voice_id is not set
-    if not voice_id or voice_id == 'your_joe_rogan_voice_id':
-        voice_id = 'en_us_002'  # Default voice
-    
     headers = {
         'Content-Type': 'application/json',
         'Authorization': f'Bearer {SPEECHIFY_API_KEY}'
@@ -103,69 +248,109 @@ async def generate_audio(voice_id: str, person: str, line: str, index: int, outp
     payload = {
         'input': line,
         'voice_id': voice_id,
-        'audio_format': 'mp3'
+        'audio_format': audio_format
     }
     
-    async with aiohttp.ClientSession() as session:
-        async with session.post(SPEECHIFY_API_URL, headers=headers, json=payload) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                raise Exception(f"Speechify API error: {response.status} - {error_text}")
-            
-            data = await response.json()
-            if not data.get('audio_data'):
-                raise Exception('No audio data received from Speechify')
-            
-            # Convert base64 to audio file
-            audio_buffer = base64.b64decode(data['audio_data'])
-            audio_path = os.path.join(output_dir, f'{person}-{index}.mp3')
-            
-            with open(audio_path, 'wb') as f:
-                f.write(audio_buffer)
-            
-            return audio_path
-
-def create_video_from_audio(audio_files: List[str], output_path: str, background_music: str = None):
-    """Create video from audio files using ffmpeg"""
-    # Create a temporary file listing all audio files
-    temp_list = tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False)
-    for audio_file in audio_files:
-        temp_list.write(f"file '{audio_file}'\n")
-    temp_list.close()
-    
-    # Build ffmpeg command
-    cmd = [
-        'ffmpeg', '-y',  # Overwrite output
-        '-f', 'concat',
-        '-safe', '0',
-        '-i', temp_list.name,
-        '-c', 'copy',
-        '-shortest'
-    ]
-    
-    # Add background music if provided
-    if background_music and os.path.exists(background_music):
-        cmd.extend([
-            '-i', background_music,
-            '-filter_complex', '[0:a][1:a]amix=inputs=2:duration=first:weights=1,0.3[a]',
-            '-map', '[a]'
-        ])
-    
-    cmd.append(output_path)
-    
-    # Execute ffmpeg
+    url = SPEECHIFY_API_URL
+    if SPEECHIFY_RAW_AUDIO_STREAM:
+        url = SPEECHIFY_STREAM_URL
+        headers['Accept'] = 'audio/mpeg'
+    
+    attempts = 0
+    
+    async def request():
+        # Each attempt writes its own file, so a hedged duplicate can't interleave with it
+        nonlocal attempts
+        attempts += 1
+        attempt_path = f'{audio_path}.{attempts}'
+        session = get_session()
+        async with session.post(url, headers=headers, json=payload) as response:
+            await raise_for_status('Speechify', response)
+            # Decode the audio to disk as it arrives instead of buffering the whole body
+            await write_audio_response(response, attempt_path)
+        return attempt_path
+    
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"FFmpeg error: {e.stderr}")
-        return False
+        os.replace(await get_provider_client('Speechify').call(request, hedge=TTS_HEDGE), audio_path)
     finally:
-        os.unlink(temp_list.name)
+        # Drop whatever a cancelled or failed attempt left behind
+        for n in range(1, attempts + 1):
+            if os.path.exists(f'{audio_path}.{n}'):
+                os.unlink(f'{audio_path}.{n}')
+    
+    return audio_path
+
+def resolve_voice_id(agent_id: str, fallback_voice: str) -> str:
+    """Map a transcript agent to a TTS voice, using the fallback for unset or placeholder ids"""
+    voice_id = VOICE_IDS.get(agent_id, fallback_voice)
+    if not voice_id or voice_id.startswith('your_'):
+        voice_id = fallback_voice
+    return voice_id
+
+async def synthesize_transcript(transcript: Union[List[Dict[str, str]], AsyncIterator[Dict[str, str]]], fallback_voice: str, output_dir: str, concurrency: int = None, on_line_done: Callable[[int, int], None] = None) -> List[str]:
+    """Generate audio for all transcript lines concurrently, returning paths in transcript order.
+
+    The transcript may also be an async iterator (see stream_transcript), in which
+    case each line is dispatched to TTS as soon as it arrives. on_line_done is called
+    with (lines finished, lines known so far) after each line.
+    """
+    job_semaphore = asyncio.Semaphore(concurrency or TTS_CONCURRENCY_PER_JOB)
+    process_semaphore = _get_process_tts_semaphore()
+    finished = 0
+    
+    async def synthesize_line(index: int, entry: Dict[str, str]) -> str:
+        nonlocal finished
+        agent_id = entry['agentId']
+        voice_id = resolve_voice_id(agent_id, fallback_voice)
+        async with job_semaphore, process_semaphore:
+            print(f"Generating audio for {agent_id} with voice {voice_id}")
+            path = await generate_audio(voice_id, agent_id, entry['text'], index, output_dir)
+        finished += 1
+        if on_line_done:
+            on_line_done(finished, len(tasks))
+        return path
+    
+    tasks = []
+    try:
+        if hasattr(transcript, '__aiter__'):
+            async for entry in transcript:
+                tasks.append(asyncio.ensure_future(synthesize_line(len(tasks), entry)))
+        else:
+            tasks = [asyncio.ensure_future(synthesize_line(i, entry)) for i, entry in enumerate(transcript)]
+        
+        # gather preserves input order, which the concat step relies on
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+async def create_video_from_audio(audio_files: List[str], output_path: str, background_music: str = None, background_video: str = None, overlays: List[Dict[str, Any]] = None, render_profile: str = None, on_progress: Callable[[float], None] = None) -> Optional[RenderResult]:
+    """Create video from audio files in a single ffmpeg process"""
+    # Concat, ducking, mixing, footage trim, overlays and encode all run in one filtergraph
+    try:
+        plan = await plan_render(audio_files, output_path, background_music, background_video, overlays,
+                                 get_render_profile(render_profile))
+        return await execute_plan(plan, on_progress)
+    except FFmpegError as e:
+        print(f"FFmpeg error: {e}")
+        return None
+
+async def _collect_lines(stream: AsyncIterator[Dict[str, str]], lines: List[Dict[str, str]]) -> AsyncIterator[Dict[str, str]]:
+    """Pass a streamed transcript through, keeping a copy of each line"""
+    async for entry in stream:
+        lines.append(entry)
+        yield entry
 
-async def run_local_video_generation(filter=False, voice='en_us_002', background_video=None, background_music=None, title=None, story=None):
+async def run_local_video_generation(filter=False, voice='en_us_002', background_video=None, background_music=None, title=None, story=None, fresh_transcript=False, render_profile=None, progress: Optional[ProgressCallback] = None, fallback_voice: str = None, transcript: List[Dict[str, str]] = None, on_transcript: Callable[[List[Dict[str, str]]], None] = None):
     """
     Generate video using AI-powered transcript and TTS
+
+    Returns the render metadata (output path, duration, streams, size) of the saved video.
+    Stage transitions and percent complete are passed to `progress` as they happen.
+    Batches pass work shared between videos: a fallback voice looked up once, and a
+    transcript already voiced by another video (its lines are in the TTS cache).
+    on_transcript receives the transcript once all of its lines are synthesized.
     """
     if not title or not story:
         raise Exception("Title and story are required")
@@ -176,56 +361,70 @@ async def run_local_video_generation(filter=False, voice='en_us_002', background
     os.makedirs(voice_dir, exist_ok=True)
     
     try:
-        # Get available voices first
+        # Get available voices from the cached catalog
         print("Getting available voices...")
-        try:
-            available_voices = await get_available_voices()
-            print(f"Found {len(available_voices)} available voices")
-            
-            # Use first available voice as fallback
-            fallback_voice = available_voices[0]['voice_id'] if available_voices else 'en_us_002'
-        except Exception as e:
-            print(f"Warning: Could not get available voices: {e}")
-            fallback_voice = 'en_us_002'
+        report_progress(progress, 'voices')
+        if not fallback_voice:
+            try:
+                available_voices = await voice_registry.get_voices()
+                print(f"Found {len(available_voices)} available voices")
+                
+                # Use first available voice as fallback
+                fallback_voice = available_voices[0]['voice_id'] if available_voices else DEFAULT_VOICE_ID
+            except Exception as e:
+                print(f"Warning: Could not get available voices: {e}")
+                fallback_voice = DEFAULT_VOICE_ID
         
         # Generate transcript using AI
         print("Generating transcript...")
-        transcript = await generate_transcript(story, 'JOE_ROGAN', 'BEN_SHAPIRO')
+        report_progress(progress, 'transcript')
+        lines = []
+        if transcript is not None:
+            print("Using shared transcript")
+            lines = transcript
+        elif TRANSCRIPT_STREAMING:
+            # Each line goes to TTS the moment the LLM closes it
+            transcript = _collect_lines(stream_transcript(story, 'JOE_ROGAN', 'BEN_SHAPIRO', use_cache=not fresh_transcript), lines)
+        else:
+            transcript = lines = await generate_transcript(story, 'JOE_ROGAN', 'BEN_SHAPIRO', use_cache=not fresh_transcript)
         
-        # Generate audio for each line
+        # Generate audio for all lines concurrently
         print("Generating audio...")
-        audio_files = []
-        for i, entry in enumerate(transcript):
-            agent_id = entry['agentId']
-            text = entry['text']
-            voice_id = VOICE_IDS.get(agent_id, fallback_voice)
-            
-            # Use fallback if voice_id is not set or is placeholder
-            if not voice_id or voice_id.startswith('your_') or voice_id == 'your_joe_rogan_voice_id':
-                voice_id = fallback_voice
-            
-            print(f"Generating audio for {agent_id} with voice {voice_id}")
-            audio_path = await generate_audio(voice_id, agent_id, text, i, voice_dir)
-            audio_files.append(audio_path)
+        report_progress(progress, 'tts')
+        audio_files = await synthesize_transcript(
+            transcript, fallback_voice, voice_dir,
+            on_line_done=lambda done, total: report_progress(progress, 'tts', done / total, f'Line {done} of {total}')
+        )
+        if on_transcript and lines:
+            try:
+                on_transcript(list(lines))
+            except Exception as e:
+                print(f"Warning: Transcript callback failed: {e}")
         
         # Create final video
         print("Creating video...")
-        video_filename = f"generated_video_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+        report_progress(progress, 'render')
+        # Several workers render at once, so the timestamp alone isn't unique
+        video_filename = f"generated_video_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}.mp4"
         video_path = os.path.join(temp_dir, video_filename)
         
-        # For now, create audio-only video (you can enhance this with visual elements)
-        success = create_video_from_audio(audio_files, video_path, background_music)
+        # Without background footage the output is audio-only
+        result = await create_video_from_audio(audio_files, video_path, background_music, background_video,
+                                                render_profile=render_profile,
+                                                on_progress=lambda fraction: report_progress(progress, 'render', fraction))
         
-        if success and os.path.exists(video_path):
+        if result and os.path.exists(video_path):
             # Copy to a permanent location
+            report_progress(progress, 'publish')
             final_path = os.path.join('uploads', video_filename)
             os.makedirs('uploads', exist_ok=True)
             
             # Copy file
             import shutil
             shutil.copy2(video_path, final_path)
+            result.output_path = final_path
             
-            return final_path
+            return result
         else:
             raise Exception("Failed to create video")
             
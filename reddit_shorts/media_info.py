@@ -0,0 +1,97 @@
+import os
+import re
+import json
+import asyncio
+from typing import Dict, Any, Optional
+from reddit_shorts.ffmpeg_runner import run_ffmpeg, run_ffmpeg_capture, FFmpegError
+
+# Shortest asset worth offering in the catalog
+MIN_ASSET_SECONDS = float(os.getenv('MIN_ASSET_SECONDS', 3))
+
+_INTEGRATED_LOUDNESS = re.compile(r'I:\s+(-?[\d.]+|-inf) LUFS')
+
+def _frame_rate(rate: Optional[str]) -> Optional[float]:
+    """ffprobe rational ('30000/1001') to frames per second"""
+    if not rate or rate in ('0/0', 'N/A'):
+        return None
+    numerator, _, denominator = rate.partition('/')
+    try:
+        return round(float(numerator) / float(denominator or 1), 3)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+async def probe_streams(path: str) -> Dict[str, Any]:
+    """Container and stream headers of a media file, as ffprobe JSON"""
+    stdout = await run_ffmpeg([
+        'ffprobe', '-v', 'error', '-print_format', 'json',
+        '-show_format', '-show_streams', path
+    ])
+    return json.loads(stdout.decode('utf-8') or '{}')
+
+async def measure_loudness(path: str) -> Optional[float]:
+    """Integrated loudness (EBU R128) of the first audio stream, in LUFS"""
+    _, stderr = await run_ffmpeg_capture([
+        'ffmpeg', '-nostats', '-hide_banner', '-i', path,
+        '-map', '0:a:0', '-af', 'ebur128=framelog=verbose', '-f', 'null', '-'
+    ])
+    matches = _INTEGRATED_LOUDNESS.findall(stderr.decode('utf-8', errors='replace'))
+    if not matches or matches[-1] == '-inf':
+        return None
+    return float(matches[-1])
+
+async def count_keyframes(path: str) -> int:
+    """Keyframes in the first video stream, from a packet scan (no decoding)"""
+    stdout = await run_ffmpeg([
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=flags', '-of', 'csv=print_section=0', path
+    ])
+    return sum(1 for line in stdout.decode('utf-8').splitlines() if 'K' in line)
+
+async def extract_media_info(path: str, asset_type: str) -> Dict[str, Any]:
+    """Everything the catalog shows about an asset, so listing it never touches the file.
+
+    Videos get resolution, frame rate and keyframe count; music gets loudness. Files
+    that can't be read, lack the needed stream or are too short are marked unusable.
+    """
+    info = {
+        'duration': None, 'codec': None, 'width': None, 'height': None, 'fps': None,
+        'bit_rate': None, 'loudness': None, 'keyframe_count': None,
+        'is_usable': False, 'metadata_error': None
+    }
+    try:
+        probe = await probe_streams(path)
+        streams = probe.get('streams', [])
+        wanted = 'audio' if asset_type == 'music' else 'video'
+        stream = next((s for s in streams if s.get('codec_type') == wanted), None)
+        if stream is None:
+            info['metadata_error'] = f'No {wanted} stream'
+            return info
+
+        info['duration'] = _float(probe.get('format', {}).get('duration')) or _float(stream.get('duration'))
+        info['codec'] = stream.get('codec_name')
+        info['bit_rate'] = int(_float(probe.get('format', {}).get('bit_rate')) or 0) or None
+        if wanted == 'video':
+            info['width'] = stream.get('width')
+            info['height'] = stream.get('height')
+            info['fps'] = _frame_rate(stream.get('avg_frame_rate')) or _frame_rate(stream.get('r_frame_rate'))
+            info['keyframe_count'] = await count_keyframes(path)
+        else:
+            info['loudness'] = await measure_loudness(path)
+
+        if not info['duration'] or info['duration'] < MIN_ASSET_SECONDS:
+            info['metadata_error'] = f"Shorter than {MIN_ASSET_SECONDS:g}s"
+        else:
+            info['is_usable'] = True
+    except (FFmpegError, ValueError) as e:
+        info['metadata_error'] = str(e)[:500]
+    return info
+
+def extract_media_info_sync(path: str, asset_type: str) -> Dict[str, Any]:
+    """extract_media_info for process pool workers, each running its own event loop"""
+    return asyncio.run(extract_media_info(path, asset_type))
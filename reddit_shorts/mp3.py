@@ -0,0 +1,229 @@
+import os
+import mmap
+import struct
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Header tables, indexed by the header's version bits: 0 = MPEG 2.5, 2 = MPEG 2, 3 = MPEG 1
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000)
+}
+# kbps by (MPEG 1?, layer) and bitrate index 1-14
+_BITRATES = {
+    (True, 1): (32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+}
+
+# Encoder strings that are followed by the LAME extension (delay/padding) in an Xing tag
+_LAME_TAG_ENCODERS = (b'LAME', b'Lavf', b'Lavc')
+
+# How far into the file to look for the first frame after any ID3v2 tag
+MAX_SYNC_SEARCH = 64 * 1024
+
+class MP3Error(ValueError):
+    """The file isn't a readable MPEG audio stream"""
+
+@dataclass
+class FrameHeader:
+    """One decoded 4-byte MPEG audio frame header"""
+    version: int
+    layer: int
+    bitrate: int  # kbps
+    sample_rate: int
+    padding: int
+    channels: int
+
+    @property
+    def mpeg1(self) -> bool:
+        return self.version == 3
+
+    @property
+    def samples_per_frame(self) -> int:
+        if self.layer == 1:
+            return 384
+        if self.layer == 3 and not self.mpeg1:
+            return 576
+        return 1152
+
+    @property
+    def frame_length(self) -> int:
+        if self.layer == 1:
+            return (12 * self.bitrate * 1000 // self.sample_rate + self.padding) * 4
+        return self.samples_per_frame // 8 * self.bitrate * 1000 // self.sample_rate + self.padding
+
+    @property
+    def side_info_length(self) -> int:
+        """Layer III side information size, which the Xing tag follows"""
+        if self.mpeg1:
+            return 17 if self.channels == 1 else 32
+        return 9 if self.channels == 1 else 17
+
+def parse_frame_header(data, offset: int) -> Optional[FrameHeader]:
+    """Decode the frame header at offset, or None if there isn't a valid one"""
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x3
+    layer = 4 - ((b1 >> 1) & 0x3)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None  # reserved values, or free-format which we can't size
+    return FrameHeader(
+        version=version,
+        layer=layer,
+        bitrate=_BITRATES[(version == 3, layer)][bitrate_index - 1],
+        sample_rate=_SAMPLE_RATES[version][rate_index],
+        padding=(b2 >> 1) & 0x1,
+        channels=1 if (b3 >> 6) == 3 else 2
+    )
+
+@dataclass
+class MP3Info:
+    """Stream properties of an MP3 file, computed from headers only"""
+    sample_rate: int
+    channels: int
+    frames: int
+    samples: int
+    bitrate: int  # average kbps
+    vbr: bool
+    encoder_delay: int = 0
+    encoder_padding: int = 0
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate
+
+def _id3v2_length(data) -> int:
+    """Size of an ID3v2 tag at the start of the file, including header and footer"""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+def _id3v1_length(data) -> int:
+    """Size of an ID3v1 tag at the end of the file"""
+    return 128 if len(data) >= 128 and data[-128:-125] == b'TAG' else 0
+
+def _find_first_frame(data, start: int) -> Tuple[int, FrameHeader]:
+    """First frame whose successor is also a valid header, so stray 0xFF bytes aren't mistaken for sync"""
+    end = min(len(data), start + MAX_SYNC_SEARCH)
+    offset = data.find(b'\xff', start, end)
+    while offset != -1:
+        header = parse_frame_header(data, offset)
+        if header:
+            following = offset + header.frame_length
+            successor = parse_frame_header(data, following)
+            if following >= len(data) or (successor and successor.sample_rate == header.sample_rate
+                                          and successor.layer == header.layer):
+                return offset, header
+        offset = data.find(b'\xff', offset + 1, end)
+    raise MP3Error("No MPEG audio frame found")
+
+def _read_xing(data, offset: int, header: FrameHeader) -> Optional[Tuple[int, int, int]]:
+    """(frames, encoder delay, encoder padding) from a Xing/Info tag, if the first frame has one"""
+    tag = offset + 4 + header.side_info_length
+    if data[tag:tag + 4] not in (b'Xing', b'Info'):
+        return None
+    flags, = struct.unpack('>I', data[tag + 4:tag + 8])
+    position = tag + 8
+    frames = None
+    if flags & 0x1:
+        frames, = struct.unpack('>I', data[position:position + 4])
+        position += 4
+    if flags & 0x2:
+        position += 4  # byte count
+    if flags & 0x4:
+        position += 100  # seek table
+    if flags & 0x8:
+        position += 4  # quality
+    if frames is None:
+        return None
+
+    # The LAME extension records how many samples the encoder added at each end
+    delay = padding = 0
+    if position + 24 <= offset + header.frame_length and data[position:position + 4] in _LAME_TAG_ENCODERS:
+        b0, b1, b2 = data[position + 21], data[position + 22], data[position + 23]
+        delay = (b0 << 4) | (b1 >> 4)
+        padding = ((b1 & 0x0F) << 8) | b2
+    return frames, delay, padding
+
+def _read_vbri(data, offset: int) -> Optional[Tuple[int, int]]:
+    """(frames, encoder delay) from a Fraunhofer VBRI tag, if the first frame has one"""
+    tag = offset + 4 + 32
+    if data[tag:tag + 4] != b'VBRI':
+        return None
+    delay, = struct.unpack('>H', data[tag + 6:tag + 8])
+    frames, = struct.unpack('>I', data[tag + 14:tag + 18])
+    return frames, delay
+
+def _count_frames(data, offset: int, header: FrameHeader) -> Tuple[int, int, bool]:
+    """Walk the frame headers: (frame count, audio bytes, whether the bitrate varies)"""
+    frames = 0
+    audio_bytes = 0
+    bitrates = set()
+    while True:
+        current = parse_frame_header(data, offset)
+        if current is None or current.sample_rate != header.sample_rate or current.layer != header.layer:
+            break
+        if offset + current.frame_length > len(data):
+            break  # truncated final frame
+        frames += 1
+        audio_bytes += current.frame_length
+        bitrates.add(current.bitrate)
+        offset += current.frame_length
+    return frames, audio_bytes, len(bitrates) > 1
+
+def parse_mp3_buffer(data) -> MP3Info:
+    """Compute MP3 stream properties from a bytes-like buffer, reading only headers"""
+    offset, header = _find_first_frame(data, _id3v2_length(data))
+    samples_per_frame = header.samples_per_frame
+
+    xing = _read_xing(data, offset, header) if header.layer == 3 else None
+    vbri = _read_vbri(data, offset) if xing is None else None
+    if xing or vbri:
+        # Tag frame counts exclude the tag frame itself, which decodes to silence and is dropped
+        frames, delay, padding = xing if xing else (vbri[0], vbri[1], 0)
+        tag = offset + 4 + header.side_info_length
+        audio_bytes = len(data) - offset - header.frame_length - _id3v1_length(data)
+        vbr = xing is None or data[tag:tag + 4] == b'Xing'
+    else:
+        frames, audio_bytes, vbr = _count_frames(data, offset, header)
+        delay = padding = 0
+    if not frames:
+        raise MP3Error("MPEG audio stream has no frames")
+
+    samples = max(frames * samples_per_frame - delay - padding, 0)
+    duration = frames * samples_per_frame / header.sample_rate
+    return MP3Info(
+        sample_rate=header.sample_rate,
+        channels=header.channels,
+        frames=frames,
+        samples=samples,
+        bitrate=round(audio_bytes * 8 / duration / 1000) if duration else header.bitrate,
+        vbr=vbr,
+        encoder_delay=delay,
+        encoder_padding=padding
+    )
+
+def parse_mp3(path: str) -> MP3Info:
+    """Compute an MP3 file's duration and sample count from its headers, memory-mapped"""
+    if os.path.getsize(path) == 0:
+        raise MP3Error(f"Empty file: {path}")
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return parse_mp3_buffer(data)
+
+def mp3_duration(path: str) -> float:
+    """Exact playback duration of an MP3 file in seconds"""
+    return parse_mp3(path).duration
@@ -0,0 +1,51 @@
+import os
+from typing import Dict
+from reddit_shorts.ffmpeg_runner import run_ffmpeg
+
+# Catalog preview settings
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_OFFSET = 5  # seconds, pulled in for short clips
+SPRITE_COLUMNS = 5
+SPRITE_ROWS = 5
+SPRITE_TILE_WIDTH = 160
+PREVIEW_SECONDS = 3
+PREVIEW_FPS = 10
+PREVIEW_WIDTH = 240
+PREVIEW_FORMAT = os.getenv('PREVIEW_FORMAT', 'webp').lower()  # webp or gif
+
+def preview_paths(video_path: str) -> Dict[str, str]:
+    """Where the thumbnail, sprite and animated preview of a video are written"""
+    base = os.path.splitext(video_path)[0]
+    return {
+        'thumbnail': f'{base}_thumb.jpg',
+        'sprite': f'{base}_sprite.jpg',
+        'preview': f'{base}_preview.{PREVIEW_FORMAT}'
+    }
+
+async def generate_previews(video_path: str, duration: float) -> Dict[str, str]:
+    """Write the thumbnail, a contact-sheet sprite and a short animated preview in one decode pass"""
+    paths = preview_paths(video_path)
+    start = min(THUMBNAIL_OFFSET, duration / 10) if duration else 0
+    tiles = SPRITE_COLUMNS * SPRITE_ROWS
+    sprite_fps = tiles / duration if duration else 1
+
+    # A single decode feeds all three outputs through split
+    filters = ';'.join([
+        '[0:v]split=3[t][s][p]',
+        f'[t]trim=start={start:.3f},setpts=PTS-STARTPTS,scale={THUMBNAIL_WIDTH}:-2[thumb]',
+        f'[s]fps={sprite_fps:.6f},scale={SPRITE_TILE_WIDTH}:-2,tile={SPRITE_COLUMNS}x{SPRITE_ROWS}[sprite]',
+        f'[p]trim=start={start:.3f}:duration={PREVIEW_SECONDS},setpts=PTS-STARTPTS,'
+        f'fps={PREVIEW_FPS},scale={PREVIEW_WIDTH}:-2[preview]'
+    ])
+    if PREVIEW_FORMAT == 'gif':
+        preview_args = ['-c:v', 'gif', '-loop', '0']
+    else:
+        preview_args = ['-c:v', 'libwebp_anim', '-loop', '0', '-quality', '60']
+
+    await run_ffmpeg([
+        'ffmpeg', '-y', '-v', 'error', '-i', video_path, '-filter_complex', filters,
+        '-map', '[thumb]', '-frames:v', '1', '-q:v', '3', paths['thumbnail'],
+        '-map', '[sprite]', '-frames:v', '1', '-q:v', '4', paths['sprite'],
+        '-map', '[preview]', *preview_args, paths['preview']
+    ])
+    return paths
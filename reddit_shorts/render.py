@@ -0,0 +1,201 @@
+import os
+import json
+import fcntl
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Tuple
+import numpy as np
+from reddit_shorts.ffmpeg_runner import run_ffmpeg
+from reddit_shorts.keyframes import KeyframeIndex, ensure_keyframe_index, index_path
+from reddit_shorts.audio_engine import SAMPLE_RATE, mix_audio_track
+from reddit_shorts.mp3 import MP3Error, mp3_duration
+from reddit_shorts.render_plan import RenderPlan, RenderProfile, Overlay, RENDER_PROFILES, DEFAULT_RENDER_PROFILE, \
+    get_render_profile
+
+# Normalized vertical mezzanine format that background footage is transcoded to once
+MEZZANINE_DIR = os.getenv('MEZZANINE_DIR', os.path.join('uploads', 'mezzanine'))
+MEZZANINE_WIDTH = 1080
+MEZZANINE_HEIGHT = 1920
+MEZZANINE_FPS = 30
+MEZZANINE_GOP_SECONDS = 1  # fixed keyframe interval, so cut points are never far apart
+MEZZANINE_CRF = 20
+MEZZANINE_PRESET = os.getenv('MEZZANINE_PRESET', 'medium')
+# Mezzanines are built at index time for the owner's profile, and on first use for any other,
+# so long sources get more time than a render
+MEZZANINE_TIMEOUT = float(os.getenv('MEZZANINE_TIMEOUT', 3600))  # seconds
+MEZZANINE_LOCK_POLL_INTERVAL = 0.5  # seconds
+
+# Where the audio is mixed: 'filtergraph' does it inside the single render process,
+# 'numpy' mixes in-process and pipes the PCM into that process instead
+AUDIO_MIX_MODE = os.getenv('AUDIO_MIX_MODE', 'filtergraph').lower()
+
+# Per-path locks so concurrent jobs don't transcode the same asset twice; the
+# flock on a file next to the mezzanine extends that to other processes
+_mezzanine_locks = {}
+
+def mezzanine_path(source_path: str, width: int = MEZZANINE_WIDTH, height: int = MEZZANINE_HEIGHT) -> str:
+    """Get the mezzanine location for a source file, keyed by its identity and the target size"""
+    stat = os.stat(source_path)
+    identity = f'{os.path.abspath(source_path)}:{stat.st_size}:{stat.st_mtime_ns}:{width}x{height}'
+    digest = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+    return os.path.join(MEZZANINE_DIR, f'{digest}.mp4')
+
+def _sidecar_path(mezz_path: str) -> str:
+    return os.path.splitext(mezz_path)[0] + '.json'
+
+def load_mezzanine_info(mezz_path: str) -> Dict[str, Any]:
+    """Load the metadata recorded next to a mezzanine file"""
+    with open(_sidecar_path(mezz_path), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+@asynccontextmanager
+async def _mezzanine_file_lock(mezz_path: str):
+    """Hold a host-wide lock on a mezzanine while it is built"""
+    fd = os.open(f'{mezz_path}.lock', os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(MEZZANINE_LOCK_POLL_INTERVAL)
+        yield
+    finally:
+        os.close(fd)
+
+async def probe_duration(path: str) -> float:
+    """Get a media file's container duration in seconds"""
+    stdout = await run_ffmpeg([
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1', path
+    ])
+    return float(stdout.decode('utf-8').strip())
+
+async def prepare_mezzanine(source_path: str, width: int = MEZZANINE_WIDTH, height: int = MEZZANINE_HEIGHT) -> str:
+    """Transcode background footage into the vertical mezzanine format, once per source file.
+
+    The output is cropped to fill width x height, has a constant frame rate, a fixed
+    GOP with no scene-cut keyframes and no audio, so renders can stream-copy it. Its
+    keyframe index is built alongside.
+    """
+    mezz_path = mezzanine_path(source_path, width, height)
+    lock = _mezzanine_locks.setdefault(mezz_path, asyncio.Lock())
+    os.makedirs(MEZZANINE_DIR, exist_ok=True)
+    async with lock, _mezzanine_file_lock(mezz_path):
+        if os.path.exists(mezz_path) and os.path.exists(_sidecar_path(mezz_path)):
+            await ensure_keyframe_index(mezz_path, load_mezzanine_info(mezz_path)['duration'])
+            return mezz_path
+
+        temp_path = f'{mezz_path}.{os.getpid()}.part.mp4'
+        gop = MEZZANINE_FPS * MEZZANINE_GOP_SECONDS
+        try:
+            await run_ffmpeg([
+                'ffmpeg', '-y', '-v', 'error', '-i', source_path,
+                '-an',
+                '-vf', (f'scale={width}:{height}:force_original_aspect_ratio=increase,'
+                        f'crop={width}:{height},fps={MEZZANINE_FPS},setsar=1'),
+                '-c:v', 'libx264', '-preset', MEZZANINE_PRESET, '-crf', str(MEZZANINE_CRF),
+                '-pix_fmt', 'yuv420p', '-profile:v', 'high',
+                '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0',
+                '-movflags', '+faststart',
+                temp_path
+            ], timeout=MEZZANINE_TIMEOUT)
+            duration = await probe_duration(temp_path)
+            os.replace(temp_path, mezz_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+        with open(_sidecar_path(mezz_path), 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': os.path.abspath(source_path),
+                'duration': duration,
+                'width': width,
+                'height': height,
+                'fps': MEZZANINE_FPS,
+                'gop_seconds': MEZZANINE_GOP_SECONDS
+            }, f)
+        await ensure_keyframe_index(mezz_path, duration)
+        return mezz_path
+
+def mezzanine_sizes() -> List[Tuple[int, int]]:
+    """Every frame size a render profile can ask for"""
+    return list(dict.fromkeys((profile.width, profile.height) for profile in RENDER_PROFILES.values()))
+
+async def index_footage(source_path: str, profiles: List[str] = None) -> KeyframeIndex:
+    """Prepare a background asset for copy-only renders: a mezzanine and keyframe index per given profile.
+
+    Only the profiles that will render the asset are worth a full-length transcode up
+    front (by default the default profile); a render at any other size builds its
+    mezzanine on first use. Returns the index of the first profile's mezzanine.
+    """
+    indexes = []
+    for name in profiles or [DEFAULT_RENDER_PROFILE]:
+        profile = get_render_profile(name)
+        mezz_path = await prepare_mezzanine(source_path, profile.width, profile.height)
+        indexes.append(await ensure_keyframe_index(mezz_path, load_mezzanine_info(mezz_path)['duration']))
+    return indexes[0]
+
+def derived_files(source_path: str) -> List[str]:
+    """Every file indexing derives from a source: its keyframe index, and each mezzanine with its sidecar, index and lock"""
+    paths = [index_path(source_path)]
+    for width, height in mezzanine_sizes():
+        mezz_path = mezzanine_path(source_path, width, height)
+        paths += [mezz_path, _sidecar_path(mezz_path), index_path(mezz_path), f'{mezz_path}.lock']
+    return paths
+
+async def clip_duration(path: str) -> float:
+    """Exact duration of a line clip from its MP3 headers, probing only when it isn't MP3"""
+    try:
+        return mp3_duration(path)
+    except MP3Error:
+        return await probe_duration(path)
+
+def line_timings(durations: List[float], gap: float) -> List[Tuple[float, float]]:
+    """(start, end) of each line on the output timeline, with gap seconds between lines"""
+    timings = []
+    position = 0.0
+    for duration in durations:
+        timings.append((round(position, 3), round(position + duration, 3)))
+        position += duration + gap
+    return timings
+
+async def plan_render(audio_files: List[str], output_path: str, background_music: str = None,
+                      background_video: str = None, overlays: List[Dict[str, Any]] = None,
+                      profile: RenderProfile = None) -> RenderPlan:
+    """Describe a whole render (lines, music, footage, overlays, output profile) as one plan.
+
+    Background footage is resolved to its mezzanine and a random keyframe start, so
+    without overlays the video is stream-copied. Without footage the output is audio-only.
+    """
+    plan = RenderPlan(
+        output_path=output_path,
+        audio_clips=list(audio_files),
+        overlays=[Overlay(**overlay) for overlay in overlays or []],
+        profile=profile or get_render_profile()
+    )
+    if background_music and os.path.exists(background_music):
+        plan.music = background_music
+
+    # Line timings come from the clips' MP3 headers, with no subprocess per line
+    durations = await asyncio.gather(*(clip_duration(path) for path in plan.audio_clips))
+    plan.line_timings = line_timings(durations, plan.line_gap)
+    plan.duration = sum(durations) + plan.line_gap * max(len(durations) - 1, 0)
+
+    if AUDIO_MIX_MODE == 'numpy':
+        pcm = await mix_audio_track(plan.audio_clips, plan.music, plan.music_volume)
+        plan.pcm_audio = np.ascontiguousarray(pcm, dtype='<f4').tobytes()
+        plan.duration = len(pcm) / SAMPLE_RATE
+        plan.audio_clips, plan.music = [], None
+
+    if background_video and os.path.exists(background_video):
+        mezz_path = await prepare_mezzanine(background_video, plan.profile.width, plan.profile.height)
+        info = load_mezzanine_info(mezz_path)
+        index = await ensure_keyframe_index(mezz_path, info['duration'])
+        plan.background = mezz_path
+        plan.background_copy = True
+        plan.background_start = index.pick_start(plan.duration)
+        # Loop only when the remaining footage could run out before the audio does
+        plan.background_loop = info['duration'] - plan.background_start < plan.duration
+    return plan
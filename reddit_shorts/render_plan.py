@@ -0,0 +1,272 @@
+import os
+import shlex
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from reddit_shorts.ffmpeg_runner import run_ffmpeg
+from reddit_shorts.audio_engine import SAMPLE_RATE, CHANNELS, LINE_GAP_SECONDS, MUSIC_VOLUME, AUDIO_BITRATE
+
+# Print every compiled filtergraph before running it
+RENDER_DEBUG = os.getenv('RENDER_DEBUG', 'False').lower() == 'true'
+
+@dataclass
+class Overlay:
+    """An image drawn over the video, optionally only between start and end seconds"""
+    path: str
+    x: str = '0'
+    y: str = '0'
+    start: Optional[float] = None
+    end: Optional[float] = None
+
+@dataclass
+class RenderProfile:
+    """Output encoding settings"""
+    name: str = 'default'
+    width: int = 1080
+    height: int = 1920
+    fps: int = 30
+    crf: int = 23
+    video_bitrate: Optional[str] = None  # overrides crf when set
+    preset: str = 'veryfast'
+    audio_bitrate: str = AUDIO_BITRATE
+    threads: int = 0  # 0 lets x264 decide
+
+    def video_args(self) -> List[str]:
+        """x264 output options for this profile"""
+        args = ['-c:v', 'libx264', '-preset', self.preset, '-pix_fmt', 'yuv420p', '-r', str(self.fps)]
+        if self.video_bitrate:
+            args += ['-b:v', self.video_bitrate, '-maxrate', self.video_bitrate, '-bufsize', self.video_bitrate]
+        else:
+            args += ['-crf', str(self.crf)]
+        if self.threads:
+            args += ['-threads', str(self.threads)]
+        return args
+
+    def audio_args(self) -> List[str]:
+        """AAC output options for this profile"""
+        return ['-c:a', 'aac', '-b:a', self.audio_bitrate]
+
+# Named output profiles; each subscription plan picks one in Config.SUBSCRIPTION_PLANS
+RENDER_PROFILES = {
+    '720p': RenderProfile(name='720p', width=720, height=1280, crf=26, preset='veryfast',
+                          audio_bitrate='128k', threads=2),
+    '1080p': RenderProfile(name='1080p', width=1080, height=1920, crf=22, preset='fast',
+                           audio_bitrate='192k', threads=4),
+    '4k': RenderProfile(name='4k', width=2160, height=3840, crf=20, preset='medium',
+                        audio_bitrate='256k', threads=0)
+}
+DEFAULT_RENDER_PROFILE = os.getenv('DEFAULT_RENDER_PROFILE', '720p')
+
+def get_render_profile(name: str = None) -> RenderProfile:
+    """Look up a render profile by name, falling back to the default profile"""
+    return RENDER_PROFILES.get(name or DEFAULT_RENDER_PROFILE, RENDER_PROFILES[DEFAULT_RENDER_PROFILE])
+
+@dataclass
+class CompiledRender:
+    """A render plan compiled to a single ffmpeg invocation"""
+    args: List[str]
+    filter_graph: str
+    stdin: Optional[bytes] = None
+
+    def command_line(self) -> str:
+        """Shell-quoted command, for logs and reproducing a render by hand"""
+        return shlex.join(self.args)
+
+@dataclass
+class RenderPlan:
+    """Everything one render needs, compiled into one filter_complex graph and one ffmpeg process.
+
+    Audio comes either from line clips (concatenated with gaps, music ducked under them
+    by a sidechain compressor and mixed, all inside the graph) or from a pre-mixed PCM
+    buffer. Background footage that already matches the profile (a mezzanine) is
+    stream-copied unless overlays force a video encode.
+    """
+    output_path: str
+    audio_clips: List[str] = field(default_factory=list)
+    pcm_audio: Optional[bytes] = None
+    music: Optional[str] = None
+    music_volume: float = MUSIC_VOLUME
+    line_gap: float = LINE_GAP_SECONDS
+    background: Optional[str] = None
+    background_start: float = 0.0
+    background_loop: bool = True
+    background_copy: bool = False
+    overlays: List[Overlay] = field(default_factory=list)
+    profile: RenderProfile = field(default_factory=get_render_profile)
+    duration: Optional[float] = None
+    line_timings: List[Tuple[float, float]] = field(default_factory=list)
+
+    def compile(self) -> CompiledRender:
+        """Build the ffmpeg arguments and filtergraph for this plan"""
+        if not self.audio_clips and self.pcm_audio is None:
+            raise ValueError("A render plan needs audio clips or PCM audio")
+
+        inputs = []
+        filters = []
+        maps = []
+        codecs = []
+
+        def add_input(*options) -> int:
+            inputs.extend(options)
+            return sum(1 for option in inputs if option == '-i') - 1
+
+        # Video: background footage plus overlays
+        video_label = None
+        if self.background:
+            options = ['-stream_loop', '-1'] if self.background_loop else []
+            background = add_input(*options, '-ss', f'{self.background_start:.3f}', '-i', self.background)
+            if self.background_copy and not self.overlays:
+                maps += ['-map', f'{background}:v:0']
+                codecs += ['-c:v', 'copy']
+            else:
+                video_label = f'[{background}:v]'
+                if not self.background_copy:
+                    p = self.profile
+                    filters.append(f'{video_label}scale={p.width}:{p.height}:force_original_aspect_ratio=increase,'
+                                   f'crop={p.width}:{p.height},fps={p.fps},setsar=1[base]')
+                    video_label = '[base]'
+
+        # Audio
+        if self.pcm_audio is not None:
+            pcm = add_input('-f', 'f32le', '-ar', str(SAMPLE_RATE), '-ac', str(CHANNELS), '-i', 'pipe:0')
+            maps += ['-map', f'{pcm}:a']
+        else:
+            labels = []
+            for i, clip in enumerate(self.audio_clips):
+                index = add_input('-i', clip)
+                chain = f'[{index}:a]aformat=sample_rates={SAMPLE_RATE}:channel_layouts=stereo'
+                if i < len(self.audio_clips) - 1 and self.line_gap > 0:
+                    chain += f',apad=pad_dur={self.line_gap}'
+                filters.append(f'{chain}[line{i}]')
+                labels.append(f'[line{i}]')
+            filters.append(f"{''.join(labels)}concat=n={len(labels)}:v=0:a=1[speech]")
+            audio_label = '[speech]'
+
+            if self.music:
+                music = add_input('-stream_loop', '-1', '-i', self.music)
+                filters += [
+                    f'[{music}:a]aformat=sample_rates={SAMPLE_RATE}:channel_layouts=stereo,volume={self.music_volume}[bed]',
+                    '[speech]asplit=2[voice][key]',
+                    '[bed][key]sidechaincompress=threshold=0.02:ratio=6:attack=20:release=300[ducked]',
+                    '[voice][ducked]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[mix]'
+                ]
+                audio_label = '[mix]'
+            maps += ['-map', audio_label]
+
+        if video_label is not None:
+            for i, overlay in enumerate(self.overlays):
+                image = add_input('-loop', '1', '-i', overlay.path)
+                enable = ''
+                if overlay.start is not None or overlay.end is not None:
+                    start = overlay.start or 0
+                    end = overlay.end if overlay.end is not None else 1e9
+                    enable = f":enable='between(t,{start},{end})'"
+                filters.append(f'{video_label}[{image}:v]overlay={overlay.x}:{overlay.y}:shortest=1{enable}[ov{i}]')
+                video_label = f'[ov{i}]'
+            maps = ['-map', video_label] + maps
+            codecs += self.profile.video_args()
+
+        codecs += self.profile.audio_args()
+        filter_graph = ';'.join(filters)
+
+        # Progress key=value pairs on stdout give the final output time without re-probing
+        args = ['ffmpeg', '-y', '-v', 'error', '-nostats', '-progress', 'pipe:1'] + inputs
+        if filter_graph:
+            args += ['-filter_complex', filter_graph]
+        args += maps + codecs
+        if self.duration is not None:
+            args += ['-t', f'{self.duration:.3f}']
+        else:
+            args += ['-shortest']
+        args += ['-movflags', '+faststart', self.output_path]
+        return CompiledRender(args=args, filter_graph=filter_graph, stdin=self.pcm_audio)
+
+    def output_streams(self) -> List[Dict[str, Any]]:
+        """Describe the streams this plan writes"""
+        streams = []
+        if self.background:
+            streams.append({
+                'type': 'video',
+                'codec': 'h264',
+                'width': self.profile.width,
+                'height': self.profile.height,
+                'fps': self.profile.fps,
+                'copied': self.background_copy and not self.overlays
+            })
+        streams.append({
+            'type': 'audio',
+            'codec': 'aac',
+            'sample_rate': SAMPLE_RATE,
+            'channels': CHANNELS,
+            'bitrate': self.profile.audio_bitrate
+        })
+        return streams
+
+@dataclass
+class RenderResult:
+    """Metadata of a finished render, known without probing the output file"""
+    output_path: str
+    duration: float
+    size: int
+    profile: str
+    streams: List[Dict[str, Any]]
+    line_timings: List[Tuple[float, float]] = field(default_factory=list)
+    filter_graph: str = ''
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'output_path': self.output_path,
+            'duration': self.duration,
+            'size': self.size,
+            'profile': self.profile,
+            'streams': self.streams,
+            'line_timings': self.line_timings
+        }
+
+def parse_progress_time(progress: bytes) -> Optional[float]:
+    """Last out_time reported by ffmpeg -progress, in seconds"""
+    out_time = None
+    for line in progress.decode('utf-8', errors='replace').splitlines():
+        key, _, value = line.partition('=')
+        if key in ('out_time_us', 'out_time_ms') and value.strip().lstrip('-').isdigit():
+            # Both keys are in microseconds (out_time_ms is a historical misnomer)
+            out_time = max(int(value), 0) / 1_000_000
+    return out_time
+
+def _progress_reporter(on_progress: Callable[[float], None], duration: float) -> Callable[[bytes], None]:
+    """An ffmpeg -progress line handler reporting the encoded fraction of duration"""
+    def on_line(line: bytes):
+        out_time = parse_progress_time(line)
+        if out_time is not None:
+            on_progress(min(out_time / duration, 1.0))
+    return on_line
+
+async def execute_plan(plan: RenderPlan, on_progress: Optional[Callable[[float], None]] = None) -> RenderResult:
+    """Compile a plan and run it as a single ffmpeg process.
+
+    on_progress, if given, receives the fraction of the output encoded so far.
+    """
+    compiled = plan.compile()
+    if RENDER_DEBUG:
+        print(f"Render filtergraph: {compiled.filter_graph or '(none)'}")
+        print(f"Render command: {compiled.command_line()}")
+
+    on_line = _progress_reporter(on_progress, plan.duration) if on_progress is not None and plan.duration else None
+    progress = await run_ffmpeg(compiled.args, input=compiled.stdin, on_line=on_line)
+
+    # Pre-mixed audio has an exact sample count; otherwise trust ffmpeg's own clock
+    if plan.pcm_audio is not None:
+        duration = len(plan.pcm_audio) / (4 * CHANNELS * SAMPLE_RATE)
+    else:
+        duration = parse_progress_time(progress) or plan.duration or 0.0
+    if plan.duration is not None:
+        duration = min(duration, plan.duration)
+
+    return RenderResult(
+        output_path=plan.output_path,
+        duration=round(duration, 3),
+        size=os.path.getsize(plan.output_path),
+        profile=plan.profile.name,
+        streams=plan.output_streams(),
+        line_timings=plan.line_timings,
+        filter_graph=compiled.filter_graph
+    )
@@ -0,0 +1,432 @@
+import os
+import time
+import random
+import asyncio
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+import aiohttp
+
+# Retry policy shared by all providers
+PROVIDER_MAX_ATTEMPTS = int(os.getenv('PROVIDER_MAX_ATTEMPTS', 4))
+PROVIDER_RETRY_BASE = float(os.getenv('PROVIDER_RETRY_BASE', 0.5))  # seconds, doubled per attempt
+PROVIDER_RETRY_MAX = float(os.getenv('PROVIDER_RETRY_MAX', 20))  # seconds
+PROVIDER_RETRY_AFTER_MAX = float(os.getenv('PROVIDER_RETRY_AFTER_MAX', 60))  # cap on a provider's Retry-After
+
+# Circuit breaker: open after this many consecutive failures, probe again after the reset timeout
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', 15))
+CIRCUIT_MAX_RESET_SECONDS = float(os.getenv('CIRCUIT_MAX_RESET_SECONDS', 120))
+
+# Per-process provider limits (each worker process has its own buckets)
+GROQ_RATE_PER_SECOND = float(os.getenv('GROQ_RATE_PER_SECOND', 1))
+GROQ_BURST = int(os.getenv('GROQ_BURST', 5))
+GROQ_MAX_CONCURRENCY = int(os.getenv('GROQ_MAX_CONCURRENCY', 8))
+SPEECHIFY_RATE_PER_SECOND = float(os.getenv('SPEECHIFY_RATE_PER_SECOND', 10))
+SPEECHIFY_BURST = int(os.getenv('SPEECHIFY_BURST', 20))
+SPEECHIFY_MAX_CONCURRENCY = int(os.getenv('SPEECHIFY_MAX_CONCURRENCY', 32))
+
+# Hedged TTS requests: a second request is sent if the first is slower than the
+# recent p95 latency (never sooner than TTS_HEDGE_MIN_DELAY) and capacity is spare
+TTS_HEDGE = os.getenv('TTS_HEDGE', 'False').lower() == 'true'
+TTS_HEDGE_MIN_DELAY = float(os.getenv('TTS_HEDGE_MIN_DELAY', 1.5))  # seconds
+
+class ProviderError(Exception):
+    """A provider answered with an error status"""
+
+    def __init__(self, provider: str, status: int, message: str = '', retry_after: float = None):
+        super().__init__(f"{provider} API error: {status}" + (f" - {message}" if message else ''))
+        self.provider = provider
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def throttled(self) -> bool:
+        return self.status == 429
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in (408, 429) or self.status >= 500
+
+class CircuitOpenError(Exception):
+    """A provider's circuit is open, so the call was rejected without a request"""
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header (delta-seconds or HTTP date) in seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+async def raise_for_status(provider: str, response: aiohttp.ClientResponse):
+    """Turn a non-2xx response into a ProviderError carrying its Retry-After"""
+    if response.status < 300:
+        return
+    try:
+        message = (await response.text())[:500]
+    except Exception:
+        message = ''
+    raise ProviderError(provider, response.status, message, parse_retry_after(response.headers.get('Retry-After')))
+
+class TokenBucket:
+    """Request rate limit: `rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.paused_until or self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def acquire(self):
+        """Wait for a token (and for any Retry-After pause to pass)"""
+        while not self.try_acquire():
+            now = time.monotonic()
+            wait = self.paused_until - now if now < self.paused_until else (1 - self.tokens) / self.rate
+            await asyncio.sleep(max(wait, 0.001))
+
+    def pause(self, seconds: float):
+        """Hold every request back for a while, as the provider asked"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class AIMDLimiter:
+    """Adaptive concurrency limit.
+
+    Each success raises the limit by 1/limit (about +1 per round of requests); a
+    throttled response cuts it by `decrease`, at most once per cooldown so a burst
+    of 429s from the same round counts as one signal.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, decrease: float = 0.5, cooldown: float = 1.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = 0.0
+
+    def try_acquire(self) -> bool:
+        if self._waiters or self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    async def acquire(self):
+        if self.try_acquire():
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just as we were cancelled
+                self.release('neutral')
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, outcome: str):
+        """Free a slot and adapt the limit: outcome is ok, throttled, failed or neutral"""
+        self.in_flight -= 1
+        if outcome == 'ok':
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        elif outcome == 'throttled':
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._last_decrease = now
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+class CircuitBreaker:
+    """Stops calling a provider that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls fail
+    fast. Once the reset timeout passes it goes half-open and lets a single probe
+    through: success closes it, failure reopens it with the timeout doubled.
+    Throttling isn't a failure; the provider is up, just busy.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, max_reset_timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max(reset_timeout, max_reset_timeout)
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+
+    def before_call(self):
+        """Reserve the right to call, raising CircuitOpenError when the circuit won't allow it"""
+        if self.state == 'open':
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(f"Circuit open, retry in {remaining:.1f}s")
+            self.state = 'half_open'
+        if self.state == 'half_open':
+            if self._probing:
+                raise CircuitOpenError("Circuit half-open, probe in progress")
+            self._probing = True
+
+    def record(self, outcome: str):
+        """Feed back the outcome of a call let through by before_call"""
+        probe, self._probing = self._probing, False
+        if outcome == 'ok':
+            self.state = 'closed'
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+        elif outcome == 'failed':
+            if probe or self.state == 'half_open':
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+                self._open()
+            else:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._open()
+
+    def _open(self):
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        print(f"Warning: Circuit opened after {self.failures} failures, probing again in {self.reset_timeout:g}s")
+
+class ProviderClient:
+    """Rate limiting, adaptive concurrency, retries and circuit breaking for one provider.
+
+    Wrap each request in a coroutine function that raises ProviderError (see
+    raise_for_status) and pass it to call(); streaming responses go through stream().
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_concurrency: int,
+                 max_attempts: int = PROVIDER_MAX_ATTEMPTS, hedge_min_delay: float = TTS_HEDGE_MIN_DELAY):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AIMDLimiter(initial=max(1, max_concurrency // 4), minimum=1, maximum=max_concurrency)
+        self.breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS, CIRCUIT_MAX_RESET_SECONDS)
+        self.max_attempts = max(1, max_attempts)
+        self.hedge_min_delay = hedge_min_delay
+        self.latencies = deque(maxlen=200)
+        self.counts = {'calls': 0, 'ok': 0, 'throttled': 0, 'failed': 0, 'retries': 0,
+                       'rejected': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], hedge: bool = False) -> Any:
+        """Run one request with retries; `hedge` races a second copy when the first is slow"""
+        self.counts['calls'] += 1
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                if hedge:
+                    return await self._hedged(fn)
+                await self._enter()
+                return await self._attempt(fn)
+            except Exception as e:
+                await self._before_retry(e, attempt)
+
+    @asynccontextmanager
+    async def stream(self, open_fn: Callable[[], Awaitable[aiohttp.ClientResponse]]):
+        """Open a streaming response with retries, keeping its slot until the body is read.
+
+        Only opening is retried: once the caller has consumed part of the body a
+        failure is raised as is.
+        """
+        self.counts['calls'] += 1
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._enter()
+            except Exception as e:
+                await self._before_retry(e, attempt)
+                continue
+            start = time.monotonic()
+            try:
+                response = await open_fn()
+            except BaseException as e:
+                self._exit(self._classify(e))
+                if not isinstance(e, Exception):
+                    raise
+                await self._before_retry(e, attempt)
+                continue
+
+            outcome = 'neutral'
+            try:
+                async with response:
+                    yield response
+                outcome = 'ok'
+                self.latencies.append(time.monotonic() - start)
+            except BaseException as e:
+                outcome = self._classify(e)
+                raise
+            finally:
+                self._exit(outcome)
+            return
+
+    async def _before_retry(self, error: Exception, attempt: int):
+        """Sleep before the next attempt, or re-raise if the error is final"""
+        if isinstance(error, CircuitOpenError):
+            self.counts['rejected'] += 1
+            raise error
+        retryable = error.retryable if isinstance(error, ProviderError) else \
+            isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+        if not retryable or attempt >= self.max_attempts:
+            raise error
+        delay = self.backoff(attempt, getattr(error, 'retry_after', None))
+        self.counts['retries'] += 1
+        print(f"{self.name}: {error}; retrying in {delay:.1f}s (attempt {attempt + 1} of {self.max_attempts})")
+        await asyncio.sleep(delay)
+
+    @staticmethod
+    def backoff(attempt: int, retry_after: float = None) -> float:
+        """Exponential backoff with full jitter, never shorter than the provider's Retry-After"""
+        delay = random.uniform(0, min(PROVIDER_RETRY_MAX, PROVIDER_RETRY_BASE * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, PROVIDER_RETRY_AFTER_MAX))
+        return delay
+
+    async def _enter(self):
+        """Take a circuit pass, a rate token and a concurrency slot"""
+        self.breaker.before_call()
+        try:
+            await self.bucket.acquire()
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.record('neutral')
+            raise
+
+    def _exit(self, outcome: str):
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+        self.limiter.release(outcome)
+        self.breaker.record(outcome)
+
+    def _classify(self, error: BaseException) -> str:
+        if isinstance(error, ProviderError):
+            if error.throttled:
+                if error.retry_after:
+                    self.bucket.pause(min(error.retry_after, PROVIDER_RETRY_AFTER_MAX))
+                return 'throttled'
+            return 'failed' if error.retryable else 'neutral'
+        if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)):
+            return 'failed'
+        return 'neutral'
+
+    async def _attempt(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """One request in a slot already taken by _enter"""
+        outcome = 'neutral'
+        start = time.monotonic()
+        try:
+            result = await fn()
+            outcome = 'ok'
+            self.latencies.append(time.monotonic() - start)
+            return result
+        except BaseException as e:
+            outcome = self._classify(e)
+            raise
+        finally:
+            self._exit(outcome)
+
+    def hedge_delay(self) -> float:
+        """How long to wait on the first request before hedging: recent p95 latency"""
+        if len(self.latencies) < 20:
+            return self.hedge_min_delay
+        return max(self.hedge_min_delay, self._latency_quantile(0.95))
+
+    def _latency_quantile(self, q: float) -> Optional[float]:
+        latencies = sorted(self.latencies)
+        return latencies[int(q * (len(latencies) - 1))] if latencies else None
+
+    def _take_spare_capacity(self) -> bool:
+        """A slot for a hedge, only if it costs nobody a wait"""
+        if self.breaker.state != 'closed' or not self.bucket.try_acquire():
+            return False
+        if not self.limiter.try_acquire():
+            self.bucket.tokens += 1
+            return False
+        return True
+
+    async def _hedged(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        await self._enter()
+        tasks = [asyncio.ensure_future(self._attempt(fn))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            if not done and self._take_spare_capacity():
+                self.counts['hedges'] += 1
+                tasks.append(asyncio.ensure_future(self._attempt(fn)))
+
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self.counts['hedge_wins'] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Wait for the loser to hand its slot back; its error doesn't matter
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and current limits, for monitoring"""
+        return {
+            **self.counts,
+            'concurrency_limit': round(self.limiter.limit, 2),
+            'in_flight': self.limiter.in_flight,
+            'circuit': self.breaker.state,
+            'circuit_opened': self.breaker.times_opened,
+            'p50_latency': self._latency_quantile(0.5),
+            'p95_latency': self._latency_quantile(0.95)
+        }
+
+PROVIDER_LIMITS = {
+    'Groq': (GROQ_RATE_PER_SECOND, GROQ_BURST, GROQ_MAX_CONCURRENCY),
+    'Speechify': (SPEECHIFY_RATE_PER_SECOND, SPEECHIFY_BURST, SPEECHIFY_MAX_CONCURRENCY)
+}
+
+# Limiter waiters are futures bound to a loop, so keep one client per provider per loop
+# (in practice the single worker loop, making these per-process limits)
+_clients = weakref.WeakKeyDictionary()
+
+def get_provider_client(name: str) -> ProviderClient:
+    """Get the client for a provider on the running event loop, creating it on first use"""
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(name)
+    if client is None:
+        client = clients[name] = ProviderClient(name, *PROVIDER_LIMITS[name])
+    return client
@@ -0,0 +1,58 @@
+import os
+import atexit
+import asyncio
+import threading
+import concurrent.futures
+from reddit_shorts.http_client import close_session
+
+# A single long-lived event loop per worker process. Running every pipeline
+# coroutine on it lets pooled connections, semaphores and caches that are
+# bound to a loop be shared across jobs instead of dying with asyncio.run().
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Get the worker event loop, starting its thread on first use (and again after a fork)"""
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='reddit-shorts-loop', daemon=True)
+            thread.start()
+            _loop, _loop_pid = loop, os.getpid()
+        return _loop
+
+def run_sync(coro, timeout: float = None):
+    """Run a coroutine on the worker loop and block the calling thread until it finishes"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_worker_loop())
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+def submit(coro) -> concurrent.futures.Future:
+    """Schedule a coroutine on the worker loop without waiting for it"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_worker_loop())
+    future.add_done_callback(_report_failure)
+    return future
+
+def _report_failure(future: concurrent.futures.Future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Warning: Background task failed: {future.exception()}")
+
+def shutdown_worker_loop():
+    """Close pooled connections and stop the worker loop"""
+    global _loop
+    with _loop_lock:
+        loop, _loop = _loop, None
+    if loop is None or _loop_pid != os.getpid():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(close_session(), loop).result(5)
+    except Exception as e:
+        print(f"Warning: Could not close HTTP session: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+
+atexit.register(shutdown_worker_loop)
@@ -1,14 +1,6 @@
 from enum import Enum
+from reddit_shorts.voices import VOICE_NAME_MAP
 
-class Voice(Enum):
-    """TikTok voice options"""
-    EN_US_002 = "en_us_002"
-    EN_US_006 = "en_us_006"
-    EN_UK_001 = "en_uk_001"
-    EN_MALE_JOMBOY = "en_male_jomboy"
-    ES_MX_002 = "es_mx_002"
-    EN_MALE_FUNNY = "en_male_funny"
-    EN_US_GHOSTFACE = "en_us_ghostface"
-    EN_FEMALE_SAMC = "en_female_samc"
-    EN_MALE_CODY = "en_male_cody"
-    EN_FEMALE_MAKEUP = "en_female_makeup" 
\ No newline at end of file
+# TikTok voice options, generated from the voice registry so the two cannot drift
+Voice = Enum('Voice', {voice_id.upper(): voice_id for voice_id in VOICE_NAME_MAP})
+Voice.__doc__ = """TikTok voice options"""
@@ -0,0 +1,84 @@
+import json
+from typing import List, Dict
+
+class TranscriptStreamParser:
+    """Incrementally extract entries of the "transcript" array from streamed JSON text.
+
+    Feed the LLM output as it arrives; every {agentId, text} object is returned as
+    soon as its closing brace is seen, without waiting for the rest of the document.
+    """
+
+    def __init__(self):
+        self._text = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._array_depth = None  # nesting depth of the transcript array elements
+        self._entry_start = None
+        self._emitted = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, str]]:
+        """Consume more text, returning the transcript entries it completed"""
+        self._text += chunk
+        entries = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = self._decode(text[self._string_start:i + 1])
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in '{[':
+                if char == '[' and self._depth == 1 and self._last_key == 'transcript':
+                    self._array_depth = self._depth + 1
+                elif char == '{' and self._array_depth is not None and self._depth == self._array_depth:
+                    self._entry_start = i
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._array_depth is not None:
+                    if char == '}' and self._depth == self._array_depth and self._entry_start is not None:
+                        entry = self._decode(text[self._entry_start:i + 1])
+                        self._entry_start = None
+                        if self._is_entry(entry):
+                            entries.append(entry)
+                    elif char == ']' and self._depth == self._array_depth - 1:
+                        self._array_depth = None
+        self._pos = len(text)
+        self._emitted += len(entries)
+        return entries
+
+    def finish(self) -> List[Dict[str, str]]:
+        """Flush at end of stream, falling back to a full parse if nothing was streamed"""
+        if self._emitted:
+            return []
+        start = self._text.find('{')
+        if start == -1:
+            return []
+        parsed = self._decode(self._text[start:self._text.rfind('}') + 1])
+        transcript = parsed.get('transcript', []) if isinstance(parsed, dict) else []
+        return [entry for entry in transcript if self._is_entry(entry)]
+
+    @staticmethod
+    def _decode(fragment: str):
+        try:
+            return json.loads(fragment)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _is_entry(entry) -> bool:
+        return isinstance(entry, dict) and 'agentId' in entry and 'text' in entry
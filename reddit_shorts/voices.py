@@ -0,0 +1,193 @@
+import os
+import time
+import asyncio
+from typing import List, Dict, Any
+from reddit_shorts.http_client import get_session
+from reddit_shorts.runtime import get_worker_loop
+from reddit_shorts.resilience import get_provider_client, raise_for_status
+
+SPEECHIFY_API_KEY = os.getenv('SPEECHIFY_API_KEY', '').strip()
+SPEECHIFY_VOICES_URL = os.getenv('SPEECHIFY_VOICES_URL', 'https://api.sws.speechify.com/v1/voices')
+
+# Catalog freshness: serve from memory for VOICE_CACHE_TTL, then keep serving the
+# stale copy (refreshing in the background) until VOICE_CACHE_STALE_TTL
+VOICE_CACHE_TTL = int(os.getenv('VOICE_CACHE_TTL', 3600))  # seconds
+VOICE_CACHE_STALE_TTL = int(os.getenv('VOICE_CACHE_STALE_TTL', 86400))  # seconds
+VOICE_CACHE_RETRY_AFTER = int(os.getenv('VOICE_CACHE_RETRY_AFTER', 60))  # seconds
+
+# Voice used when the provider catalog is unavailable
+DEFAULT_VOICE_ID = 'en_us_002'
+
+# Served to synchronous callers until the first provider fetch lands, so they never wait on it
+BUNDLED_VOICES = [
+    {'voice_id': 'emily', 'name': 'Emily', 'description': 'Default voice', 'gender': None, 'locale': None}
+]
+
+# Voice IDs for different characters
+VOICE_IDS = {
+    'JOE_ROGAN': 'emily',
+    'BARACK_OBAMA': 'emily',
+    'BEN_SHAPIRO': 'emily',
+    'DONALD_TRUMP': 'emily',
+    'JOE_BIDEN': 'emily',
+    'KAMALA_HARRIS': 'emily',
+    'ANDREW_TATE': 'emily',
+    'JORDAN_PETERSON': 'emily',
+}
+
+# Display names for TikTok-style voice ids
+VOICE_NAME_MAP = {
+    'en_male_jomboy': 'Game On',
+    'en_us_002': 'Jessie',
+    'es_mx_002': 'Warm',
+    'en_male_funny': 'Wacky',
+    'en_us_ghostface': 'Scream',
+    'en_female_samc': 'Empathetic',
+    'en_male_cody': 'Serious',
+    'en_female_makeup': 'Beauty Guru',
+    'en_female_richgirl': 'Bestie',
+    'en_male_grinch': 'Trickster',
+    'en_us_006': 'Joey',
+    'en_male_narration': 'Story Teller',
+    'en_male_deadpool': 'Mr. GoodGuy',
+    'en_uk_001': 'Narrator',
+    'en_uk_003': 'Male English UK',
+    'en_au_001': 'Metro',
+    'en_male_jarvis': 'Alfred',
+    'en_male_ashmagic': 'ashmagic',
+    'en_male_olantekkers': 'olantekkers',
+    'en_male_ukneighbor': 'Lord Cringe',
+    'en_male_ukbutler': 'Mr. Meticulous',
+    'en_female_shenna': 'Debutante',
+    'en_female_pansino': 'Varsity',
+    'en_male_trevor': 'Marty',
+    'en_female_f08_twinkle': 'Pop Lullaby',
+    'en_male_m03_classical': 'Classic Electric',
+    'en_female_betty': 'Bae',
+    'en_male_cupid': 'Cupid',
+    'en_female_grandma': 'Granny',
+    'en_male_m2_xhxs_m03_christmas': 'Cozy',
+    'en_male_santa_narration': 'Author',
+    'en_male_sing_deep_jingle': 'Caroler',
+    'en_male_santa_effect': 'Santa',
+    'en_female_ht_f08_newyear': 'NYE 2023',
+    'en_male_wizard': 'Magician',
+    'en_female_ht_f08_halloween': 'Opera',
+    'en_female_ht_f08_glorious': 'Euphoric',
+    'en_male_sing_funny_it_goes_up': 'Hypetrain',
+    'en_female_ht_f08_wonderful_world': 'Melodrama',
+    'en_male_m2_xhxs_m03_silly': 'Quirky Time',
+    'en_female_emotional': 'Peaceful',
+    'en_male_m03_sunshine_soon': 'Toon Beat',
+    'en_female_f08_warmy_breeze': 'Open Mic',
+    'en_male_sing_funny_thanksgiving': 'Thanksgiving',
+    'en_female_f08_salut_damour': 'Cottagecore',
+    'en_us_007': 'Professor',
+    'en_us_009': 'Scientist',
+    'en_us_010': 'Confidence',
+    'en_au_002': 'Smooth',
+    'fr_001': 'French - Male 1'
+}
+
+async def fetch_provider_voices() -> List[Dict[str, Any]]:
+    """Get available voices from Speechify API"""
+    if not SPEECHIFY_API_KEY:
+        raise Exception("SPEECHIFY_API_KEY not configured")
+    
+    headers = {
+        'Authorization': f'Bearer {SPEECHIFY_API_KEY}'
+    }
+    
+    async def request():
+        session = get_session()
+        async with session.get(SPEECHIFY_VOICES_URL, headers=headers) as response:
+            await raise_for_status('Speechify', response)
+            return await response.json()
+    
+    data = await get_provider_client('Speechify').call(request)
+    return data if isinstance(data, list) else data.get('voices', [])
+
+def normalize_voice(voice: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a provider voice entry into the registry format"""
+    voice_id = voice.get('id') or voice.get('voice_id')
+    return {
+        'voice_id': voice_id,
+        'name': voice.get('display_name') or voice.get('name') or VOICE_NAME_MAP.get(voice_id, voice_id),
+        'description': voice.get('description') or ' '.join(filter(None, [voice.get('gender'), voice.get('locale')])),
+        'gender': voice.get('gender'),
+        'locale': voice.get('locale')
+    }
+
+class VoiceRegistry:
+    """In-process voice catalog synced from the TTS provider.
+
+    A fresh catalog is returned as is. Once older than ttl it is still returned
+    while a single background refresh runs (stale-while-revalidate); only a cold
+    or fully expired catalog makes an async caller wait for the provider.
+    Synchronous callers never wait: they get the bundled catalog instead.
+    """
+
+    def __init__(self, fetcher, ttl: int, stale_ttl: int, retry_after: int, bundled: List[Dict[str, Any]] = None):
+        self._fetcher = fetcher
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.retry_after = retry_after
+        self.bundled = list(bundled or [])
+        self._voices = None
+        self._fetched_at = 0.0
+        self._next_attempt = 0.0
+        self._refresh_task = None
+
+    def _age(self) -> float:
+        return time.monotonic() - self._fetched_at
+
+    async def get_voices(self) -> List[Dict[str, Any]]:
+        """Get the voice catalog, refreshing it from the provider as needed"""
+        if self._voices is not None and self._age() < self.stale_ttl:
+            if self._age() >= self.ttl and time.monotonic() >= self._next_attempt:
+                self._start_refresh().add_done_callback(_report_refresh_failure)
+            return self._voices
+        
+        if time.monotonic() < self._next_attempt:
+            raise Exception("Voice catalog unavailable, provider refresh recently failed")
+        # Concurrent cold callers share one provider request
+        return await asyncio.shield(self._start_refresh())
+
+    def get_voices_sync(self) -> List[Dict[str, Any]]:
+        """Get the voice catalog from synchronous code such as Flask views, without waiting on the provider.
+
+        A stale catalog, or the bundled one until a fetch returns voices, is returned at once.
+        """
+        if (self._voices is None or self._age() >= self.ttl) and time.monotonic() >= self._next_attempt:
+            # Refreshes run on the worker loop so the pooled client is reused
+            get_worker_loop().call_soon_threadsafe(self._refresh_in_background)
+        return self._voices or self.bundled
+
+    def _refresh_in_background(self):
+        previous = self._refresh_task
+        task = self._start_refresh()
+        if task is not previous:
+            task.add_done_callback(_report_refresh_failure)
+
+    def _start_refresh(self) -> asyncio.Future:
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._refresh_task = asyncio.ensure_future(self._refresh())
+        return task
+
+    async def _refresh(self) -> List[Dict[str, Any]]:
+        try:
+            voices = [normalize_voice(voice) for voice in await self._fetcher()]
+        except Exception:
+            self._next_attempt = time.monotonic() + self.retry_after
+            raise
+        self._voices = [voice for voice in voices if voice['voice_id']]
+        self._fetched_at = time.monotonic()
+        return self._voices
+
+def _report_refresh_failure(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Warning: Background voice refresh failed: {task.exception()}")
+
+voice_registry = VoiceRegistry(fetch_provider_voices, VOICE_CACHE_TTL, VOICE_CACHE_STALE_TTL, VOICE_CACHE_RETRY_AFTER,
+                               BUNDLED_VOICES)
@@ -1,3 +1,5 @@
+import os
+import click
 from app import create_app, db
 from models import User
 
@@ -13,6 +15,102 @@ def init_db():
     db.create_all()
     print('Database initialized!')
 
+@app.cli.command()
+def upgrade_db():
+    """Create missing tables and add columns the models gained since the database was created."""
+    from sqlalchemy import inspect, text
+    
+    # create_all() never alters a table that already exists
+    db.create_all()
+    inspector = inspect(db.engine)
+    quote = db.engine.dialect.identifier_preparer.quote
+    added = 0
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                print(f'Skipping {table.name}.{column.name}: NOT NULL columns need a manual migration')
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}'))
+            print(f'Added {table.name}.{column.name} ({column_type})')
+            added += 1
+    print(f'Database upgraded, {added} columns added')
+
+@app.cli.command()
+@click.option('--profile', 'profiles', multiple=True,
+              help='Render profile to build mezzanines for (repeatable; default: the default profile). '
+                   'Other profiles are built on first use.')
+def index_footage(profiles):
+    """Transcode and keyframe-index all background footage."""
+    from models import BackgroundAsset
+    from reddit_shorts.config import footage
+    from reddit_shorts.render import index_footage as index_asset
+    from reddit_shorts.runtime import run_sync
+    
+    paths = list(footage)
+    paths += [asset.file_path for asset in BackgroundAsset.query.filter_by(asset_type='video', is_active=True)]
+    
+    for path in dict.fromkeys(paths):
+        if not os.path.exists(path):
+            print(f'Skipping missing file: {path}')
+            continue
+        try:
+            index = run_sync(index_asset(path, list(profiles) or None))
+            print(f'Indexed {path}: {len(index)} keyframes over {index.duration:.1f}s')
+        except Exception as e:
+            print(f'Failed to index {path}: {e}')
+
+@app.cli.command()
+@click.option('--workers', default=os.cpu_count() or 2, show_default=True, help='Worker processes.')
+@click.option('--all', 'include_inactive', is_flag=True, help='Also re-index inactive assets.')
+def reindex_assets(workers, include_inactive):
+    """Re-extract media metadata for the whole asset catalog in parallel."""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from models import BackgroundAsset
+    from reddit_shorts.media_info import extract_media_info_sync
+    
+    query = BackgroundAsset.query.filter(BackgroundAsset.asset_type.in_(['video', 'music']))
+    if not include_inactive:
+        query = query.filter_by(is_active=True)
+    assets = {asset.id: asset for asset in query}
+    print(f'Re-indexing {len(assets)} assets with {workers} workers...')
+    
+    # Workers only run ffprobe/ffmpeg; all database writes stay in this process
+    unusable = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(extract_media_info_sync, asset.file_path, asset.asset_type): asset_id
+            for asset_id, asset in assets.items()
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            asset = assets[futures[future]]
+            try:
+                info = future.result()
+            except Exception as e:
+                info = {'is_usable': False, 'metadata_error': str(e)[:500]}
+            asset.update_media_info(info)
+            if not asset.is_usable:
+                unusable += 1
+                print(f'Unusable asset {asset.id} ({asset.file_path}): {asset.metadata_error}')
+            if done % 50 == 0:
+                db.session.commit()
+                print(f'{done}/{len(assets)} done')
+    db.session.commit()
+    print(f'Re-indexed {len(assets)} assets, {unusable} unusable')
+
+@app.cli.command()
+@click.option('--hours', default=24, show_default=True, help='Window of started jobs to report on.')
+def queue_stats(hours):
+    """Print queue wait percentiles and backlog for every plan."""
+    import json
+    from jobs import queue_wait_stats
+    
+    print(json.dumps(queue_wait_stats(hours), indent=2))
+
 @app.cli.command()
 def create_admin():
     """Create an admin user."""
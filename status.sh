@@ -8,6 +8,7 @@ echo "📊 Service Status:"
 echo "-----------------"
 sudo systemctl is-active brainrot-generator && echo "✅ Flask App: ACTIVE" || echo "❌ Flask App: INACTIVE"
 sudo systemctl is-active nginx && echo "✅ Nginx: ACTIVE" || echo "❌ Nginx: INACTIVE"
+echo "Render workers: $(systemctl list-units 'brainrot-worker@*' --state=active --no-legend | wc -l) active"
 
 echo ""
 echo "🌐 Application URLs:"
@@ -0,0 +1,146 @@
+import json
+import time
+import base64
+import random
+import asyncio
+import argparse
+from aiohttp import web
+
+# One silent MPEG 1 Layer III frame (128 kbps, 44.1 kHz), enough for the MP3 parser and ffmpeg
+SILENT_FRAME = bytes([0xFF, 0xFB, 0x90, 0x00]).ljust(417, b'\x00')
+FRAMES_PER_LINE = 40  # about a second of audio
+
+def fake_transcript(lines=6):
+    return {'transcript': [
+        {'agentId': 'JOE_ROGAN' if i % 2 == 0 else 'BARACK_OBAMA', 'text': f'Stub line number {i + 1}.'}
+        for i in range(lines)
+    ]}
+
+class Faults:
+    """Latency and errors injected into every stubbed endpoint"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, rate_limit=0.0,
+                 retry_after=1, fail_first=0, slow_rate=0.0, slow_first=0, slow_latency=5.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit  # requests per second before answering 429, 0 for none
+        self.retry_after = retry_after
+        self.fail_first = fail_first  # answer the first N requests with 503
+        self.slow_rate = slow_rate  # share of requests delayed by slow_latency (tail latency)
+        self.slow_first = slow_first  # delay the first N requests by slow_latency
+        self.slow_latency = slow_latency
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._tokens = rate_limit
+        self._updated = time.monotonic()
+
+    def _over_rate_limit(self):
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._updated) * self.rate_limit)
+        self._updated = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    async def inject(self):
+        """Sleep and/or return an error response for this request, or None to answer normally"""
+        self.requests += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if self.requests <= self.slow_first or self.random.random() < self.slow_rate:
+            delay += self.slow_latency
+        if delay:
+            await asyncio.sleep(delay)
+        if self._over_rate_limit() or self.random.random() < self.throttle_rate:
+            return web.json_response({'error': 'rate limited'}, status=429, headers={'Retry-After': str(self.retry_after)})
+        if self.requests <= self.fail_first or self.random.random() < self.error_rate:
+            return web.json_response({'error': 'upstream unavailable'}, status=503)
+        return None
+
+def create_app(faults: Faults = None) -> web.Application:
+    """Fake Groq and Speechify endpoints, with the paths of the real ones"""
+    faults = faults or Faults()
+    app = web.Application()
+
+    async def chat_completions(request):
+        error = await faults.inject()
+        if error is not None:
+            return error
+        payload = await request.json()
+        content = json.dumps(fake_transcript())
+        if not payload.get('stream'):
+            return web.json_response({'choices': [{'message': {'role': 'assistant', 'content': content}}]})
+
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        for start in range(0, len(content), 16):
+            chunk = {'choices': [{'delta': {'content': content[start:start + 16]}}]}
+            await response.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+        await response.write(b'data: [DONE]\n\n')
+        await response.write_eof()
+        return response
+
+    async def speech(request):
+        error = await faults.inject()
+        if error is not None:
+            return error
+        await request.json()
+        audio = SILENT_FRAME * FRAMES_PER_LINE
+        return web.json_response({'audio_data': base64.b64encode(audio).decode(), 'audio_format': 'mp3'})
+
+    async def stream(request):
+        error = await faults.inject()
+        if error is not None:
+            return error
+        await request.json()
+        return web.Response(body=SILENT_FRAME * FRAMES_PER_LINE, content_type='audio/mpeg')
+
+    async def voices(request):
+        error = await faults.inject()
+        if error is not None:
+            return error
+        return web.json_response([
+            {'id': 'emily', 'display_name': 'Emily', 'gender': 'female', 'locale': 'en-US'},
+            {'id': 'george', 'display_name': 'George', 'gender': 'male', 'locale': 'en-GB'}
+        ])
+
+    app.router.add_post('/openai/v1/chat/completions', chat_completions)
+    app.router.add_post('/v1/audio/speech', speech)
+    app.router.add_post('/v1/audio/stream', stream)
+    app.router.add_get('/v1/voices', voices)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub Groq and Speechify APIs with injected latency and errors')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.2, help='Base latency per request (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Random extra latency (seconds)')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Share of requests given --slow-latency extra')
+    parser.add_argument('--slow-first', type=int, default=0, help='Give the first N requests --slow-latency extra')
+    parser.add_argument('--slow-latency', type=float, default=5.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests answered with 429')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Requests per second before 429 (0: unlimited)')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After sent with 429 (seconds)')
+    parser.add_argument('--fail-first', type=int, default=0, help='Answer the first N requests with 503')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    faults = Faults(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                    throttle_rate=args.throttle_rate, rate_limit=args.rate_limit, retry_after=args.retry_after,
+                    fail_first=args.fail_first, slow_rate=args.slow_rate, slow_first=args.slow_first,
+                    slow_latency=args.slow_latency, seed=args.seed)
+    base = f'http://127.0.0.1:{args.port}'
+    print('Point the app at the stub with:')
+    print(f'  GROQ_API_URL={base}/openai/v1/chat/completions')
+    print(f'  SPEECHIFY_API_URL={base}/v1/audio/speech')
+    print(f'  SPEECHIFY_STREAM_URL={base}/v1/audio/stream')
+    print(f'  SPEECHIFY_VOICES_URL={base}/v1/voices')
+    web.run_app(create_app(faults), host='127.0.0.1', port=args.port)
+
+if __name__ == '__main__':
+    main()
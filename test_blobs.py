@@ -0,0 +1,75 @@
+import os
+import hashlib
+import tempfile
+import threading
+import pytest
+
+# The app reads its database and upload folders from the environment at import
+TEST_DIR = tempfile.mkdtemp(prefix='blobs-test-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_DIR, 'app.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(TEST_DIR, 'uploads')
+os.environ['BLOB_FOLDER'] = os.path.join(TEST_DIR, 'uploads', 'blobs')
+
+from app import create_app
+from extensions import db
+from models import StoredBlob
+from utils import blob_staging_path, release_blob, store_blob
+
+CONTENT = b'background footage' * 1024
+CONTENT_HASH = hashlib.sha256(CONTENT).hexdigest()
+
+@pytest.fixture
+def app():
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+def stage_upload():
+    path = blob_staging_path()
+    with open(path, 'wb') as f:
+        f.write(CONTENT)
+    return path
+
+def test_store_reuses_existing_content(app):
+    with app.app_context():
+        first, first_new = store_blob(stage_upload(), CONTENT_HASH, '.mp4')
+        second, second_new = store_blob(stage_upload(), CONTENT_HASH, '.mp4')
+        assert first_new and not second_new
+        assert first.id == second.id and second.ref_count == 2
+
+        release_blob(first.id)
+        assert os.path.exists(first.file_path)
+        release_blob(first.id)
+        assert StoredBlob.query.get(first.id) is None
+        assert not os.path.exists(first.file_path)
+
+def test_store_racing_release_keeps_the_file(app):
+    def release(blob_id, barrier):
+        with app.app_context():
+            barrier.wait()
+            release_blob(blob_id)
+
+    for _ in range(25):
+        with app.app_context():
+            blob, _ = store_blob(stage_upload(), CONTENT_HASH, '.mp4')
+            blob_id = blob.id
+            staged = stage_upload()
+
+        barrier = threading.Barrier(2)
+        releaser = threading.Thread(target=release, args=(blob_id, barrier))
+        releaser.start()
+        with app.app_context():
+            barrier.wait()
+            stored, _ = store_blob(staged, CONTENT_HASH, '.mp4')
+            releaser.join()
+
+            # Whichever ran first, the new reference must point at a live row and an existing file
+            db.session.expire_all()
+            row = StoredBlob.query.get(stored.id)
+            assert row is not None and row.ref_count == 1
+            assert os.path.exists(row.file_path)
+
+            release_blob(row.id)
+            assert StoredBlob.query.count() == 0
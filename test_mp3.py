@@ -0,0 +1,117 @@
+import struct
+import pytest
+from reddit_shorts.mp3 import MP3Error, parse_frame_header, parse_mp3, parse_mp3_buffer, mp3_duration
+
+# Header fields for the synthetic streams below
+MPEG1, MPEG2 = 3, 2
+LAYER3_BITS = 1
+
+def frame_header(version=MPEG1, bitrate_index=9, rate_index=0, padding=0, mono=False):
+    """Build a 4-byte Layer III frame header (defaults: MPEG 1, 128 kbps, 44.1 kHz, stereo)"""
+    b1 = 0xE0 | (version << 3) | (LAYER3_BITS << 1) | 0x1  # no CRC
+    b2 = (bitrate_index << 4) | (rate_index << 2) | (padding << 1)
+    b3 = 0xC0 if mono else 0x00
+    return bytes([0xFF, b1, b2, b3])
+
+def frame(payload=b'', **fields):
+    """A complete frame: header, payload, then zeros up to the frame length"""
+    header = frame_header(**fields)
+    length = parse_frame_header(header, 0).frame_length
+    body = payload.ljust(length - 4, b'\x00')
+    assert len(body) == length - 4
+    return header + body
+
+def xing_frame(frames, delay, padding, encoder=b'LAME3.100', version=MPEG1, mono=False, tag=b'Info', **fields):
+    """A first frame carrying an Xing/Info tag with every optional field and a LAME extension"""
+    side_info = (17 if mono else 32) if version == MPEG1 else (9 if mono else 17)
+    xing = tag + struct.pack('>III', 0xF, frames, 0) + bytes(100) + struct.pack('>I', 50)
+    lame = encoder.ljust(21, b'\x00') + bytes([delay >> 4, ((delay & 0xF) << 4) | (padding >> 8), padding & 0xFF])
+    return frame(bytes(side_info) + xing + lame, version=version, mono=mono, **fields)
+
+def write(tmp_path, data, name='clip.mp3'):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def test_cbr_without_tag_counts_frames(tmp_path):
+    path = write(tmp_path, frame() * 100)
+    info = parse_mp3(path)
+    assert (info.sample_rate, info.channels, info.frames) == (44100, 2, 100)
+    assert info.samples == 100 * 1152
+    assert info.bitrate == 128
+    assert not info.vbr
+    assert mp3_duration(path) == pytest.approx(100 * 1152 / 44100)
+
+def test_padded_frames_are_one_byte_longer():
+    assert parse_frame_header(frame_header(padding=1), 0).frame_length == 418
+    assert parse_frame_header(frame_header(padding=0), 0).frame_length == 417
+
+def test_id3v2_tag_with_false_sync_is_skipped(tmp_path):
+    # An ID3v2 body full of 0xFF bytes must not be read as frames
+    body = b'\xff\xfb\x90\x00' * 64
+    size = len(body)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    info = parse_mp3(write(tmp_path, b'ID3\x04\x00\x00' + syncsafe + body + frame() * 10))
+    assert info.frames == 10
+
+def test_garbage_before_first_frame_needs_a_valid_successor():
+    data = b'\x00\xff\xfb\x90\x00\x12' + frame() * 5
+    assert parse_mp3_buffer(data).frames == 5
+
+def test_id3v1_trailer_and_truncated_frame_are_ignored(tmp_path):
+    data = frame() * 20 + frame()[:100] + b'TAG' + bytes(125)
+    assert parse_mp3(write(tmp_path, data)).frames == 20
+
+def test_xing_lame_tag_gives_gapless_sample_count(tmp_path):
+    data = xing_frame(frames=50, delay=576, padding=1000) + frame() * 50
+    info = parse_mp3(write(tmp_path, data))
+    assert info.frames == 50
+    assert (info.encoder_delay, info.encoder_padding) == (576, 1000)
+    assert info.samples == 50 * 1152 - 576 - 1000
+    assert info.duration == pytest.approx((50 * 1152 - 1576) / 44100)
+
+def test_xing_tag_marks_vbr_and_info_tag_marks_cbr():
+    vbr = xing_frame(frames=3, delay=0, padding=0, tag=b'Xing') + frame() * 3
+    cbr = xing_frame(frames=3, delay=0, padding=0, tag=b'Info') + frame() * 3
+    assert parse_mp3_buffer(vbr).vbr
+    assert not parse_mp3_buffer(cbr).vbr
+
+def test_ffmpeg_encoder_string_also_carries_delay():
+    data = xing_frame(frames=10, delay=576, padding=864, encoder=b'Lavc61.3.') + frame() * 10
+    assert parse_mp3_buffer(data).samples == 10 * 1152 - 576 - 864
+
+def test_mpeg2_mono_24khz_like_tts_output(tmp_path):
+    # 96 kbps at 24 kHz: 576 samples and 288 bytes per frame
+    fields = {'version': MPEG2, 'bitrate_index': 10, 'rate_index': 1, 'mono': True}
+    data = xing_frame(frames=40, delay=576, padding=864, **fields) + frame(**fields) * 40
+    info = parse_mp3(write(tmp_path, data))
+    assert (info.sample_rate, info.channels) == (24000, 1)
+    assert info.samples == 40 * 576 - 576 - 864
+    assert info.duration == pytest.approx(0.9)
+
+def test_vbri_tag(tmp_path):
+    vbri = bytes(32) + b'VBRI' + struct.pack('>HHHII', 1, 576, 75, 0, 30)
+    data = frame(vbri) + frame() * 30
+    info = parse_mp3(write(tmp_path, data))
+    assert info.frames == 30
+    assert info.samples == 30 * 1152 - 576
+    assert info.vbr
+
+def test_mixed_bitrates_without_tag_are_vbr():
+    data = frame(bitrate_index=9) * 10 + frame(bitrate_index=5) * 10
+    info = parse_mp3_buffer(data)
+    assert info.frames == 20
+    assert info.vbr
+    assert 64 < info.bitrate < 128
+
+def test_reserved_header_values_are_rejected():
+    assert parse_frame_header(frame_header(bitrate_index=15), 0) is None
+    assert parse_frame_header(frame_header(rate_index=3), 0) is None
+    assert parse_frame_header(frame_header(version=1), 0) is None
+    assert parse_frame_header(b'\xff\xfb', 0) is None
+
+def test_non_mp3_and_empty_files_raise(tmp_path):
+    with pytest.raises(MP3Error):
+        parse_mp3(write(tmp_path, b'RIFF' + bytes(2000), 'clip.wav'))
+    with pytest.raises(MP3Error):
+        parse_mp3(write(tmp_path, b'', 'empty.mp3'))
@@ -0,0 +1,168 @@
+import time
+import asyncio
+import pytest
+from aiohttp import web
+from stub_providers import Faults, create_app
+from reddit_shorts.http_client import get_session, close_session
+from reddit_shorts.resilience import (
+    AIMDLimiter, CircuitBreaker, CircuitOpenError, ProviderClient, ProviderError, TokenBucket,
+    parse_retry_after, raise_for_status
+)
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr('reddit_shorts.resilience.PROVIDER_RETRY_BASE', 0.01)
+
+async def with_stub(faults, test):
+    """Run test(base_url, faults) against the stub providers on a free port"""
+    runner = web.AppRunner(create_app(faults))
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        return await test(f'http://127.0.0.1:{port}', faults)
+    finally:
+        await close_session()
+        await runner.cleanup()
+
+def speech_request(url):
+    async def request():
+        async with get_session().post(f'{url}/v1/audio/speech', json={'input': 'hi', 'voice_id': 'emily'}) as response:
+            await raise_for_status('Speechify', response)
+            return await response.json()
+    return request
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+def test_token_bucket_paces_after_burst():
+    async def run():
+        bucket = TokenBucket(rate=50, burst=2)
+        start = time.monotonic()
+        for _ in range(7):
+            await bucket.acquire()
+        return time.monotonic() - start
+    # 2 from the burst, then 5 at 50/s
+    assert 0.08 <= asyncio.run(run()) < 0.5
+
+def test_token_bucket_pause():
+    bucket = TokenBucket(rate=100, burst=5)
+    bucket.pause(60)
+    assert not bucket.try_acquire()
+
+def test_aimd_grows_on_success_and_halves_on_throttle():
+    async def run():
+        limiter = AIMDLimiter(initial=4, minimum=1, maximum=8, cooldown=0)
+        for _ in range(8):
+            await limiter.acquire()
+            limiter.release('ok')
+        grown = limiter.limit
+        await limiter.acquire()
+        limiter.release('throttled')
+        return grown, limiter.limit
+    grown, cut = asyncio.run(run())
+    assert 5.5 < grown <= 6
+    assert cut == pytest.approx(grown / 2)
+
+def test_aimd_queues_beyond_limit():
+    async def run():
+        limiter = AIMDLimiter(initial=1, minimum=1, maximum=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        limiter.release('neutral')
+        await asyncio.wait_for(waiter, 1)
+        return limiter.in_flight
+    assert asyncio.run(run()) == 1
+
+def test_circuit_opens_probes_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05, max_reset_timeout=1)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record('failed')
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()  # the probe
+    assert breaker.state == 'half_open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record('failed')
+    assert breaker.state == 'open' and breaker.reset_timeout == 0.1
+
+    time.sleep(0.11)
+    breaker.before_call()
+    breaker.record('ok')
+    assert breaker.state == 'closed' and breaker.reset_timeout == 0.05
+
+def test_throttling_does_not_trip_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, max_reset_timeout=10)
+    breaker.before_call()
+    breaker.record('throttled')
+    assert breaker.state == 'closed'
+
+def test_retries_through_transient_errors():
+    async def test(url, faults):
+        client = ProviderClient('Speechify', rate=100, burst=10, max_concurrency=4)
+        data = await client.call(speech_request(url))
+        return data, client.stats(), faults.requests
+    data, stats, requests = asyncio.run(with_stub(Faults(fail_first=2), test))
+    assert 'audio_data' in data
+    assert requests == 3 and stats['retries'] == 2 and stats['circuit'] == 'closed'
+
+def test_429_honours_retry_after_and_backs_off():
+    async def test(url, faults):
+        client = ProviderClient('Speechify', rate=100, burst=10, max_concurrency=8)
+        await client.call(speech_request(url))
+        limit = client.limiter.limit
+        # The stub allows one request per second, so this one is throttled first
+        start = time.monotonic()
+        await client.call(speech_request(url))
+        return time.monotonic() - start, limit, client.stats()
+    elapsed, limit, stats = asyncio.run(with_stub(Faults(rate_limit=1, retry_after=1), test))
+    assert elapsed >= 1
+    assert stats['throttled'] == 1 and stats['retries'] == 1
+    assert stats['concurrency_limit'] < limit
+
+def test_non_retryable_error_is_raised_at_once():
+    async def test(url, faults):
+        client = ProviderClient('Groq', rate=100, burst=10, max_concurrency=4)
+
+        async def request():
+            async with get_session().post(f'{url}/missing') as response:
+                await raise_for_status('Groq', response)
+
+        with pytest.raises(ProviderError) as error:
+            await client.call(request)
+        return error.value.status, faults.requests
+    assert asyncio.run(with_stub(Faults(), test)) == (404, 0)
+
+def test_open_circuit_fails_fast():
+    async def test(url, faults):
+        client = ProviderClient('Speechify', rate=100, burst=10, max_concurrency=4, max_attempts=1)
+        client.breaker.failure_threshold = 2
+        for _ in range(2):
+            with pytest.raises(ProviderError):
+                await client.call(speech_request(url))
+        with pytest.raises(CircuitOpenError):
+            await client.call(speech_request(url))
+        return faults.requests
+    assert asyncio.run(with_stub(Faults(error_rate=1.0), test)) == 2
+
+def test_hedge_wins_against_slow_request():
+    async def test(url, faults):
+        client = ProviderClient('Speechify', rate=100, burst=10, max_concurrency=8, hedge_min_delay=0.1)
+        start = time.monotonic()
+        data = await client.call(speech_request(url), hedge=True)
+        return time.monotonic() - start, data, client.stats()
+    elapsed, data, stats = asyncio.run(with_stub(Faults(slow_first=1, slow_latency=2.0), test))
+    assert 'audio_data' in data
+    assert elapsed < 1.5
+    assert stats['hedges'] == 1 and stats['hedge_wins'] == 1 and stats['in_flight'] == 0
@@ -0,0 +1,50 @@
+import time
+import asyncio
+from reddit_shorts.voices import BUNDLED_VOICES, VoiceRegistry
+
+def slow_fetcher(delay, voices):
+    calls = []
+
+    async def fetch():
+        calls.append(time.monotonic())
+        await asyncio.sleep(delay)
+        return voices
+    return fetch, calls
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_cold_sync_lookup_serves_bundled_and_refreshes():
+    fetch, calls = slow_fetcher(0.2, [{'id': 'george', 'display_name': 'George'}])
+    registry = VoiceRegistry(fetch, ttl=60, stale_ttl=600, retry_after=60, bundled=BUNDLED_VOICES)
+
+    start = time.monotonic()
+    assert registry.get_voices_sync() == BUNDLED_VOICES
+    assert registry.get_voices_sync() == BUNDLED_VOICES
+    assert time.monotonic() - start < 0.1
+
+    wait_for(lambda: registry.get_voices_sync()[0]['voice_id'] == 'george')
+    assert len(calls) == 1
+
+def test_stale_sync_lookup_serves_stale_copy():
+    fetch, calls = slow_fetcher(0.2, [{'id': 'george'}])
+    registry = VoiceRegistry(fetch, ttl=0, stale_ttl=600, retry_after=60, bundled=BUNDLED_VOICES)
+    registry._voices = [{'voice_id': 'emily', 'name': 'Emily'}]
+    registry._fetched_at = time.monotonic()
+
+    start = time.monotonic()
+    assert registry.get_voices_sync()[0]['voice_id'] == 'emily'
+    assert time.monotonic() - start < 0.1
+    wait_for(lambda: calls)
+
+def test_failed_refresh_keeps_bundled_and_backs_off():
+    async def fetch():
+        raise Exception('provider down')
+    registry = VoiceRegistry(fetch, ttl=60, stale_ttl=600, retry_after=60, bundled=BUNDLED_VOICES)
+
+    assert registry.get_voices_sync() == BUNDLED_VOICES
+    wait_for(lambda: registry._next_attempt > 0)
+    assert registry.get_voices_sync() == BUNDLED_VOICES
@@ -1,9 +1,17 @@
 import os
 import json
+import fcntl
+import asyncio
+import hashlib
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
-from flask import current_app, render_template
+from flask import current_app, render_template, request, Response
+from werkzeug.wsgi import FileWrapper
+from werkzeug.http import http_date, quote_etag, parse_etags, parse_range_header
 from flask_mail import Message
-from models import db, UsageLog
+from sqlalchemy.exc import IntegrityError
+from models import db, UsageLog, BackgroundAsset, StoredBlob, UploadSession
 
 # Initialize Redis (optional)
 redis_client = None  # Disabled due to async client issues
@@ -220,6 +228,140 @@ def validate_file_upload(file, allowed_extensions):
     
     return True, "File is valid"
 
+# Containers accepted for each asset type, as identified by sniff_media_format
+MEDIA_FORMATS_BY_TYPE = {
+    'video': {'mp4', 'matroska', 'avi'},
+    'music': {'mp3', 'aac', 'm4a', 'mp4', 'wav', 'ogg', 'flac'},
+    'image': {'png', 'jpeg', 'gif'}
+}
+
+def sniff_media_format(header):
+    """Identify a media container from the first bytes of a file"""
+    if header[4:8] == b'ftyp':
+        return 'm4a' if header[8:12] in (b'M4A ', b'M4B ') else 'mp4'
+    if header.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'matroska'  # also WebM
+    if header.startswith(b'RIFF'):
+        return {b'AVI ': 'avi', b'WAVE': 'wav'}.get(header[8:12])
+    if header.startswith(b'OggS'):
+        return 'ogg'
+    if header.startswith(b'fLaC'):
+        return 'flac'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if header.startswith(b'ID3'):
+        return 'mp3'
+    if len(header) >= 2 and header[0] == 0xFF and (header[1] & 0xE0) == 0xE0:
+        return 'aac' if (header[1] & 0x06) == 0 else 'mp3'  # ADTS has layer bits 00
+    return None
+
+# Running sha256 of in-progress uploads in this process: upload id -> (hasher, bytes hashed)
+_upload_hashes = OrderedDict()
+MAX_TRACKED_UPLOADS = 256
+UPLOAD_READ_SIZE = 64 * 1024
+
+def _upload_hasher(upload_id, part_path, offset):
+    """Hash of an upload's first offset bytes, rebuilt from disk if this worker didn't see the earlier chunks"""
+    entry = _upload_hashes.pop(upload_id, None)
+    if entry is not None and entry[1] == offset:
+        return entry[0]
+    hasher = hashlib.sha256()
+    with open(part_path, 'rb') as f:
+        remaining = offset
+        while remaining > 0:
+            data = f.read(min(1024 * 1024, remaining))
+            if not data:
+                break
+            hasher.update(data)
+            remaining -= len(data)
+    return hasher
+
+@contextmanager
+def upload_part_lock(part_path, blocking=True):
+    """Open an upload's part file under an exclusive flock, so one request at a time writes or finalizes it.
+    
+    With blocking=False, yields None instead of waiting when another request holds it.
+    """
+    with open(part_path, 'r+b') as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield None
+            return
+        try:
+            yield f
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def write_upload_chunk(upload_id, f, offset, stream, length):
+    """Stream one chunk of a request body straight into the locked part file at offset.
+    
+    Memory use is one read buffer regardless of chunk size. The running hash is only
+    extended when this process hashed everything before offset; otherwise finalize
+    rebuilds it from disk. Returns the number of bytes written (short if the client
+    disconnected), the chunk's first 64 bytes and its sha256; a rejected chunk is cut
+    off again with truncate_upload_chunk.
+    """
+    entry = _upload_hashes.pop(upload_id, None)
+    hasher = entry[0] if entry is not None and entry[1] == offset else None
+    chunk_hasher = hashlib.sha256()
+    written = 0
+    head = b''
+    
+    # Anything past offset is left over from a writer that died mid-chunk
+    f.seek(offset)
+    f.truncate()
+    while written < length:
+        data = stream.read(min(UPLOAD_READ_SIZE, length - written))
+        if not data:
+            break
+        if len(head) < 64:
+            head += data[:64 - len(head)]
+        f.write(data)
+        chunk_hasher.update(data)
+        if hasher is not None:
+            hasher.update(data)
+        written += len(data)
+    f.flush()
+    
+    if hasher is not None:
+        _upload_hashes[upload_id] = (hasher, offset + written)
+        while len(_upload_hashes) > MAX_TRACKED_UPLOADS:
+            _upload_hashes.popitem(last=False)
+    return written, head, chunk_hasher.hexdigest()
+
+def truncate_upload_chunk(upload_id, f, offset):
+    """Drop a rejected chunk from the part file, back to the committed offset"""
+    f.truncate(offset)
+    f.flush()
+    discard_upload_hash(upload_id)
+
+def finish_upload_hash(upload_id, part_path, size):
+    """Hex sha256 of a complete upload, forgetting its running state"""
+    return _upload_hasher(upload_id, part_path, size).hexdigest()
+
+def discard_upload_hash(upload_id):
+    _upload_hashes.pop(upload_id, None)
+
+def sweep_expired_uploads():
+    """Delete upload sessions past their expiry, with the part files of those never finished"""
+    expired = UploadSession.query.filter(UploadSession.expires_at < datetime.utcnow()).all()
+    removed = 0
+    for upload in expired:
+        if upload.status == 'open' and os.path.exists(upload.part_path):
+            with upload_part_lock(upload.part_path, blocking=False) as f:
+                if f is None:
+                    continue  # a chunk is still being written; the next sweep gets it
+                os.remove(upload.part_path)
+        db.session.delete(upload)
+        removed += 1
+    db.session.commit()
+    return removed
+
 def generate_thumbnail(video_path, output_path, time_offset=5):
     """Generate thumbnail from video"""
     try:
@@ -243,6 +385,210 @@ def generate_thumbnail(video_path, output_path, time_offset=5):
         current_app.logger.error(f"Failed to generate thumbnail: {e}")
         return False
 
+async def process_uploaded_asset(app, asset_id, file_path, file_type):
+    """Extract metadata and build catalog previews for an uploaded asset (run by the job workers)"""
+    from reddit_shorts.media_info import extract_media_info
+    from reddit_shorts.previews import generate_previews
+    
+    if file_type not in ('video', 'music'):
+        return
+    
+    try:
+        info = await extract_media_info(file_path, file_type)
+        previews = None
+        if file_type == 'video' and info['is_usable']:
+            try:
+                previews = await generate_previews(file_path, info['duration'])
+            except Exception as e:
+                print(f"Failed to generate previews for {file_path}: {e}")
+        
+        await asyncio.to_thread(_store_asset_processing, app, asset_id, file_type, info, previews)
+    except Exception as e:
+        # Anything unexpected (ffprobe missing, database down) must not leave the asset pending forever
+        print(f"Failed to process uploaded asset {asset_id}: {e}")
+        await asyncio.to_thread(_fail_asset_processing, app, asset_id, str(e))
+
+def _fail_asset_processing(app, asset_id, error):
+    with app.app_context():
+        try:
+            asset = BackgroundAsset.query.get(asset_id)
+            if not asset:
+                return
+            assets = [asset]
+            if asset.blob_id:
+                assets += BackgroundAsset.query.filter(
+                    BackgroundAsset.blob_id == asset.blob_id,
+                    BackgroundAsset.indexed_at.is_(None),
+                    BackgroundAsset.id != asset.id
+                ).all()
+            for target in assets:
+                if target.thumbnail_status == 'pending':
+                    target.thumbnail_status = 'failed'
+                target.processing_status = 'failed'
+                target.metadata_error = error[:500]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Could not mark asset {asset_id} as failed: {e}")
+
+def _store_asset_processing(app, asset_id, file_type, info, previews):
+    with app.app_context():
+        asset = BackgroundAsset.query.get(asset_id)
+        if not asset:
+            return
+        
+        # Uploads of the same content that arrived while this ran get the same results
+        assets = [asset]
+        if asset.blob_id:
+            assets += BackgroundAsset.query.filter(
+                BackgroundAsset.blob_id == asset.blob_id,
+                BackgroundAsset.asset_type == file_type,
+                BackgroundAsset.indexed_at.is_(None),
+                BackgroundAsset.id != asset.id
+            ).all()
+        
+        for target in assets:
+            target.update_media_info(info)
+            target.processing_status = 'done'
+            if file_type == 'video':
+                if previews:
+                    target.thumbnail_path = previews['thumbnail']
+                    target.sprite_path = previews['sprite']
+                    target.preview_path = previews['preview']
+                    target.thumbnail_status = 'ready'
+                else:
+                    target.thumbnail_status = 'failed'
+        
+        # One worker build covers every upload of this content (see jobs.run_asset_indexing)
+        if file_type == 'video' and asset.is_usable:
+            asset.mezzanine_status = 'queued'
+        db.session.commit()
+
+def hash_file(path):
+    """Hex sha256 of a file, read in blocks"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def save_upload_stream(stream, path):
+    """Copy an uploaded file's stream to disk, returning its sha256"""
+    hasher = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for block in iter(lambda: stream.read(UPLOAD_READ_SIZE), b''):
+            hasher.update(block)
+            f.write(block)
+    return hasher.hexdigest()
+
+def blob_staging_path():
+    """Temporary location inside the blob store, so storing a blob is a rename"""
+    staging_dir = os.path.join(current_app.config['BLOB_FOLDER'], 'staging')
+    os.makedirs(staging_dir, exist_ok=True)
+    return os.path.join(staging_dir, f'{os.getpid()}-{os.urandom(8).hex()}')
+
+def _increment_blob_refs(blob_id):
+    """Take a reference on a blob row, returning it, or None if release_blob deleted the row first"""
+    updated = StoredBlob.query.filter_by(id=blob_id).update({'ref_count': StoredBlob.ref_count + 1})
+    db.session.commit()
+    return StoredBlob.query.get(blob_id) if updated else None
+
+def store_blob(temp_path, content_hash, extension):
+    """Move a hashed upload into the content-addressed store, or drop it if that content is already stored.
+    
+    Returns (blob, is_new). Every call takes one reference on the blob. The reference
+    is taken before the stored file is trusted, so release_blob can't delete it underneath.
+    """
+    blob = StoredBlob.query.filter_by(content_hash=content_hash).first()
+    if blob:
+        blob = _increment_blob_refs(blob.id)
+    if blob and os.path.exists(blob.file_path):
+        os.remove(temp_path)
+        return blob, False
+    
+    blob_dir = os.path.join(current_app.config['BLOB_FOLDER'], content_hash[:2])
+    os.makedirs(blob_dir, exist_ok=True)
+    path = os.path.join(blob_dir, f'{content_hash}{extension.lower()}')
+    os.replace(temp_path, path)
+    
+    if blob:
+        # The row outlived its file; the new upload restores it
+        blob.file_path = path
+        db.session.commit()
+        return blob, True
+    
+    blob = StoredBlob(content_hash=content_hash, file_path=path, file_size=os.path.getsize(path), ref_count=1)
+    db.session.add(blob)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent upload of the same content stored it first
+        db.session.rollback()
+        blob = StoredBlob.query.filter_by(content_hash=content_hash).first()
+        if path != blob.file_path:
+            os.remove(path)
+        return _increment_blob_refs(blob.id), False
+    return blob, True
+
+def release_blob(blob_id):
+    """Drop one reference to a blob, deleting its file, previews and mezzanines once nothing uses it"""
+    from reddit_shorts.previews import preview_paths
+    from reddit_shorts.render import derived_files
+    
+    blob = StoredBlob.query.get(blob_id)
+    if not blob:
+        return
+    file_path = blob.file_path
+    
+    # The decrement and the conditional delete share one write transaction, so a concurrent
+    # store_blob either takes its reference first (and the delete matches nothing) or finds no row
+    StoredBlob.query.filter_by(id=blob_id).update({'ref_count': StoredBlob.ref_count - 1})
+    deleted = StoredBlob.query.filter_by(id=blob_id, ref_count=0).delete()
+    if not deleted:
+        db.session.commit()
+        return
+    
+    # Unlink before committing: until then the write lock keeps store_blob from recreating the row
+    # and moving new content onto the same path
+    paths = list(preview_paths(file_path).values())
+    if os.path.exists(file_path):
+        # Mezzanine names depend on the source's size and mtime, so work them out before it goes
+        paths = [file_path] + derived_files(file_path) + paths
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+    db.session.commit()
+
+def visible_assets(asset_type, user):
+    """Active assets of a type that a user may use: the shared catalog plus their own uploads"""
+    return BackgroundAsset.query.filter_by(asset_type=asset_type, is_active=True).filter(
+        db.or_(BackgroundAsset.user_id.is_(None), BackgroundAsset.user_id == user.id)
+    )
+
+def resolve_asset_path(value, asset_type, user):
+    """Map a background/music selection (asset id, path or config name) to a file the pipeline may read"""
+    from reddit_shorts.config import footage, music
+    
+    if not value:
+        return None
+    
+    query = visible_assets(asset_type, user)
+    if str(value).isdigit():
+        asset = query.filter_by(id=int(value)).first()
+    else:
+        asset = query.filter_by(file_path=value).first()
+    if asset:
+        if asset.is_premium and user.subscription_plan == 'free':
+            return None
+        return asset.file_path
+    
+    # Fallback to config assets, which the catalog endpoints list by path and file name
+    configured = footage if asset_type == 'video' else [track[0] for track in music]
+    for path in configured:
+        if value in (path, os.path.basename(path)):
+            return path
+    return None
+
 def get_video_duration(video_path):
     """Get video duration using ffmpeg"""
     try:
@@ -312,4 +658,74 @@ def format_file_size(size_bytes):
         size_bytes /= 1024.0
         i += 1
     
-    return f"{size_bytes:.1f}{size_names[i]}" 
\ No newline at end of file
+    return f"{size_bytes:.1f}{size_names[i]}"
+
+DOWNLOAD_BLOCK_SIZE = 256 * 1024
+
+def send_media_file(path, download_name, mimetype='video/mp4'):
+    """Send a stored file without holding a worker on the transfer.
+    
+    Behind nginx the response is just an X-Accel-Redirect to an internal location.
+    Otherwise the file goes out through wsgi.file_wrapper, which gunicorn turns into
+    os.sendfile, with Range, ETag and If-None-Match handled here.
+    """
+    stat = os.stat(path)
+    etag = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+    headers = {
+        'ETag': quote_etag(etag),
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'private, max-age=0, must-revalidate',
+        'Content-Disposition': f'attachment; filename="{download_name}"'
+    }
+    
+    if request.if_none_match.contains(etag) or request.if_none_match.star_tag:
+        return Response(status=304, headers=headers)
+    
+    upload_root = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    relative = os.path.relpath(os.path.abspath(path), upload_root)
+    if current_app.config.get('USE_X_ACCEL_REDIRECT') and not relative.startswith('..'):
+        # nginx serves the bytes (ranges included) from its internal location
+        headers['X-Accel-Redirect'] = current_app.config['X_ACCEL_REDIRECT_PREFIX'] + relative.replace(os.sep, '/')
+        return Response(status=200, headers=headers, mimetype=mimetype)
+    
+    size = stat.st_size
+    start, end = 0, size
+    status = 200
+    if_range = request.headers.get('If-Range')
+    range_header = request.headers.get('Range')
+    if range_header and (not if_range or parse_etags(if_range).contains(etag)):
+        ranges = parse_range_header(range_header)
+        # Multi-range requests just get the whole file
+        if ranges and len(ranges.ranges) == 1:
+            bounds = ranges.range_for_length(size)
+            if bounds is None:
+                headers['Content-Range'] = f'bytes */{size}'
+                return Response(status=416, headers=headers)
+            start, end = bounds
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    headers['Content-Length'] = str(end - start)
+    
+    if request.method == 'HEAD':
+        return Response(status=status, headers=headers, mimetype=mimetype)
+    
+    f = open(path, 'rb')
+    f.seek(start)
+    # gunicorn sends exactly Content-Length bytes from the current offset; other servers need the cut made here
+    if end == size or request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        body = request.environ.get('wsgi.file_wrapper', FileWrapper)(f, DOWNLOAD_BLOCK_SIZE)
+    else:
+        body = _read_file_range(f, end - start)
+    return Response(body, status=status, headers=headers, mimetype=mimetype, direct_passthrough=True)
+
+def _read_file_range(f, length):
+    try:
+        while length > 0:
+            block = f.read(min(DOWNLOAD_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        f.close()
@@ -0,0 +1,113 @@
+import time
+import signal
+import argparse
+import threading
+from app import create_app
+from extensions import db
+from utils import sweep_expired_uploads
+from jobs import JobProgress, default_worker_id, claim_next_job, run_job, touch_job, requeue_stale_jobs, \
+    claim_asset_processing, run_asset_processing, claim_asset_indexing, run_asset_indexing
+
+app = create_app()
+stopping = threading.Event()
+
+# Progress is written at most this often; stream listeners poll the jobs table
+PROGRESS_WRITE_INTERVAL = 0.5  # seconds
+
+def heartbeat(job_id, worker_id, progress, done):
+    """Write a running job's progress as it changes, and its heartbeat so it isn't taken for abandoned"""
+    interval = app.config['JOB_HEARTBEAT_SECONDS']
+    with app.app_context():
+        try:
+            while not done.is_set():
+                progress.changed.wait(interval)
+                if done.is_set():
+                    break
+                if not touch_job(job_id, worker_id, *progress.take()):
+                    print(f'Job {job_id} is no longer held by this worker')
+                    return
+                done.wait(PROGRESS_WRITE_INTERVAL)
+            
+            # Flush what arrived since the last write; a fast batch leader's transcript is often only here
+            touch_job(job_id, worker_id, *progress.take())
+        finally:
+            db.session.remove()
+
+def work(worker_id, once=False):
+    """Claim and render jobs until stopped"""
+    poll_interval = app.config['JOB_POLL_INTERVAL']
+    last_sweep = 0
+    print(f'Worker {worker_id} started')
+    
+    while not stopping.is_set():
+        with app.app_context():
+            try:
+                # Any worker may sweep for jobs orphaned by a crashed one, and for abandoned uploads
+                if time.monotonic() - last_sweep > app.config['JOB_STALE_SECONDS'] / 2:
+                    requeue_stale_jobs()
+                    sweep_expired_uploads()
+                    last_sweep = time.monotonic()
+                
+                # Uploads are probed and previewed here rather than in the web process, so a restart can't lose them
+                asset = claim_asset_processing()
+                if asset is not None:
+                    print(f'Asset {asset.id}: extracting metadata and previews')
+                    ok = run_asset_processing(asset)
+                    print(f'Asset {asset.id}: ' + ('processed' if ok else 'failed'))
+                    continue
+                
+                # Mezzanines keep full transcodes out of render jobs; only a few workers build them at once
+                asset = claim_asset_indexing()
+                if asset is not None:
+                    print(f'Asset {asset.id}: building mezzanines')
+                    ok = run_asset_indexing(asset)
+                    print(f'Asset {asset.id}: ' + ('ready' if ok else 'failed'))
+                    continue
+                
+                job = claim_next_job(worker_id)
+                if job is None:
+                    if once:
+                        return
+                    stopping.wait(poll_interval)
+                    continue
+                
+                print(f'Job {job.id}: rendering video {job.video_id} (attempt {job.attempts})')
+                done = threading.Event()
+                progress = JobProgress()
+                beat = threading.Thread(target=heartbeat, args=(job.id, worker_id, progress, done), daemon=True)
+                beat.start()
+                
+                def stop_heartbeat():
+                    done.set()
+                    progress.changed.set()
+                    beat.join()
+                
+                try:
+                    # The heartbeat's last write lands before run_job records the outcome
+                    ok = run_job(job, progress, on_rendered=stop_heartbeat)
+                finally:
+                    stop_heartbeat()
+                print(f'Job {job.id}: {job.status}' + ('' if ok else f' ({job.error_message})'))
+            except Exception as e:
+                # A database hiccup shouldn't take the worker down
+                print(f'Worker error: {e}')
+                db.session.rollback()
+                stopping.wait(poll_interval)
+            finally:
+                db.session.remove()
+    print(f'Worker {worker_id} stopped')
+
+def main():
+    parser = argparse.ArgumentParser(description='Render queued videos')
+    parser.add_argument('--id', help='Worker id recorded on claimed jobs (default: host:pid)')
+    parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+    args = parser.parse_args()
+    
+    # Finish the current render on SIGTERM/SIGINT, then exit
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stopping.set())
+    
+    work(args.id or default_worker_id(), once=args.once)
+
+if __name__ == '__main__':
+    main()